@@ -1,48 +1,100 @@
-from fastapi import APIRouter, File, Form, UploadFile, Response, Depends, status
-from fastapi.responses import JSONResponse
+import time
+from fastapi import APIRouter, File, Form, UploadFile, Request, Response, Depends, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import HTTPException
 
-from app.crypto import verify_passphrase, re_encrypt_all_files
+from app.crypto import verify_passphrase, unlock_vault, re_encrypt_all_files, retrain_dictionary, rotation_progress, key_cache
+from app.crypto import crypto_pool, CryptoOverloaded
 from app.github import project_exists, list_projects_in_dir, delete_file,passphrase_exists, create_passphrase_file
 from app.config import settings
-from app.github import encrypt_upload, decrypt_download
+from app.storage import get_storage, StorageConflict
+from app.github import read_env_file, patch_env_file
+from app.github import RateLimited
+from app.github import project_history, project_sha, restore_version
+from app.github import encrypt_upload, encrypt_upload_stream, decrypt_download_stream, decrypt_download_version, decrypt_download_many
+from app.api.streaming import ndjson_line, tar_result, tar_end
 from app.auth.auth import verify_access_token, create_access_token
-from pydantic import BaseModel
+from app.auth.sessions import UNLOCK_COOKIE, UNLOCK_HEADER, unlock_sessions
+from app.crypto.envelope import VaultKeys
+from app.metrics import crypto_pool_gauge, record_cache, render
+from pydantic import BaseModel, Field
+from typing import Literal
 
 class UploadDataRequest(BaseModel):
-    passphrase: str
+    passphrase: str = ""  # may be left out on the web routes while an /unlock session is live
     project_name: str
     data: str
     update: bool = False  
+    base_sha: str | None = None  # sha from /download-data; rejects the save if the project changed since
 
 class DownloadFileRequest(BaseModel):
     passphrase: str
     project_name: str
 
+class GetKeysRequest(BaseModel):
+    passphrase: str = ""
+    project_name: str
+    keys: list[str] | None = None  # None returns every key
+
+class PatchKeysRequest(BaseModel):
+    passphrase: str = ""
+    project_name: str
+    set: dict[str, str] = Field(default_factory=dict)
+    unset: list[str] = Field(default_factory=list)
+    base_sha: str | None = None  # only patch this version of the project
+
+class BulkDownloadRequest(BaseModel):
+    passphrase: str
+    project_names: list[str] = Field(..., min_length=1, max_length=500)
+    format: Literal["ndjson", "tar"] = "ndjson"
+
+class ListProjectsRequest(BaseModel):
+    passphrase: str
+
 router = APIRouter()
 
 
+async def vault_keys(request: Request, passphrase: str) -> VaultKeys | None:
+    """Keys for a web request: from the passphrase if one is given, else from its /unlock session.
+
+    The session is only used if the request also carries ``UNLOCK_HEADER``:
+    browsers attach the cookie to cross-site form posts, but not the header.
+    """
+    if passphrase:
+        return await unlock_vault(passphrase)
+    if request.headers.get(UNLOCK_HEADER) is None:
+        return None
+    return unlock_sessions.get(request.cookies.get(UNLOCK_COOKIE))
+
+
+def locked(passphrase: str) -> JSONResponse:
+    """401 for a request whose keys could not be resolved."""
+    return JSONResponse({"error": "Invalid passphrase" if passphrase else "Vault is locked"}, status_code=401)
+
+
 
 @router.post("/upload")
 async def upload_env_file(
+    request: Request,
     token_valid :bool = Depends(verify_access_token),
-    passphrase: str = Form(...),
+    passphrase: str = Form(""),
     project_name: str = Form(...),
     file: UploadFile = File(...)
 ):
     """Upload, encrypt, and save .env file to the GitHub repo (in-memory)."""
     try:
-        isvalid = await verify_passphrase(passphrase)
-        if not isvalid:
-            return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+        keys = await vault_keys(request, passphrase)
+        if keys is None:
+            return locked(passphrase)
         if project_name == "" or project_name == "passphrase":
             return JSONResponse({"error": "Project name cannot be empty"}, status_code=400)
-        if project_exists(project_name):
+        if await project_exists(project_name):
             return JSONResponse({"error": "Project already exists"}, status_code=400)
 
-        data = await file.read()
-        encrypt_upload(project_name, passphrase, data)
-        return {"status": "ok", "project_name": project_name}
+        _, changed = await encrypt_upload_stream(project_name, keys, file)
+        return {"status": "ok" if changed else "unchanged", "project_name": project_name}
+    except (CryptoOverloaded, RateLimited):
+        raise  # Answered with 503 by the app's exception handler
     except Exception as e:
         print(f"Error: {e}")
         return JSONResponse({"error": "Failed to upload file"}, status_code=500)
@@ -50,21 +102,30 @@ async def upload_env_file(
 @router.post("/upload-data")
 async def upload_data(
     payload: UploadDataRequest,
+    request: Request,
     token_valid: bool = Depends(verify_access_token)
 ):
     """Upload plain text data, encrypt, and save it to the GitHub repo."""
-    is_valid = await verify_passphrase(payload.passphrase)
-    if not is_valid:
-        return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+    keys = await vault_keys(request, payload.passphrase)
+    if keys is None:
+        return locked(payload.passphrase)
     if payload.project_name == "" or payload.data == "" or payload.project_name == "passphrase" :
         return JSONResponse({"error": "Project name and data cannot be empty"}, status_code=400)
-    if (not payload.update) and project_exists(payload.project_name):
+    if (not payload.update) and await project_exists(payload.project_name):
         return JSONResponse({"error": "Project already exists"}, status_code=400)
     try:
         # Get raw data
         raw_data = payload.data.encode("utf-8")
-        encrypt_upload(payload.project_name, payload.passphrase, raw_data)
-        return {"status": "ok", "project_name": payload.project_name}
+        sha, changed = await encrypt_upload(payload.project_name, keys, raw_data, payload.base_sha)
+        return {"status": "ok" if changed else "unchanged", "project_name": payload.project_name, "sha": sha}
+    except StorageConflict as e:
+        print(f"Conflict: {e}")
+        return JSONResponse(
+            {"error": "Project was modified since it was loaded", "sha": e.current_sha},
+            status_code=409,
+        )
+    except (CryptoOverloaded, RateLimited):
+        raise
     except Exception as e:
         print(f"Error: {e}")
         return JSONResponse({"error": "Failed to upload data"}, status_code=500)
@@ -72,72 +133,226 @@ async def upload_data(
 
 @router.post("/download")
 async def download_env_file(
+    request: Request,
     token_valid: bool = Depends(verify_access_token),
-    passphrase: str = Form(...),
+    passphrase: str = Form(""),
     project_name: str = Form(...)
 ):
     """Download, decrypt, and return the .env file."""
-    isvalid = await verify_passphrase(passphrase)
-    if not isvalid:
-        return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+    keys = await vault_keys(request, passphrase)
+    if keys is None:
+        return locked(passphrase)
     try:
-        decrypted_data = decrypt_download(project_name, passphrase) # returns bytes
-        # Return as downloadable file
-        return Response(
-            decrypted_data,
+        decrypted_chunks = await decrypt_download_stream(project_name, keys)
+        # Stream the decrypted file back as a download
+        return StreamingResponse(
+            decrypted_chunks,
             media_type="text/plain",
             headers={"Content-Disposition": f"attachment; filename={project_name}.env"},
         )
+    except (CryptoOverloaded, RateLimited):
+        raise
     except Exception as e:
         print(f"Error: {e}")
         return {"error": "File not found"}
     
 @router.post("/download-data")
 async def download_data(
+    request: Request,
     token_valid: bool = Depends(verify_access_token),
-    passphrase: str = Form(...),
+    passphrase: str = Form(""),
     project_name: str = Form(...)
 ):
     """Download, decrypt, and return the .env data (instead of a file)."""
-    is_valid = await verify_passphrase(passphrase)
-    if not is_valid:
-        return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+    keys = await vault_keys(request, passphrase)
+    if keys is None:
+        return locked(passphrase)
     try:
-        decrypted_data = decrypt_download(project_name, passphrase)
+        decrypted_data, sha = await decrypt_download_version(project_name, keys)
         # Return the decrypted data directly
         return JSONResponse({
             "status": "ok",
             "project_name": project_name,
-            "data": decrypted_data.decode("utf-8")  # making sure it's a string
+            "data": decrypted_data.decode("utf-8"),  # making sure it's a string
+            "sha": sha,
         })
+    except (CryptoOverloaded, RateLimited):
+        raise
     except Exception as e:
         print(f"Error: {e}")
         return JSONResponse({"error": "File not found or decryption failed"}, status_code=404)
 
 
+async def get_keys(payload: GetKeysRequest, keys: VaultKeys | None):
+    """Shared by /get-keys and /cli-get-keys."""
+    if keys is None:
+        return locked(payload.passphrase)
+    if payload.project_name == "passphrase":
+        return JSONResponse({"error": "Project name cannot be 'passphrase'"}, status_code=400)
+    try:
+        env_file, sha = await read_env_file(payload.project_name, keys)
+    except FileNotFoundError:
+        return JSONResponse({"error": "File not found"}, status_code=404)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except (CryptoOverloaded, RateLimited):
+        raise
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse({"error": "File not found or decryption failed"}, status_code=404)
+
+    values = env_file.to_dict()
+    if payload.keys is not None:
+        missing = [key for key in payload.keys if key not in values]
+        values = {key: values[key] for key in payload.keys if key in values}
+    else:
+        missing = []
+    return JSONResponse({
+        "status": "ok", "project_name": payload.project_name, "values": values, "missing": missing, "sha": sha,
+    })
+
+
+async def patch_keys(payload: PatchKeysRequest, keys: VaultKeys | None):
+    """Shared by /patch-keys and /cli-patch-keys."""
+    if keys is None:
+        return locked(payload.passphrase)
+    if payload.project_name == "passphrase":
+        return JSONResponse({"error": "Project name cannot be 'passphrase'"}, status_code=400)
+    if not payload.set and not payload.unset:
+        return JSONResponse({"error": "Nothing to set or unset"}, status_code=400)
+    try:
+        changed, sha = await patch_env_file(
+            payload.project_name, keys, payload.set, payload.unset, payload.base_sha
+        )
+    except FileNotFoundError:
+        return JSONResponse({"error": "File not found"}, status_code=404)
+    except StorageConflict as e:
+        print(f"Conflict: {e}")
+        return JSONResponse(
+            {"error": "Project was modified since it was loaded", "sha": e.current_sha},
+            status_code=409,
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except (CryptoOverloaded, RateLimited):
+        raise
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse({"error": "Failed to patch project"}, status_code=500)
+    return JSONResponse({
+        "status": "ok", "project_name": payload.project_name, "changed": changed, "sha": sha,
+    })
+
+
+@router.post("/get-keys")
+async def get_env_keys(
+    payload: GetKeysRequest,
+    request: Request,
+    token_valid: bool = Depends(verify_access_token)
+):
+    """Return selected keys (or all) of a project's .env data."""
+    return await get_keys(payload, await vault_keys(request, payload.passphrase))
+
+
+@router.post("/patch-keys")
+async def patch_env_keys(
+    payload: PatchKeysRequest,
+    request: Request,
+    token_valid: bool = Depends(verify_access_token)
+):
+    """Set and unset keys of a project; only writes if a value changed."""
+    return await patch_keys(payload, await vault_keys(request, payload.passphrase))
+
+
 @router.delete("/delete")
 async def delete_env_file(
+    request: Request,
     token_valid: bool = Depends(verify_access_token),
     project_name: str = Form(...),
-    passphrase: str = Form(...)
+    passphrase: str = Form("")
 ):
     """Delete an encrypted .env file from the GitHub repo if authorized."""
-    isvalidPassphrase = await verify_passphrase(passphrase)
-    if not isvalidPassphrase:
-        return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+    if await vault_keys(request, passphrase) is None:
+        return locked(passphrase)
 
-    deleted = delete_file(project_name)
+    deleted = await delete_file(project_name)
     if deleted:
         return JSONResponse({"status": "ok", "project_name": project_name})
     else:
         return JSONResponse({"error": "File not found or delete failed"}, status_code=status.HTTP_404_NOT_FOUND)
 
+@router.post("/history")
+async def get_project_history(
+    request: Request,
+    token_valid: bool = Depends(verify_access_token),
+    project_name: str = Form(...),
+    passphrase: str = Form("")
+):
+    """List the stored versions of a project, newest first, from the local history index."""
+    if await vault_keys(request, passphrase) is None:
+        return locked(passphrase)
+    try:
+        versions = await project_history(project_name)
+        current_sha = await project_sha(project_name) if versions else None
+    except (CryptoOverloaded, RateLimited):
+        raise
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse({"error": "Failed to read project history"}, status_code=500)
+    if versions is None:
+        return JSONResponse({"error": "This storage backend keeps no version history"}, status_code=501)
+    # None of them is current while the project is deleted or has an uncommitted write
+    current = next((v for v in versions if current_sha is not None and v.sha == current_sha), None)
+    return JSONResponse({
+        "project_name": project_name,
+        "versions": [
+            {"commit": v.commit, "date": v.date, "sha": v.sha, "size": v.size, "message": v.message,
+             "current": v is current}
+            for v in versions
+        ],
+        # False while the index is built, or when it holds the newest HISTORY_MAX_COMMITS commits only
+        "complete": get_storage().stats().get("history", {}).get("complete", True),
+    })
+
+
+@router.post("/restore")
+async def restore_project_version(
+    request: Request,
+    token_valid: bool = Depends(verify_access_token),
+    project_name: str = Form(...),
+    commit: str = Form(...),
+    passphrase: str = Form("")
+):
+    """Make an earlier version of a project current again; refused if it no longer decrypts."""
+    keys = await vault_keys(request, passphrase)
+    if keys is None:
+        return locked(passphrase)
+    if project_name == "" or project_name == "passphrase":
+        return JSONResponse({"error": "Project name cannot be 'passphrase'"}, status_code=400)
+    if rotation_progress["state"] == "running":
+        return JSONResponse({"error": "A passphrase update is running"}, status_code=409)
+    try:
+        sha = await restore_version(project_name, commit, keys)
+    except KeyError:
+        return JSONResponse({"error": "Version not found"}, status_code=404)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    except NotImplementedError:
+        return JSONResponse({"error": "This storage backend keeps no version history"}, status_code=501)
+    except (CryptoOverloaded, RateLimited):
+        raise
+    except Exception as e:
+        print(f"Error: {e}")
+        return JSONResponse({"error": "Failed to restore version"}, status_code=500)
+    return JSONResponse({"status": "ok", "project_name": project_name, "commit": commit, "sha": sha})
+
+
 @router.get("/projects")
 async def get_all_projects(
     token_valid: bool = Depends(verify_access_token)
 ):
     """List all projects (i.e., .env files) in the GitHub repo."""
-    return list_projects_in_dir("encrypted_files")
+    return await list_projects_in_dir()
 
 
 @router.post("/login")
@@ -166,19 +381,60 @@ async def login(
 
 @router.post("/logout")
 def logout(
+    request: Request,
     token_valid: bool = Depends(verify_access_token)
 ):
-    """Logout by clearing the access_token cookie."""
+    """Logout by clearing the access_token cookie (and ending any unlock session)."""
+    unlock_sessions.revoke(request.cookies.get(UNLOCK_COOKIE))
     response = JSONResponse({"status": "logged out"})
-    response.delete_cookie(
-        key="access_token",
-        path="/",
-        samesite="none",   
-        secure=True        
+    for key in ("access_token", UNLOCK_COOKIE):
+        response.delete_cookie(
+            key=key,
+            path="/",
+            samesite="none",
+            secure=True
+        )
+    return response
+
+
+@router.post("/unlock")
+async def unlock(
+    request: Request,
+    token_valid: bool = Depends(verify_access_token),
+    passphrase: str = Form(...)
+):
+    """Verify the passphrase once; until the session expires, web routes work without it."""
+    keys = await unlock_vault(passphrase)
+    if keys is None:
+        return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+    if keys.master_key is None or not keys.migrated:
+        return JSONResponse({"error": "Migrate the vault to envelope encryption first"}, status_code=400)
+    unlock_sessions.revoke(request.cookies.get(UNLOCK_COOKIE))
+    response = JSONResponse({"status": "ok", "expires_in": settings.UNLOCK_TTL})
+    response.set_cookie(
+        key=UNLOCK_COOKIE,
+        value=unlock_sessions.create(keys),
+        httponly=True,
+        path='/',
+        secure=True,
+        samesite="none",
+        max_age=settings.UNLOCK_TTL
     )
     return response
 
 
+@router.post("/lock")
+def lock(
+    request: Request,
+    token_valid: bool = Depends(verify_access_token)
+):
+    """End the unlock session; the passphrase is needed again."""
+    unlock_sessions.revoke(request.cookies.get(UNLOCK_COOKIE))
+    response = JSONResponse({"status": "locked"})
+    response.delete_cookie(key=UNLOCK_COOKIE, path="/", samesite="none", secure=True)
+    return response
+
+
 
 @router.post("/create-passphrase")
 async def create_passphrase(
@@ -188,42 +444,141 @@ async def create_passphrase(
     """Create a passphrase for encrypting/decrypting .env files."""
     if not passphrase:
         return JSONResponse({"error": "Passphrase cannot be empty"}, status_code=400)
-    if passphrase_exists():
+    if await passphrase_exists():
         return JSONResponse({"error": "Passphrase already exists"}, status_code=400)
-    return create_passphrase_file(passphrase)
+    return await create_passphrase_file(passphrase)
 
 @router.get("/passphrase-exists")
 async def check_passphrase_exists(
     is_valid: bool = Depends(verify_access_token)
 ):
     """Check if a passphrase file exists."""
-    exists = passphrase_exists()
+    exists = await passphrase_exists()
     return {"exists": exists}
 
 @router.post("/update-passphrase")
 async def update_passphrase(
     token_valid: bool = Depends(verify_access_token),
     old_passphrase: str = Form(...),
-    new_passphrase: str = Form(...)
+    new_passphrase: str = Form(...),
+    rotate_key: bool = Form(False)
 ):
-    """Update the passphrase for all files."""
+    """Update the passphrase; with ``rotate_key`` also replace the master key and re-encrypt every file."""
     # Verify the old passphrase
-    print(f"Old passphrase: {old_passphrase}, New passphrase: {new_passphrase}")
-    is_valid = await verify_passphrase(old_passphrase)
-    if not is_valid:
+    keys = await unlock_vault(old_passphrase)
+    if keys is None:
         return JSONResponse({"error": "Invalid old passphrase"}, status_code=401)
+    if rotation_progress["state"] == "running":
+        return JSONResponse({"error": "A passphrase update is already running"}, status_code=409)
 
-    re_encrypt_all_files(old_passphrase, new_passphrase)
+    try:
+        timings = await re_encrypt_all_files(keys, new_passphrase, rotate_key)
+    except StorageConflict:
+        return JSONResponse({"error": "The vault changed during the update; nothing was changed, try again"},
+                            status_code=409)
+    finally:
+        key_cache.clear()  # Drop keys derived from the old passphrase
+        unlock_sessions.clear()
     
-    return JSONResponse({"status": "ok", "message": "All files re-encrypted successfully."})
+    return JSONResponse({
+        "status": "ok",
+        "message": "All files re-encrypted successfully.",
+        "timings": {phase: round(seconds, 4) for phase, seconds in timings.items()},
+    })
+
+
+@router.post("/migrate-vault")
+async def migrate_vault(
+    token_valid: bool = Depends(verify_access_token),
+    passphrase: str = Form(...)
+):
+    """Move a legacy vault to envelope encryption without changing the passphrase."""
+    keys = await unlock_vault(passphrase)
+    if keys is None:
+        return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+    if keys.migrated:
+        return JSONResponse({"status": "ok", "message": "Vault already uses envelope encryption."})
+    if rotation_progress["state"] == "running":
+        return JSONResponse({"error": "A passphrase update is already running"}, status_code=409)
+
+    try:
+        timings = await re_encrypt_all_files(keys, passphrase)
+    except StorageConflict:
+        return JSONResponse({"error": "The vault changed during the migration; nothing was changed, try again"},
+                            status_code=409)
+    unlock_sessions.clear()  # Sessions hold the keys of the legacy vault
+    return JSONResponse({
+        "status": "ok",
+        "message": "Vault migrated to envelope encryption.",
+        "timings": {phase: round(seconds, 4) for phase, seconds in timings.items()},
+    })
+
+
+@router.post("/train-dictionary")
+async def train_compression_dictionary(
+    token_valid: bool = Depends(verify_access_token),
+    passphrase: str = Form(...)
+):
+    """Train a compression dictionary from the vault's files and recompress them."""
+    keys = await unlock_vault(passphrase)
+    if keys is None:
+        return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+    if not keys.migrated:
+        return JSONResponse({"error": "Migrate the vault to envelope encryption first"}, status_code=400)
+    if rotation_progress["state"] == "running":
+        return JSONResponse({"error": "A passphrase update is already running"}, status_code=409)
+
+    try:
+        sizes, timings = await retrain_dictionary(keys)
+    except StorageConflict:
+        return JSONResponse({"error": "The vault changed during retraining; nothing was changed, try again"},
+                            status_code=409)
+    unlock_sessions.clear()  # Sessions hold keys without the new dictionary
+    return JSONResponse({
+        "status": "ok",
+        "message": "Vault recompressed with a new dictionary.",
+        **sizes,
+        "timings": {phase: round(seconds, 4) for phase, seconds in timings.items()},
+    })
+
+
+@router.post("/migrate-layout")
+async def migrate_storage_layout(
+    token_valid: bool = Depends(verify_access_token),
+    passphrase: str = Form(...)
+):
+    """Move a flat vault to the sharded layout in one commit, while it stays online."""
+    if await unlock_vault(passphrase) is None:
+        return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+    if rotation_progress["state"] == "running":
+        return JSONResponse({"error": "A passphrase update is already running"}, status_code=409)
+
+    start = time.perf_counter()
+    moved = await get_storage().migrate_layout()
+    return JSONResponse({
+        "status": "ok",
+        "message": f"{moved} projects moved to the sharded layout." if moved else "Vault already uses the sharded layout.",
+        "moved": moved,
+        "seconds": round(time.perf_counter() - start, 4),
+    })
+
+
+@router.get("/update-passphrase/progress")
+async def get_update_passphrase_progress(
+    token_valid: bool = Depends(verify_access_token)
+):
+    """Report the progress of the running (or last) passphrase update."""
+    return rotation_progress
 
 
 @router.get("/me")
 async def get_me(
+    request: Request,
     token_valid: bool = Depends(verify_access_token)
 ):
     if token_valid:
-        return {"isAuthenticated": True}
+        unlocked_for = unlock_sessions.expires_in(request.cookies.get(UNLOCK_COOKIE))
+        return {"isAuthenticated": True, "unlocked": unlocked_for > 0, "unlockExpiresIn": unlocked_for}
     raise HTTPException(status_code=401, detail="Not authenticated")
 
 
@@ -249,10 +604,34 @@ async def verify_project_endpoint(
     is_valid = await verify_passphrase(passphrase)
     if not is_valid:
         return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
-    if project_exists(project_name):
+    if await project_exists(project_name):
         return JSONResponse({"error": "Project already exist"}, status_code=404)
     return JSONResponse({"status": "ok", "message": "Project exists and passphrase is valid."})
 
+@router.get("/cache-stats")
+async def get_cache_stats(
+    token_valid: bool = Depends(verify_access_token)
+):
+    """Return hit/miss counters of the derived-key and storage caches, crypto pool load and unlock sessions."""
+    return {
+        "key_cache": key_cache.stats(), "crypto_pool": crypto_pool.stats(),
+        "unlock_sessions": unlock_sessions.stats(), **get_storage().stats(),
+    }
+
+@router.get("/metrics")
+async def get_metrics(request: Request):
+    """Request and per-stage latency histograms, cache and pool state, in Prometheus text format."""
+    if settings.METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        return JSONResponse({"error": "Invalid metrics token"}, status_code=401)
+    record_cache("key", key_cache.stats())
+    for name, stats in get_storage().stats().items():
+        if "hit_ratio" in stats:
+            record_cache(name.removesuffix("_cache"), stats)
+    for field, value in crypto_pool.stats().items():
+        crypto_pool_gauge.set(value, field)
+    return Response(render(), media_type="text/plain; version=0.0.4")
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -268,17 +647,18 @@ async def upload_env_file(
     file: UploadFile = File(...)
 ):
     """Upload, encrypt, and save .env file to the GitHub repo (in-memory)."""
-    isvalid = await verify_passphrase(passphrase)
-    if not isvalid:
+    keys = await unlock_vault(passphrase)
+    if keys is None:
         return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
     if project_name == "":
         return JSONResponse({"error": "Project name cannot be empty"}, status_code=400)
     if project_name == "passphrase":
         return JSONResponse({"error": "Project name cannot be 'passphrase'"}, status_code=400)
     try:
-        data = await file.read()
-        encrypt_upload(project_name, passphrase, data)
-        return {"status": "ok", "project_name": project_name}
+        _, changed = await encrypt_upload_stream(project_name, keys, file)
+        return {"status": "ok" if changed else "unchanged", "project_name": project_name}
+    except (CryptoOverloaded, RateLimited):
+        raise
     except Exception as e:
         print(f"Error: {e}")
         return JSONResponse({"error": "Failed to upload file"}, status_code=500)
@@ -287,17 +667,81 @@ async def upload_env_file(
 @router.post("/cli-download")
 async def download_env_file(payload: DownloadFileRequest):
     """Download, decrypt, and return the .env file."""
-    isvalid = await verify_passphrase(payload.passphrase)
-    if not isvalid:
+    keys = await unlock_vault(payload.passphrase)
+    if keys is None:
         return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
     try:
-        decrypted_data = decrypt_download(payload.project_name, payload.passphrase)  # returns bytes
-        # Return as downloadable file
-        return Response(
-            decrypted_data,
+        decrypted_chunks = await decrypt_download_stream(payload.project_name, keys)
+        # Stream the decrypted file back as a download
+        return StreamingResponse(
+            decrypted_chunks,
             media_type="text/plain",
             headers={"Content-Disposition": f"attachment; filename={payload.project_name}.env"},
         )
+    except (CryptoOverloaded, RateLimited):
+        raise
     except Exception as e:
         print(f"Error: {e}")
-        return {"error": "File not found"}
\ No newline at end of file
+        return {"error": "File not found"}
+
+
+@router.post("/cli-get-keys")
+async def cli_get_env_keys(payload: GetKeysRequest):
+    """Return selected keys (or all) of a project's .env data."""
+    if not payload.passphrase:
+        return locked(payload.passphrase)
+    return await get_keys(payload, await unlock_vault(payload.passphrase))
+
+
+@router.post("/cli-patch-keys")
+async def cli_patch_env_keys(payload: PatchKeysRequest):
+    """Set and unset keys of a project; only writes if a value changed."""
+    if not payload.passphrase:
+        return locked(payload.passphrase)
+    return await patch_keys(payload, await unlock_vault(payload.passphrase))
+
+
+@router.post("/cli-download-bulk")
+async def download_env_files_bulk(payload: BulkDownloadRequest):
+    """Download and decrypt many projects, streamed back as each one completes.
+
+    The passphrase is verified once. Results come back as NDJSON records or
+    as a tar archive; a project that fails is reported on its own
+    (``status: error`` / ``<name>.error``) without failing the batch. NDJSON
+    data that is not UTF-8 comes Base64-encoded, marked ``encoding: base64``.
+    """
+    keys = await unlock_vault(payload.passphrase)
+    if keys is None:
+        return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+
+    results = decrypt_download_many(payload.project_names, keys, settings.BULK_CONCURRENCY)
+    if payload.format == "tar":
+        async def tar_stream():
+            async for result in results:
+                yield tar_result(*result)
+            yield tar_end()
+
+        return StreamingResponse(
+            tar_stream(),
+            media_type="application/x-tar",
+            headers={"Content-Disposition": "attachment; filename=envault.tar"},
+        )
+
+    async def ndjson_stream():
+        async for result in results:
+            yield ndjson_line(*result)
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+@router.post("/cli-projects")
+async def cli_list_projects(payload: ListProjectsRequest):
+    """List projects with the sha of their stored blob, so clients can skip unchanged ones."""
+    keys = await unlock_vault(payload.passphrase)
+    if keys is None:
+        return JSONResponse({"error": "Invalid passphrase"}, status_code=401)
+    projects = await list_projects_in_dir()
+    return [
+        {"name": project["name"], "sha": project["sha"], "size": project["size"], "modified": project["modified"]}
+        for project in projects if project["name"] != "passphrase"
+    ]
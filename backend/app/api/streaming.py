@@ -0,0 +1,45 @@
+import base64
+import io
+import json
+import tarfile
+import time
+
+TAR_BLOCK = 512
+
+
+def ndjson_line(project_name: str, data: bytes | None, error: str | None, sha: str | None = None) -> bytes:
+    """One NDJSON record for a bulk download result.
+
+    Data that is not valid UTF-8 is sent Base64-encoded, with ``encoding: base64``.
+    """
+    if error is not None:
+        record = {"project_name": project_name, "status": "error", "error": error}
+    else:
+        try:
+            record = {"project_name": project_name, "status": "ok", "data": data.decode("utf-8"), "sha": sha}
+        except UnicodeDecodeError:
+            record = {"project_name": project_name, "status": "ok", "data": base64.b64encode(data).decode("ascii"),
+                      "encoding": "base64", "sha": sha}
+    return (json.dumps(record) + "\n").encode("utf-8")
+
+
+def tar_member(name: str, data: bytes) -> bytes:
+    """A complete tar member (header, data and padding) for streaming."""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    info.mode = 0o600
+    padding = (TAR_BLOCK - len(data) % TAR_BLOCK) % TAR_BLOCK
+    return info.tobuf(format=tarfile.PAX_FORMAT) + data + b"\0" * padding
+
+
+def tar_result(project_name: str, data: bytes | None, error: str | None, sha: str | None = None) -> bytes:
+    """Tar member for a bulk download result; failures become ``<name>.error``."""
+    if error is not None:
+        return tar_member(f"{project_name}.error", error.encode("utf-8"))
+    return tar_member(f"{project_name}.env", data)
+
+
+def tar_end() -> bytes:
+    """End-of-archive marker: two zero blocks."""
+    return b"\0" * (TAR_BLOCK * 2)
@@ -0,0 +1,92 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from app.config import settings
+from app.crypto.envelope import VaultKeys
+
+UNLOCK_COOKIE = "unlock_token"
+# Required with the cookie: a custom header forces a CORS preflight, so another
+# site cannot send requests that ride on the session (it works as a CSRF token)
+UNLOCK_HEADER = "X-Envault-Unlock"
+
+
+class UnlockSessions:
+    """Bounded, expiring in-memory store of unlocked vault keys.
+
+    ``/unlock`` verifies the passphrase once and stores the resulting keys
+    under a random token sent back as an HttpOnly cookie; later requests
+    with that cookie get the keys without fetching the passphrase file or
+    running the KDF. Only a hash of each token is kept, and of the keys only
+    the master key and dictionaries: never the passphrase, so only migrated
+    vaults can be unlocked. Sessions expire ``ttl`` seconds after unlocking;
+    past ``max_size`` the oldest is dropped. Sessions live in this process
+    only, so they do not survive a restart.
+    """
+
+    def __init__(self, max_size: int = 64, ttl: float = 900):
+        self.max_size = max_size
+        self.ttl = ttl
+        # token hash -> (master key, dictionary, previous dictionaries, expiry)
+        self._sessions: OrderedDict[bytes, tuple[bytes, bytes | None, tuple[bytes, ...], float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _id(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def create(self, keys: VaultKeys) -> str:
+        """Store unlocked keys and return the token that gives access to them."""
+        if keys.master_key is None or not keys.migrated:
+            raise ValueError("Only vaults that use envelope encryption can be unlocked")
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[self._id(token)] = (
+                keys.master_key, keys.dictionary, keys.previous_dictionaries, time.monotonic() + self.ttl,
+            )
+            while len(self._sessions) > max(self.max_size, 1):
+                self._sessions.popitem(last=False)
+        return token
+
+    def get(self, token: str | None) -> VaultKeys | None:
+        """Keys of a live session, or None if the token is unknown or expired."""
+        if not token:
+            return None
+        session_id = self._id(token)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            master_key, dictionary, previous_dictionaries, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._sessions[session_id]
+                return None
+        return VaultKeys("", master_key, True, dictionary, previous_dictionaries)
+
+    def expires_in(self, token: str | None) -> int:
+        """Seconds left in a session, 0 if it is not live."""
+        if not token:
+            return 0
+        with self._lock:
+            entry = self._sessions.get(self._id(token))
+        return max(int(entry[-1] - time.monotonic()), 0) if entry else 0
+
+    def revoke(self, token: str | None) -> None:
+        if token:
+            with self._lock:
+                self._sessions.pop(self._id(token), None)
+
+    def clear(self) -> None:
+        """End every session, e.g. after the passphrase file changed."""
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            live = sum(1 for *_, expires_at in self._sessions.values() if expires_at >= now)
+        return {"sessions": live, "max_sessions": self.max_size, "ttl": self.ttl}
+
+
+unlock_sessions = UnlockSessions(settings.UNLOCK_MAX_SESSIONS, settings.UNLOCK_TTL)
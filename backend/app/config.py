@@ -1,10 +1,35 @@
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    GH_TOKEN: str
-    GH_REPO: str
+    GH_TOKEN: str = ""
+    GH_REPO: str = ""
+    GH_BRANCH: str = ""           # defaults to the repo's default branch
     PASSWORD: str
     SECRET_KEY: str
+    KEY_CACHE_SIZE: int = 256     # max derived keys held in memory
+    KEY_CACHE_TTL: int = 300      # seconds before a cached key expires
+    UNLOCK_TTL: int = 900         # seconds an /unlock session keeps the vault keys
+    UNLOCK_MAX_SESSIONS: int = 64 # unlocked sessions held at once, oldest dropped first
+    REENCRYPT_WORKERS: int = 0    # processes used for rotation, 0 = one per CPU
+    BULK_CONCURRENCY: int = 8     # projects fetched at once by /cli-download-bulk
+    STORAGE_BACKEND: str = "github"   # github | local | memory
+    STORAGE_DIR: str = "vault"        # directory used by the local backend
+    MANIFEST_TTL: float = 5           # seconds a vault listing is trusted before revalidating
+    BLOB_CACHE_BYTES: int = 32 * 1024 * 1024  # in-memory cache of encrypted blobs
+    BLOB_CACHE_DIR: str = ""          # optional on-disk blob cache tier
+    BLOB_COMPRESSION: bool = True     # zlib-compress plaintext before encrypting
+    CRYPTO_WORKERS: int = 0           # threads for KDF/encryption, 0 = min(4, CPUs)
+    CRYPTO_QUEUE_DEPTH: int = 64      # crypto jobs allowed to wait before answering 503
+    CRYPTO_RETRY_AFTER: int = 1       # seconds sent in Retry-After when overloaded
+    WRITE_BEHIND: bool = False        # acknowledge writes once journaled, commit them in batches
+    WRITE_BEHIND_INTERVAL: float = 5  # seconds between batch commits in write-behind mode
+    WRITE_BEHIND_JOURNAL: str = "journal/write-behind.log"  # local journal of unflushed writes
+    HISTORY_INDEX_PATH: str = "cache/history.json"  # on-disk copy of the version history index, empty = memory only
+    HISTORY_MAX_COMMITS: int = 1000   # most commits scanned when building or catching up the history index
+    GITHUB_CONCURRENCY: int = 8       # GitHub API requests in flight at once
+    GITHUB_RATE_RESERVE: int = 200    # requests left in the window that bulk traffic leaves to reads
+    GITHUB_MAX_WAIT: float = 60       # longest rate-limit backoff to sit out before answering 503
+    METRICS_TOKEN: str = ""           # bearer token required by /metrics, empty = open
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,7 @@
+from .keycache import key_cache, derive_key
+from .offload import crypto_pool, CryptoOverloaded
 from .decrypt import decrypt_data
 from .encrypt import encrypt_data
-from .verify import verify_passphrase
-from .decrypt_encrypt import re_encrypt_all_files
\ No newline at end of file
+from .envelope import VaultKeys, encrypt_for_vault, decrypt_from_vault, fingerprint, fingerprint_hmac, stored_fingerprint
+from .verify import verify_passphrase, unlock_vault
+from .decrypt_encrypt import re_encrypt_all_files, retrain_dictionary, rotation_progress
@@ -0,0 +1,142 @@
+import base64
+import os
+import struct
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from app.config import settings
+from app.crypto.compress import CODEC_NONE, compress, decompress, dictionary_id
+from app.crypto.keycache import KDF_ITERATIONS, derive_key
+
+# Compact binary format stored as-is, without the Base64 layers of the older
+# formats (salt + Fernet token, itself Base64, wrapped in Base64 again).
+#
+#   header: magic | version | kdf | kdf iterations | salt | codec | dictionary id | fingerprint
+#   body:   nonce | AES-256-GCM ciphertext + tag
+#
+# The header is authenticated as associated data. ``kdf`` says where the key
+# comes from: PBKDF2 over the passphrase and salt, or HKDF over the vault
+# master key and salt. ``codec`` and ``dictionary id`` describe how the
+# plaintext was compressed before encryption, and ``fingerprint`` is a keyed
+# hash of the plaintext used to skip no-op writes (all zeros when unknown).
+# Version 1 headers stop at the salt, version 2 headers at the dictionary id.
+# As with the stream format, the first magic byte is outside the Base64
+# alphabet, so legacy blobs are never mistaken for these.
+BLOB_MAGIC = b"\x89EVB"
+BLOB_VERSION = 3
+KDF_MASTER_KEY = 0
+KDF_PBKDF2_SHA256 = 1
+NONCE_SIZE = 12
+FINGERPRINT_SIZE = 16
+_HEADERS = {
+    1: struct.Struct(">4sBBI16s"),
+    2: struct.Struct(">4sBBI16sBI"),
+    3: struct.Struct(">4sBBI16sBI16s"),
+}
+_HEADER = _HEADERS[BLOB_VERSION]
+HEADER_SIZE = _HEADER.size
+
+
+def is_blob(data: bytes) -> bool:
+    """Whether a stored blob uses the compact binary format."""
+    return data.startswith(BLOB_MAGIC)
+
+
+def blob_kdf(data: bytes) -> int:
+    """Return the KDF id recorded in a compact blob header."""
+    return data[len(BLOB_MAGIC) + 1]
+
+
+def _read_header(data: bytes) -> tuple | None:
+    """Return (header size, kdf, iterations, salt, codec, dictionary id, fingerprint) or None.
+
+    Fields that older header versions do not have come back as defaults.
+    """
+    version = data[len(BLOB_MAGIC)] if len(data) > len(BLOB_MAGIC) else 0
+    header_struct = _HEADERS.get(version)
+    if header_struct is None or len(data) < header_struct.size or not is_blob(data):
+        return None
+    _, _, *fields = header_struct.unpack(data[:header_struct.size])
+    fields += (CODEC_NONE, 0, None)[len(fields) - 3:]
+    if fields[5] == bytes(FINGERPRINT_SIZE):
+        fields[5] = None
+    return header_struct.size, *fields
+
+
+def blob_fingerprint(data: bytes) -> bytes | None:
+    """Return the plaintext fingerprint recorded in a compact blob header, if any."""
+    header = _read_header(data)
+    return None if header is None else header[6]
+
+
+def blob_dictionary_id(data: bytes) -> int:
+    """Return the id of the dictionary a compact blob was compressed with, 0 for none."""
+    header = _read_header(data)
+    return 0 if header is None else header[5]
+
+
+def _master_aead(master_key: bytes, salt: bytes) -> AESGCM:
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"envault-blob-v1")
+    return AESGCM(hkdf.derive(base64.urlsafe_b64decode(master_key)))
+
+
+def _passphrase_aead(passphrase: str, salt: bytes, iterations: int) -> AESGCM:
+    return AESGCM(base64.urlsafe_b64decode(derive_key(passphrase, salt, iterations)))
+
+
+def _pack(aead: AESGCM, kdf: int, iterations: int, salt: bytes, data: bytes,
+          dictionary: bytes | None, fingerprint: bytes | None) -> bytes:
+    codec, dict_id = CODEC_NONE, 0
+    if settings.BLOB_COMPRESSION:
+        codec, data = compress(data, dictionary)
+        if codec != CODEC_NONE:
+            dict_id = dictionary_id(dictionary)
+    header = _HEADER.pack(BLOB_MAGIC, BLOB_VERSION, kdf, iterations, salt, codec, dict_id,
+                          fingerprint or bytes(FINGERPRINT_SIZE))
+    nonce = os.urandom(NONCE_SIZE)
+    return header + nonce + aead.encrypt(nonce, data, header)
+
+
+def encrypt_blob_with_passphrase(data: bytes, passphrase: str, dictionary: bytes | None = None,
+                                 fingerprint: bytes | None = None) -> bytes:
+    """Encrypt data under a key derived from the passphrase."""
+    salt = os.urandom(16)
+    aead = _passphrase_aead(passphrase, salt, KDF_ITERATIONS)
+    return _pack(aead, KDF_PBKDF2_SHA256, KDF_ITERATIONS, salt, data, dictionary, fingerprint)
+
+
+def encrypt_blob_with_master_key(data: bytes, master_key: bytes, dictionary: bytes | None = None,
+                                 fingerprint: bytes | None = None) -> bytes:
+    """Encrypt data under a key derived from the vault master key."""
+    salt = os.urandom(16)
+    return _pack(_master_aead(master_key, salt), KDF_MASTER_KEY, 0, salt, data, dictionary, fingerprint)
+
+
+def decrypt_blob(data: bytes, passphrase: str | None = None, master_key: bytes | None = None,
+                 dictionary: bytes | None = None) -> bytes:
+    """Decrypt a compact blob with whichever secret its header asks for.
+
+    Raises InvalidToken, like Fernet, if the blob is malformed, the secret is
+    missing or wrong, or the data was tampered with, and ValueError if it was
+    compressed with a dictionary other than ``dictionary``.
+    """
+    header = _read_header(data)
+    if header is None or len(data) < header[0] + NONCE_SIZE:
+        raise InvalidToken
+    header_size, kdf, iterations, salt, codec, dict_id, _ = header
+    if kdf == KDF_MASTER_KEY and master_key is not None:
+        aead = _master_aead(master_key, salt)
+    elif kdf == KDF_PBKDF2_SHA256 and passphrase is not None and iterations > 0:
+        aead = _passphrase_aead(passphrase, salt, iterations)
+    else:
+        raise InvalidToken
+    nonce = data[header_size:header_size + NONCE_SIZE]
+    try:
+        plaintext = aead.decrypt(nonce, data[header_size + NONCE_SIZE:], data[:header_size])
+    except InvalidTag:
+        raise InvalidToken
+    if dict_id and dict_id != dictionary_id(dictionary):
+        raise ValueError("Blob was compressed with a dictionary this vault no longer has")
+    return decompress(codec, plaintext, dictionary if dict_id else None)
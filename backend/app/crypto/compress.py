@@ -0,0 +1,82 @@
+import re
+import zlib
+from collections import Counter
+
+# Plaintext is compressed before it is encrypted. .env files are small and
+# repetitive across projects (key names, hostnames, URL prefixes), which a
+# per-file compressor cannot see, so the vault can train a shared preset
+# dictionary from its own files. The dictionary is secret-bearing: it lives
+# inside the encrypted key file, and blobs only record its id.
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+DICT_SIZE = 32 * 1024   # zlib only looks back 32 KiB, so a larger dictionary is wasted
+LEVEL = 9
+
+_TOKEN = re.compile(rb"[A-Za-z0-9_.:/@-]{6,}")
+
+
+def dictionary_id(dictionary: bytes | None) -> int:
+    """Id recorded in blob headers; zlib's own Adler-32 of the dictionary, 0 for none."""
+    return zlib.adler32(dictionary) if dictionary else 0
+
+
+def compress(data: bytes, dictionary: bytes | None = None) -> tuple[int, bytes]:
+    """Return (codec, payload), falling back to CODEC_NONE when zlib does not help."""
+    if dictionary:
+        compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    payload = compressor.compress(data) + compressor.flush()
+    if len(payload) >= len(data):
+        return CODEC_NONE, data
+    return CODEC_ZLIB, payload
+
+
+def decompress(codec: int, payload: bytes, dictionary: bytes | None = None) -> bytes:
+    """Undo compress(). Raises ValueError for an unknown codec."""
+    if codec == CODEC_NONE:
+        return payload
+    if codec != CODEC_ZLIB:
+        raise ValueError(f"Unknown compression codec {codec}")
+    if dictionary:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    return decompressor.decompress(payload) + decompressor.flush()
+
+
+def _fragments(sample: bytes) -> set[bytes]:
+    """Candidate dictionary strings of one file: whole lines, ``KEY=`` prefixes and value tokens."""
+    fragments = set()
+    for line in sample.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        fragments.add(line + b"\n")
+        key, sep, value = line.partition(b"=")
+        if sep:
+            fragments.add(key + b"=")
+            fragments.update(_TOKEN.findall(value))
+    return fragments
+
+
+def train_dictionary(samples: list[bytes], size: int = DICT_SIZE) -> bytes:
+    """Build a preset dictionary from strings that recur across several files.
+
+    Each candidate is scored by the bytes it would save (files it appears in
+    beyond the first, times its length). The best candidates go last, since
+    deflate encodes nearer matches more cheaply.
+    """
+    counts = Counter()
+    for sample in samples:
+        counts.update(_fragments(sample))
+    scored = sorted(
+        ((count - 1) * len(fragment), fragment) for fragment, count in counts.items() if count > 1
+    )
+    chosen, seen = [], bytearray()
+    for _, fragment in reversed(scored):
+        if len(seen) + len(fragment) > size or fragment in seen:
+            continue
+        chosen.append(fragment)
+        seen += fragment
+    return b"".join(reversed(chosen))
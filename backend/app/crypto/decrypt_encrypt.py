@@ -1,33 +1,245 @@
+import asyncio
 import base64
-from app.crypto import encrypt_data, decrypt_data
-from app.github import push_file_data, pull_file_data, list_files_in_dir
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.fernet import Fernet, InvalidToken
+from app.config import settings
+from app.crypto.blob import KDF_MASTER_KEY, blob_kdf, is_blob
+from app.crypto.compress import train_dictionary
+from app.crypto.envelope import (
+    SEALED_MAGIC, VaultKeys, decrypt_from_vault, encrypt_for_vault, generate_master_key, is_sealed,
+    wrap_master_key,
+)
+from app.crypto.stream import decrypt_stream_bytes, is_stream
+from app.github import pull_all_file_data, push_all_file_data, push_file_data
 
-def decrypt_and_encrypt_data(data: bytes, old_passphrase: str, new_passphrase: str) -> bytes:
-    """Decrypt with old passphrase, encrypt with new passphrase."""
-    decrypted_data = decrypt_data(data, old_passphrase)
-    return encrypt_data(decrypted_data, new_passphrase)
+# Below this many files the process pool start-up costs more than it saves
+MIN_FILES_FOR_POOL = 8
 
+# Progress of the running (or last) rotation, served by /update-passphrase/progress
+rotation_progress = {"state": "idle", "phase": None, "done": 0, "total": 0, "error": None}
 
-def re_encrypt_all_files(old_passphrase: str, new_passphrase: str) -> None:
-    """Re-encrypt all files in 'encrypted_files' directory, all-or-nothing approach."""
-    files = list_files_in_dir("encrypted_files")
+def migrate_blob(stored: bytes, old_keys: VaultKeys, master_key: bytes) -> bytes | None:
+    """Re-encrypt a stored blob under the master key. Returns None if it already is.
+
+    Blobs already under the master key are left in whatever format they have.
+    When ``master_key`` replaces the vault's current one, every blob is
+    re-encrypted, chunked streams included (as compact blobs).
+    """
+    same_key = old_keys.master_key == master_key
+    new_keys = VaultKeys(old_keys.passphrase, master_key, True, old_keys.dictionary, old_keys.previous_dictionaries)
+    if is_stream(stored):
+        # Chunked blobs only exist in vaults that already have a master key
+        if old_keys.master_key is None:
+            raise ValueError("Chunked blob in a vault without a master key")
+        if same_key:
+            return None
+        return encrypt_for_vault(decrypt_stream_bytes(stored, old_keys.master_key), new_keys)
+    if is_blob(stored):
+        if same_key and blob_kdf(stored) == KDF_MASTER_KEY:
+            return None
+    elif same_key:
+        data = base64.b64decode(stored)
+        if is_sealed(data):
+            try:
+                Fernet(old_keys.master_key).decrypt(data[len(SEALED_MAGIC):])
+                return None
+            except InvalidToken:
+                pass  # A legacy blob whose random salt happens to start with the magic
+    return encrypt_for_vault(decrypt_from_vault(stored, old_keys), new_keys)
+
+
+def _open_blob(stored: bytes, keys: VaultKeys) -> bytes | None:
+    """Decrypt a stored blob for dictionary training (None for chunked streams)."""
+    return None if is_stream(stored) else decrypt_from_vault(stored, keys)
+
+
+def _reseal_blob(plaintext: bytes, keys: VaultKeys) -> bytes:
+    return encrypt_for_vault(plaintext, keys)
+
+
+def _worker_count(file_count: int) -> int:
+    workers = settings.REENCRYPT_WORKERS or os.cpu_count() or 1
+    return max(1, min(workers, file_count))
+
+
+async def _map_files(files: dict[str, bytes], worker, *args) -> dict[str, bytes]:
+    """Run ``worker(data, *args)`` on every file, across processes for large vaults.
+
+    Results are consumed in submission order and progress is updated as each
+    one arrives. The first failure cancels the remaining work and raises.
+    Files for which the worker returns None are left out of the result.
+    """
     updated_files = {}
+    workers = _worker_count(len(files))
+
+    if workers == 1 or len(files) < MIN_FILES_FOR_POOL:
+        for file, stored in files.items():
+            try:
+                new_data = worker(stored, *args)
+            except Exception as e:
+                # If any error occurs, abort the process
+                raise RuntimeError(f"Error re-encrypting {file}: {e}")
+            if new_data is not None:
+                updated_files[file] = new_data
+            rotation_progress["done"] += 1
+        return updated_files
+
+    # spawn: forking a process that already runs threads is unsafe
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = {
+            file: pool.submit(worker, stored, *args)
+            for file, stored in files.items()
+        }
+        for file, future in futures.items():
+            try:
+                new_data = await asyncio.wrap_future(future)
+            except Exception as e:
+                # If any error occurs, abort the process
+                raise RuntimeError(f"Error re-encrypting {file}: {e}")
+            if new_data is not None:
+                updated_files[file] = new_data
+            rotation_progress["done"] += 1
+    finally:
+        # Joining the workers blocks, so it happens off the event loop; after a
+        # failure the files not started yet are cancelled first
+        await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+    return updated_files
+
+
+async def re_encrypt_all_files(keys: VaultKeys, new_passphrase: str, rotate_key: bool = False) -> dict[str, float]:
+    """Change the vault passphrase, all-or-nothing approach.
+
+    A migrated vault only rewraps its master key. That is O(1), but the key
+    itself stays the same: anyone who knew the old passphrase (and can read
+    the old key file from the repo history) can still unwrap it. With
+    ``rotate_key`` a new master key is generated and every file is
+    re-encrypted under it in the same commit as the new key file. Otherwise
+    legacy files are first sealed under the (possibly new) master key.
+    Passing the current passphrase as ``new_passphrase`` just migrates, or
+    just rotates the key. Returns per-phase timings in seconds.
+    """
+    rotation_progress.update(state="running", phase="read", done=0, total=0, error=None)
+    try:
+        if rotate_key:
+            timings = await _migrate_all_files(keys, new_passphrase, generate_master_key())
+        elif keys.master_key is not None and keys.migrated:
+            timings = await _rewrap_master_key(keys, new_passphrase)
+        else:
+            timings = await _migrate_all_files(keys, new_passphrase, keys.master_key or generate_master_key())
+    except Exception as e:
+        rotation_progress.update(state="failed", error=str(e))
+        raise
+    rotation_progress.update(state="done", phase=None)
+    return timings
+
+
+async def _rewrap_master_key(keys: VaultKeys, new_passphrase: str) -> dict[str, float]:
+    timings = {}
+    total_start = time.perf_counter()
+    rotation_progress["phase"] = "write"
+    wrapped = wrap_master_key(keys.master_key, new_passphrase, dictionary=keys.dictionary,
+                              previous_dictionaries=keys.previous_dictionaries)
+    await push_file_data(wrapped, "passphrase")
+    timings["write"] = time.perf_counter() - total_start
+    timings["total"] = time.perf_counter() - total_start
+    print("🎉 Vault master key re-wrapped with the new passphrase.")
+    return timings
+
+
+async def _migrate_all_files(keys: VaultKeys, new_passphrase: str, master_key: bytes) -> dict[str, float]:
+    timings = {}
+    total_start = time.perf_counter()
+
+    # 📥 STEP 1: Read every file in one batch
+    start = time.perf_counter()
+    files, revision = await pull_all_file_data()
+    files.pop("passphrase", None)
+    timings["read"] = time.perf_counter() - start
+
+    # 🥇 STEP 2: Seal legacy files under the master key in memory
+    rotation_progress.update(phase="reencrypt", total=len(files))
+    start = time.perf_counter()
+    updated_files = await _map_files(files, migrate_blob, keys, master_key)
+    timings["reencrypt"] = time.perf_counter() - start
+
+    # ✅ STEP 3: Write the files and the rewrapped key in a single commit only if all succeeded
+    rotation_progress["phase"] = "write"
+    wrapped = wrap_master_key(master_key, new_passphrase, migrated=True, dictionary=keys.dictionary,
+                              previous_dictionaries=keys.previous_dictionaries)
+    updated_files["passphrase"] = wrapped
+    start = time.perf_counter()
+    write_timings = await push_all_file_data(updated_files, "Rotate passphrase", revision)
+    timings["write"] = time.perf_counter() - start
+    timings.update({f"write_{phase}": seconds for phase, seconds in write_timings.items()})
+
+    timings["total"] = time.perf_counter() - total_start
+    print(f"🎉 {len(updated_files) - 1} files re-encrypted under the vault master key.")
+    return timings
+
+
+async def retrain_dictionary(keys: VaultKeys) -> tuple[dict[str, int], dict[str, float]]:
+    """Train a compression dictionary from the vault's files and recompress them all.
+
+    Blobs only keep the id of the dictionary they were compressed with, so every
+    file is rewritten together with the key file in a single commit. The
+    replaced dictionary stays in the key file (up to ``KEEP_DICTIONARIES`` of
+    them), so a write still using the old keys when the commit lands remains
+    readable. Chunked stream blobs are not compressed and are left alone.
+    Returns (sizes, timings).
+    """
+    rotation_progress.update(state="running", phase="read", done=0, total=0, error=None)
+    try:
+        sizes, timings = await _retrain_dictionary(keys)
+    except Exception as e:
+        rotation_progress.update(state="failed", error=str(e))
+        raise
+    rotation_progress.update(state="done", phase=None)
+    return sizes, timings
+
+
+async def _retrain_dictionary(keys: VaultKeys) -> tuple[dict[str, int], dict[str, float]]:
+    timings = {}
+    total_start = time.perf_counter()
+
+    start = time.perf_counter()
+    files, revision = await pull_all_file_data()
+    files.pop("passphrase", None)
+    timings["read"] = time.perf_counter() - start
+
+    rotation_progress.update(phase="decrypt", total=len(files))
+    start = time.perf_counter()
+    plaintexts = await _map_files(files, _open_blob, keys)
+    timings["decrypt"] = time.perf_counter() - start
 
-    # 🥇 STEP 1: Decrypt and re-encrypt in memory
-    for file in files:
-        file_data_b64 = pull_file_data(file)
-        encrypted_data = base64.b64decode(file_data_b64)
+    start = time.perf_counter()
+    dictionary = train_dictionary(list(plaintexts.values()))
+    timings["train"] = time.perf_counter() - start
 
-        try:
-            new_encrypted_data = decrypt_and_encrypt_data(encrypted_data, old_passphrase, new_passphrase)
-            updated_files[file] = base64.b64encode(new_encrypted_data).decode("utf-8")
-        except Exception as e:
-            # If any error occurs, abort the process
-            raise RuntimeError(f"Error re-encrypting {file}: {e}")
+    rotation_progress.update(phase="reencrypt", done=0, total=len(plaintexts))
+    start = time.perf_counter()
+    new_keys = keys.retired(dictionary)
+    updated_files = await _map_files(plaintexts, _reseal_blob, new_keys)
+    timings["reencrypt"] = time.perf_counter() - start
 
-    # ✅ STEP 2: Push all updated files only if all succeeded
-    for file_name, encrypted_data_b64 in updated_files.items():
-        push_file_data(encrypted_data_b64, file_name)
-        print(f"✅ Re-encrypted and pushed {file_name}")
+    rotation_progress["phase"] = "write"
+    sizes = {
+        "files": len(updated_files),
+        "dictionary_bytes": len(dictionary),
+        "plaintext_bytes": sum(len(data) for data in plaintexts.values()),
+        "stored_bytes_before": sum(len(files[name]) for name in updated_files),
+        "stored_bytes_after": sum(len(data) for data in updated_files.values()),
+    }
+    updated_files["passphrase"] = wrap_master_key(keys.master_key, keys.passphrase, dictionary=dictionary,
+                                                  previous_dictionaries=new_keys.previous_dictionaries)
+    start = time.perf_counter()
+    write_timings = await push_all_file_data(updated_files, "Retrain compression dictionary", revision)
+    timings["write"] = time.perf_counter() - start
+    timings.update({f"write_{phase}": seconds for phase, seconds in write_timings.items()})
 
-    print("🎉 All files have been re-encrypted successfully.")
+    timings["total"] = time.perf_counter() - total_start
+    print(f"🎉 {sizes['files']} files recompressed with a {len(dictionary)} byte dictionary.")
+    return sizes, timings
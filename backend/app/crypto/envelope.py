@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass, field
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from app.crypto.blob import (
+    FINGERPRINT_SIZE, blob_dictionary_id, blob_fingerprint, decrypt_blob, encrypt_blob_with_master_key,
+    encrypt_blob_with_passphrase, is_blob,
+)
+from app.crypto.compress import dictionary_id
+from app.crypto.decrypt import decrypt_data
+from app.crypto.keycache import derive_key
+from app.crypto.stream import is_stream, stream_fingerprint
+from app.metrics import timed
+
+# Before the compact format, project blobs encrypted under the vault master key
+# were stored as Base64 of this prefix plus a Fernet token. Legacy passphrase
+# blobs start with a random salt instead.
+SEALED_MAGIC = b"EVE1"
+KEY_FILE_TYPE = "envault-vault-key"
+# Legacy vaults have no master key, so their fingerprint key comes from the passphrase
+FINGERPRINT_SALT = b"envault-fprint-1"
+# Earlier dictionaries kept in the key file, so blobs compressed with them still open
+KEEP_DICTIONARIES = 4
+
+
+@dataclass
+class VaultKeys:
+    """Key material of an unlocked vault.
+
+    ``master_key`` is None for legacy vaults whose passphrase file is only a
+    verifier. ``migrated`` is True once every project blob is sealed under the
+    master key, which is what makes passphrase rotation O(1). ``dictionary``
+    is the vault's trained compression dictionary, if it has one, and
+    ``previous_dictionaries`` the ones it replaced, newest first: a write
+    that was still using the old keys when a retrain committed produces a
+    blob compressed with the previous dictionary, and that must stay readable.
+    """
+    passphrase: str = field(repr=False)
+    master_key: bytes | None = field(default=None, repr=False)
+    migrated: bool = False
+    dictionary: bytes | None = field(default=None, repr=False)
+    previous_dictionaries: tuple[bytes, ...] = field(default=(), repr=False)
+
+    def dictionary_for(self, dict_id: int) -> bytes | None:
+        """The earlier dictionary with this id if a blob needs one, else the current one."""
+        if dict_id and dictionary_id(self.dictionary) != dict_id:
+            for dictionary in self.previous_dictionaries:
+                if dictionary_id(dictionary) == dict_id:
+                    return dictionary
+        return self.dictionary
+
+    def retired(self, dictionary: bytes) -> "VaultKeys":
+        """These keys with ``dictionary`` as the current one, keeping the one it replaces."""
+        previous = [d for d in (self.dictionary, *self.previous_dictionaries) if d and d != dictionary]
+        return VaultKeys(self.passphrase, self.master_key, self.migrated, dictionary,
+                         tuple(previous[:KEEP_DICTIONARIES]))
+
+
+def generate_master_key() -> bytes:
+    """Create a random vault master key."""
+    return Fernet.generate_key()
+
+
+def wrap_master_key(master_key: bytes, passphrase: str, migrated: bool = True,
+                    dictionary: bytes | None = None, previous_dictionaries: tuple[bytes, ...] = ()) -> bytes:
+    """Encrypt the master key (and dictionaries) with the passphrase; this is the passphrase file."""
+    payload = {"type": KEY_FILE_TYPE, "version": 1, "key": master_key.decode("ascii"), "migrated": migrated}
+    if dictionary:
+        payload["dictionary"] = base64.b64encode(dictionary).decode("ascii")
+    if previous_dictionaries:
+        payload["previous_dictionaries"] = [base64.b64encode(d).decode("ascii") for d in previous_dictionaries]
+    return encrypt_blob_with_passphrase(json.dumps(payload).encode("utf-8"), passphrase)
+
+
+def unwrap_key_file(stored: bytes, passphrase: str) -> VaultKeys:
+    """Open the stored passphrase file. Raises InvalidToken if the passphrase is wrong."""
+    if is_blob(stored):
+        plaintext = decrypt_blob(stored, passphrase=passphrase)
+    else:
+        plaintext = decrypt_data(base64.b64decode(stored), passphrase)
+    try:
+        payload = json.loads(plaintext)
+    except ValueError:
+        return VaultKeys(passphrase)  # Legacy verifier with sample content
+    if not isinstance(payload, dict) or payload.get("type") != KEY_FILE_TYPE:
+        return VaultKeys(passphrase)
+    dictionary = base64.b64decode(payload["dictionary"]) if payload.get("dictionary") else None
+    previous = tuple(base64.b64decode(d) for d in payload.get("previous_dictionaries", []))
+    return VaultKeys(passphrase, payload["key"].encode("ascii"), bool(payload.get("migrated")), dictionary, previous)
+
+
+def is_sealed(data: bytes) -> bool:
+    """Whether a Base64-decoded legacy blob looks like it is encrypted under a master key."""
+    return data.startswith(SEALED_MAGIC)
+
+
+def fingerprint_hmac(keys: VaultKeys) -> hmac.HMAC:
+    """Return an HMAC to feed plaintext into; see fingerprint()."""
+    if keys.master_key is not None:
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"envault-fingerprint-v1")
+        key = hkdf.derive(base64.urlsafe_b64decode(keys.master_key))
+    else:
+        key = base64.urlsafe_b64decode(derive_key(keys.passphrase, FINGERPRINT_SALT))
+    return hmac.new(key, digestmod=hashlib.sha256)
+
+
+def fingerprint(data: bytes, keys: VaultKeys) -> bytes:
+    """Keyed hash of plaintext, stored in blob headers to detect no-op writes.
+
+    It is keyed so equal content cannot be confirmed by anyone without the
+    vault keys, and stays the same across passphrase changes of migrated vaults.
+    """
+    mac = fingerprint_hmac(keys)
+    mac.update(data)
+    return mac.digest()[:FINGERPRINT_SIZE]
+
+
+def stored_fingerprint(stored: bytes) -> bytes | None:
+    """Fingerprint recorded in a stored blob (or just its first bytes); None for legacy blobs."""
+    if is_blob(stored):
+        return blob_fingerprint(stored)
+    if is_stream(stored):
+        return stream_fingerprint(stored)
+    return None
+
+
+def encrypt_for_vault(data: bytes, keys: VaultKeys, data_fingerprint: bytes | None = None) -> bytes:
+    """Encrypt project data into a compact blob: under the master key if the vault has one."""
+    with timed("encrypt"):
+        data_fingerprint = data_fingerprint or fingerprint(data, keys)
+        if keys.master_key is None:
+            return encrypt_blob_with_passphrase(data, keys.passphrase, fingerprint=data_fingerprint)
+        return encrypt_blob_with_master_key(data, keys.master_key, keys.dictionary, data_fingerprint)
+
+
+def decrypt_from_vault(stored: bytes, keys: VaultKeys) -> bytes:
+    """Decrypt a stored project blob, compact or in one of the legacy Base64 formats."""
+    with timed("decrypt"):
+        if is_blob(stored):
+            dictionary = keys.dictionary_for(blob_dictionary_id(stored))
+            return decrypt_blob(stored, keys.passphrase, keys.master_key, dictionary)
+        with timed("encode"):
+            data = base64.b64decode(stored)
+        if keys.master_key is not None and is_sealed(data):
+            try:
+                return Fernet(keys.master_key).decrypt(data[len(SEALED_MAGIC):])
+            except InvalidToken:
+                pass  # A legacy blob whose random salt happens to start with the magic
+        return decrypt_data(data, keys.passphrase)
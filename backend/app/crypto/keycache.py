@@ -0,0 +1,115 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.config import settings
+from app.metrics import timed
+
+KDF_ITERATIONS = 100_000
+
+# Per-process secret so the cache never holds a plain digest of a passphrase
+_CACHE_SECRET = os.urandom(32)
+
+
+class KeyCache:
+    """Thread-safe LRU/TTL cache of PBKDF2-derived Fernet keys.
+
+    Entries are keyed by (HMAC of the passphrase, salt). Derived keys are kept
+    in bytearrays so they can be zeroed when evicted, expired or cleared. That
+    only wipes the cache's own copy: ``get`` returns an immutable ``bytes``
+    copy (what Fernet and AESGCM take), which lives until the caller drops it.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[bytes, bytes], tuple[bytearray, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(passphrase: str, salt: bytes) -> tuple[bytes, bytes]:
+        digest = hmac.new(_CACHE_SECRET, passphrase.encode(), hashlib.sha256).digest()
+        return digest, bytes(salt)
+
+    @staticmethod
+    def _wipe(key: bytearray) -> None:
+        for i in range(len(key)):
+            key[i] = 0
+
+    def get(self, passphrase: str, salt: bytes) -> bytes | None:
+        """Return a cached key, or None on a miss or expired entry."""
+        cache_key = self._cache_key(passphrase, salt)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            key, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[cache_key]
+                self._wipe(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return bytes(key)
+
+    def put(self, passphrase: str, salt: bytes, key: bytes) -> None:
+        """Store a derived key, evicting the least recently used entries."""
+        if self.max_size <= 0:
+            return
+        cache_key = self._cache_key(passphrase, salt)
+        with self._lock:
+            old = self._entries.pop(cache_key, None)
+            if old is not None:
+                self._wipe(old[0])
+            self._entries[cache_key] = (bytearray(key), time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_size:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._wipe(evicted)
+
+    def clear(self) -> None:
+        """Wipe and drop every cached key."""
+        with self._lock:
+            for key, _ in self._entries.values():
+                self._wipe(key)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+key_cache = KeyCache(settings.KEY_CACHE_SIZE, settings.KEY_CACHE_TTL)
+
+
+def derive_key(passphrase: str, salt: bytes, iterations: int = KDF_ITERATIONS) -> bytes:
+    """Derive (or fetch from cache) the Fernet key for a passphrase and salt.
+
+    Only keys for the current ``KDF_ITERATIONS`` are cached; other counts
+    come from blob headers written with different parameters.
+    """
+    cacheable = iterations == KDF_ITERATIONS
+    key = key_cache.get(passphrase, salt) if cacheable else None
+    if key is not None:
+        return key
+    with timed("kdf"):
+        key = base64.urlsafe_b64encode(
+            hashlib.pbkdf2_hmac("sha256", passphrase.encode(), salt, iterations, dklen=32)
+        )
+    if cacheable:
+        key_cache.put(passphrase, salt, key)
+    return key
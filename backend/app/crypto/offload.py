@@ -0,0 +1,95 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from app.config import settings
+
+
+class CryptoOverloaded(Exception):
+    """Raised when the crypto pool is full; answered with 503 and Retry-After."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Crypto pool is overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class CryptoPool:
+    """Bounded thread pool for CPU-bound crypto, with admission control.
+
+    PBKDF2, AES-GCM, Fernet and zlib release the GIL while they work, so
+    threads keep the event loop free for other requests. At most ``workers``
+    jobs run and ``queue_depth`` more wait; anything beyond that is rejected
+    at once with CryptoOverloaded instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int, queue_depth: int, retry_after: int = 1):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="crypto")
+        return self._executor
+
+    @staticmethod
+    def _timed(fn, *args, **kwargs) -> tuple[float, object, Exception | None]:
+        """Run a job on a worker thread; returns (seconds, result, error) for the event loop to count."""
+        start = time.perf_counter()
+        try:
+            result, error = fn(*args, **kwargs), None
+        except Exception as e:
+            result, error = None, e
+        return time.perf_counter() - start, result, error
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on the pool, or raise CryptoOverloaded if it is full."""
+        # Counters are only touched from the event loop thread, so no lock is needed
+        if self.in_flight >= self.workers + self.queue_depth:
+            self.rejected += 1
+            raise CryptoOverloaded(self.retry_after)
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            seconds, result, error = await loop.run_in_executor(
+                self.executor, partial(self._timed, fn, *args, **kwargs)
+            )
+        finally:
+            self.in_flight -= 1
+        self.busy_seconds += seconds
+        if error is not None:
+            self.failed += 1
+            raise error
+        self.completed += 1
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "busy_seconds": round(self.busy_seconds, 4),
+        }
+
+
+crypto_pool = CryptoPool(
+    settings.CRYPTO_WORKERS or min(4, os.cpu_count() or 1),
+    settings.CRYPTO_QUEUE_DEPTH,
+    settings.CRYPTO_RETRY_AFTER,
+)
@@ -0,0 +1,165 @@
+import base64
+import os
+import struct
+from collections.abc import AsyncIterator
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# Chunked AES-256-GCM format for files that should never sit whole in memory.
+#
+#   header: magic | version | chunk size | salt | nonce prefix | fingerprint
+#   body:   chunk_0 | chunk_1 | ... | chunk_n   (each = ciphertext + 16-byte tag)
+#
+# Each chunk's nonce is the prefix, a big-endian counter and a "last chunk"
+# flag, and the header is authenticated with every chunk, so reordering,
+# truncation and header tampering are all detected. The per-file key is
+# derived from the vault master key and the salt with HKDF. The fingerprint
+# is a keyed hash of the plaintext used to skip no-op writes (all zeros when
+# unknown; version 1 headers do not have it). The first magic byte is outside
+# the Base64 alphabet, so these blobs never look like the Base64 text used by
+# the older formats.
+STREAM_MAGIC = b"\x89EVS"
+STREAM_VERSION = 2
+CHUNK_SIZE = 64 * 1024
+TAG_SIZE = 16
+FINGERPRINT_SIZE = 16
+_HEADERS = {1: struct.Struct(">4sBI16s7s"), 2: struct.Struct(">4sBI16s7s16s")}
+_HEADER = _HEADERS[STREAM_VERSION]
+HEADER_SIZE = _HEADER.size
+
+
+class StreamError(Exception):
+    """Raised when a chunked stream is malformed, truncated or fails authentication."""
+
+
+def is_stream(data: bytes) -> bool:
+    """Whether a stored blob uses the chunked stream format."""
+    return data.startswith(STREAM_MAGIC)
+
+
+def stream_fingerprint(data: bytes) -> bytes | None:
+    """Return the plaintext fingerprint recorded in a stream header, if any."""
+    if not is_stream(data) or len(data) < HEADER_SIZE or data[len(STREAM_MAGIC)] != STREAM_VERSION:
+        return None
+    fingerprint = _HEADER.unpack(data[:HEADER_SIZE])[5]
+    return None if fingerprint == bytes(FINGERPRINT_SIZE) else fingerprint
+
+
+def _aead(master_key: bytes, salt: bytes) -> AESGCM:
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"envault-stream-v1")
+    return AESGCM(hkdf.derive(base64.urlsafe_b64decode(master_key)))
+
+
+def _nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    return prefix + struct.pack(">IB", counter, last)
+
+
+class StreamEncryptor:
+    """Incremental encryptor: feed plaintext with update(), then call finalize()."""
+
+    def __init__(self, master_key: bytes, chunk_size: int = CHUNK_SIZE, fingerprint: bytes | None = None):
+        salt, self._prefix = os.urandom(16), os.urandom(7)
+        self.header = _HEADER.pack(STREAM_MAGIC, STREAM_VERSION, chunk_size, salt, self._prefix,
+                                   fingerprint or bytes(FINGERPRINT_SIZE))
+        self._aead = _aead(master_key, salt)
+        self._chunk_size = chunk_size
+        self._counter = 0
+        self._buffer = bytearray()
+
+    def _seal(self, chunk: bytes, last: bool) -> bytes:
+        sealed = self._aead.encrypt(_nonce(self._prefix, self._counter, last), chunk, self.header)
+        self._counter += 1
+        return sealed
+
+    def update(self, data: bytes) -> bytes:
+        self._buffer += data
+        out = []
+        # Hold back a full chunk: it might turn out to be the last one
+        while len(self._buffer) > self._chunk_size:
+            out.append(self._seal(bytes(self._buffer[:self._chunk_size]), last=False))
+            del self._buffer[:self._chunk_size]
+        return b"".join(out)
+
+    def finalize(self) -> bytes:
+        return self._seal(bytes(self._buffer), last=True)
+
+
+class StreamDecryptor:
+    """Incremental decryptor: feed ciphertext with update(), then call finalize()."""
+
+    def __init__(self, master_key: bytes):
+        self._master_key = master_key
+        self._header: bytes | None = None
+        self._aead: AESGCM | None = None
+        self._counter = 0
+        self._buffer = bytearray()
+
+    def _read_header(self) -> bool:
+        """Parse the header once enough bytes have arrived; returns False until then."""
+        header_struct = _HEADERS.get(self._buffer[len(STREAM_MAGIC)])
+        if header_struct is None or not self._buffer.startswith(STREAM_MAGIC):
+            raise StreamError("Not a supported envault stream")
+        if len(self._buffer) < header_struct.size:
+            return False
+        _, _, chunk_size, salt, self._prefix, *_ = header_struct.unpack(bytes(self._buffer[:header_struct.size]))
+        if chunk_size <= 0:
+            raise StreamError("Not a supported envault stream")
+        self._header = bytes(self._buffer[:header_struct.size])
+        self._sealed_size = chunk_size + TAG_SIZE
+        self._aead = _aead(self._master_key, salt)
+        del self._buffer[:header_struct.size]
+        return True
+
+    def _open(self, chunk: bytes, last: bool) -> bytes:
+        try:
+            plain = self._aead.decrypt(_nonce(self._prefix, self._counter, last), chunk, self._header)
+        except InvalidTag:
+            raise StreamError("Stream chunk failed authentication")
+        self._counter += 1
+        return plain
+
+    def update(self, data: bytes) -> bytes:
+        self._buffer += data
+        if self._header is None:
+            if len(self._buffer) <= len(STREAM_MAGIC) or not self._read_header():
+                return b""
+        out = []
+        while len(self._buffer) > self._sealed_size:
+            out.append(self._open(bytes(self._buffer[:self._sealed_size]), last=False))
+            del self._buffer[:self._sealed_size]
+        return b"".join(out)
+
+    def finalize(self) -> bytes:
+        if self._header is None or len(self._buffer) < TAG_SIZE:
+            raise StreamError("Stream is truncated")
+        return self._open(bytes(self._buffer), last=True)
+
+
+async def encrypt_stream(chunks: AsyncIterator[bytes], master_key: bytes,
+                         fingerprint: bytes | None = None) -> AsyncIterator[bytes]:
+    """Encrypt an async stream of plaintext chunks."""
+    encryptor = StreamEncryptor(master_key, fingerprint=fingerprint)
+    yield encryptor.header
+    async for chunk in chunks:
+        sealed = encryptor.update(chunk)
+        if sealed:
+            yield sealed
+    yield encryptor.finalize()
+
+
+async def decrypt_stream(chunks: AsyncIterator[bytes], master_key: bytes) -> AsyncIterator[bytes]:
+    """Decrypt an async stream of ciphertext chunks."""
+    decryptor = StreamDecryptor(master_key)
+    async for chunk in chunks:
+        plain = decryptor.update(chunk)
+        if plain:
+            yield plain
+    yield decryptor.finalize()
+
+
+def decrypt_stream_bytes(data: bytes, master_key: bytes) -> bytes:
+    """Decrypt a whole chunked blob that is already in memory."""
+    decryptor = StreamDecryptor(master_key)
+    return decryptor.update(data) + decryptor.finalize()
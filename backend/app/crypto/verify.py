@@ -1,24 +1,30 @@
-import base64
-import hashlib
 from cryptography.fernet import Fernet, InvalidToken
-from app.github import push_file_data, pull_file_data
+from app.crypto.envelope import VaultKeys, unwrap_key_file
+from app.crypto.keycache import derive_key
+from app.crypto.offload import crypto_pool
+from app.github import pull_file_data
 
 def verify(data: bytes, passphrase: str) -> bool:
     """Verify that the passphrase can successfully decrypt the data."""
     salt = data[:16]           # First 16 bytes = salt
     encrypted = data[16:]      # The rest = actual encrypted data
-    key = base64.urlsafe_b64encode(
-        hashlib.pbkdf2_hmac("sha256", passphrase.encode(), salt, 100_000, dklen=32)
-    )
-    f = Fernet(key)
+    f = Fernet(derive_key(passphrase, salt))
 
     try:
         f.decrypt(encrypted)  # Will raise InvalidToken if passphrase is wrong
         return True
     except InvalidToken:
         return False
+
+async def unlock_vault(passphrase: str) -> VaultKeys | None:
+    """Open the passphrase file; returns the vault keys, or None if the passphrase is wrong."""
+    retrieved_data = await pull_file_data("passphrase")
+    if retrieved_data is None:
+        return None
+    try:
+        return await crypto_pool.run(unwrap_key_file, retrieved_data, passphrase)
+    except InvalidToken:
+        return None
     
 async def verify_passphrase(passphrase: str) -> bool:
-    retrieved_b64 = pull_file_data("passphrase")
-    retrieved_data = base64.b64decode(retrieved_b64)
-    return verify(retrieved_data, passphrase)
\ No newline at end of file
+    return await unlock_vault(passphrase) is not None
@@ -0,0 +1,145 @@
+import re
+from dataclasses import dataclass
+
+# KEY=value, optionally prefixed with "export", as read by python-dotenv and docker compose
+_ASSIGNMENT = re.compile(r"^(?P<export>\s*(?:export\s+)?)(?P<key>[A-Za-z_][A-Za-z0-9_.-]*)\s*=\s*(?P<value>.*)$", re.DOTALL)
+KEY_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_.-]*")  # use fullmatch: "$" would accept a trailing newline
+_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", '"': '"', "\\": "\\"}
+
+
+@dataclass
+class _Line:
+    raw: str                  # exactly as it appears in the file, line endings included; possibly several lines
+    key: str | None = None    # None for comments, blank lines and unparseable lines
+    value: str | None = None
+    export: str = ""
+
+
+def _parse_double_quoted(body: str) -> str | None:
+    """Unescape a double-quoted value; returns None if it is unterminated."""
+    out, i = [], 0
+    while i < len(body):
+        ch = body[i]
+        if ch == "\\" and i + 1 < len(body):
+            out.append(_ESCAPES.get(body[i + 1], "\\" + body[i + 1]))
+            i += 2
+        elif ch == '"':
+            return "".join(out)
+        else:
+            out.append(ch)
+            i += 1
+    return None
+
+
+def _parse_value(text: str) -> str | None:
+    """Parse the value part of an assignment; None means a quote is still open."""
+    if text.startswith('"'):
+        return _parse_double_quoted(text[1:])
+    if text.startswith("'"):
+        end = text.find("'", 1)
+        return None if end == -1 else text[1:end]
+    return re.split(r"\s+#", text, maxsplit=1)[0].strip()  # Drop an inline comment
+
+
+def _line_ending(physical: str) -> str:
+    """The terminator of a line from ``splitlines(keepends=True)``; empty for an unterminated last line."""
+    body = physical.splitlines()[0] if physical else ""
+    return physical[len(body):]
+
+
+def format_value(value: str) -> str:
+    """Render a value, quoting it only when a bare value would not read back the same."""
+    if value and re.fullmatch(r"[A-Za-z0-9_./:@%+,=~^-]+", value):
+        return value
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+    return f'"{escaped}"'
+
+
+class EnvFile:
+    """A parsed .env file that keeps comments, blank lines and ordering.
+
+    Only lines whose keys are set or unset are rewritten, so a patch leaves
+    the rest of the file byte-for-byte intact. As with dotenv, the last
+    assignment of a duplicated key wins.
+    """
+
+    def __init__(self, lines: list[_Line], newline: str = "\n"):
+        self._lines = lines
+        self._newline = newline  # for lines that are added
+
+    @classmethod
+    def parse(cls, text: str) -> "EnvFile":
+        lines, pending = [], None
+        newline = next((_line_ending(physical) for physical in text.splitlines(keepends=True)
+                        if _line_ending(physical)), "\n")
+        for physical in text.splitlines(keepends=True):
+            if pending is not None:
+                pending.append(physical)
+            else:
+                pending = [physical]
+            # Matched without line endings; a multi-line value is joined with "\n"
+            logical = "\n".join(line[:len(line) - len(_line_ending(line))] for line in pending)
+            raw = "".join(pending)
+            match = _ASSIGNMENT.match(logical)
+            if match is None:
+                lines.append(_Line(raw))
+                pending = None
+                continue
+            value = _parse_value(match["value"])
+            if value is None:
+                continue  # Quoted value continues on the next line
+            lines.append(_Line(raw, match["key"], value, match["export"]))
+            pending = None
+        if pending is not None:
+            lines.extend(_Line(physical) for physical in pending)  # Unterminated quote: keep as-is
+        return cls(lines, newline)
+
+    def _index(self, key: str) -> int | None:
+        for i in range(len(self._lines) - 1, -1, -1):
+            if self._lines[i].key == key:
+                return i
+        return None
+
+    def get(self, key: str) -> str | None:
+        i = self._index(key)
+        return None if i is None else self._lines[i].value
+
+    def to_dict(self) -> dict[str, str]:
+        """Effective values in file order."""
+        values = {}
+        for line in self._lines:
+            if line.key is not None:
+                values.pop(line.key, None)
+                values[line.key] = line.value
+        return values
+
+    def set(self, key: str, value: str) -> bool:
+        """Set a key, appending it if new. Returns True if the file changed."""
+        if not KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"Invalid key name: {key!r}")
+        i = self._index(key)
+        if i is not None and self._lines[i].value == value:
+            return False
+        if i is None:
+            last = self._lines[-1] if self._lines else None
+            if last is not None and not _line_ending(last.raw):
+                # Keep the file's missing final newline: the new last line goes without one
+                last.raw += self._newline
+                self._lines.append(_Line(f"{key}={format_value(value)}", key, value))
+            else:
+                self._lines.append(_Line(f"{key}={format_value(value)}{self._newline}", key, value))
+        else:
+            old = self._lines[i]
+            end = _line_ending(old.raw.splitlines(keepends=True)[-1])
+            self._lines[i] = _Line(f"{old.export}{key}={format_value(value)}{end}", key, value, old.export)
+        return True
+
+    def unset(self, key: str) -> bool:
+        """Remove every assignment of a key. Returns True if the file changed."""
+        kept = [line for line in self._lines if line.key != key]
+        changed = len(kept) != len(self._lines)
+        self._lines = kept
+        return changed
+
+    def dumps(self) -> str:
+        return "".join(line.raw for line in self._lines)
@@ -1,2 +1,3 @@
-from .github import push_file_data, pull_file_data, list_projects_in_dir, delete_file,passphrase_exists, create_passphrase_file, list_files_in_dir, project_exists
-from .upload_download import encrypt_upload, decrypt_download
\ No newline at end of file
+from .github import push_file_data, pull_file_data, pull_file_version, list_projects_in_dir, delete_file,passphrase_exists, create_passphrase_file, list_files_in_dir, project_exists, pull_all_file_data, push_all_file_data, push_file_stream, pull_file_stream, project_history, restore_file_version, pull_file_at, project_sha
+from .scheduler import RateLimited, bulk_priority
+from .upload_download import encrypt_upload, decrypt_download, decrypt_download_version, decrypt_download_many, encrypt_upload_stream, decrypt_download_stream, read_env_file, patch_env_file, restore_version
\ No newline at end of file
@@ -0,0 +1,300 @@
+import base64
+import json
+from collections.abc import AsyncIterator
+import httpx
+from app.config import settings
+from app.github.scheduler import RequestScheduler
+from app.metrics import record_github_response, timed
+
+GITHUB_API_URL = "https://api.github.com"
+MAX_RATE_LIMIT_RETRIES = 2
+
+
+class GitHubError(Exception):
+    """Raised when the GitHub API returns an unexpected error response."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"GitHub API error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class GitHubClient:
+    """Asyncio-native client for the GitHub contents API of a single repo.
+
+    One pooled ``httpx.AsyncClient`` is shared by every request so connections
+    are kept alive between calls instead of re-doing the TLS handshake. Every
+    request goes through a RequestScheduler, which bounds concurrency, serves
+    reads before bulk traffic and backs off when GitHub rate limits us.
+    """
+
+    def __init__(self, token: str, repo: str, branch: str = "",
+                 transport: httpx.AsyncBaseTransport | None = None,
+                 scheduler: RequestScheduler | None = None):
+        self.repo = repo
+        self.branch = branch
+        self.scheduler = scheduler or RequestScheduler(
+            settings.GITHUB_CONCURRENCY, settings.GITHUB_RATE_RESERVE, settings.GITHUB_MAX_WAIT
+        )
+        self._token = token
+        self._transport = transport
+        self._http: httpx.AsyncClient | None = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=GITHUB_API_URL,
+                headers={
+                    "Authorization": f"Bearer {self._token}",
+                    "Accept": "application/vnd.github+json",
+                    "X-GitHub-Api-Version": "2022-11-28",
+                },
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                transport=self._transport,
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _send(self, request: httpx.Request, stream: bool = False) -> httpx.Response:
+        """Send a request through the scheduler, retrying it after rate-limit responses.
+
+        Requests with a streamed body cannot be replayed and are sent once.
+        """
+        replayable = isinstance(request.stream, httpx.ByteStream)
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            async with self.scheduler.slot():
+                response = await self.http.send(request, stream=stream)
+            if stream and response.status_code in (403, 429):
+                await response.aread()
+            record_github_response(response.status_code, response.headers)
+            delay = self.scheduler.record(response)
+            if delay is None or not replayable or attempt == MAX_RATE_LIMIT_RETRIES:
+                break
+            print(f"GitHub rate limit hit, retrying {request.method} {request.url.path} in {delay:.0f}s.")
+            await response.aclose()
+        return response
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request relative to the repo URL and raise on error statuses."""
+        response = await self._send(self.http.build_request(method, f"/repos/{self.repo}{path}", **kwargs))
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            raise GitHubError(response.status_code, message)
+        return response
+
+    async def get_file(self, path: str) -> tuple[bytes, str] | None:
+        """Return (content, sha) of a file, or None if it does not exist."""
+        try:
+            response = await self.request("GET", f"/contents/{path}")
+        except GitHubError as e:
+            if e.status_code == 404:
+                return None
+            raise
+        item = response.json()
+        if item.get("encoding") == "base64":
+            with timed("encode"):
+                return base64.b64decode(item["content"]), item["sha"]
+        # Files over 1 MB come back without inline content; fetch them raw
+        raw = await self.request(
+            "GET", f"/contents/{path}", headers={"Accept": "application/vnd.github.raw"}
+        )
+        return raw.content, item["sha"]
+
+    async def get_file_if_changed(self, path: str, etag: str | None) -> tuple[bytes | None, str | None, str | None] | None:
+        """Conditionally fetch a file; returns (content, sha, etag), or None if missing.
+
+        When the file still matches ``etag`` GitHub answers 304, which does not
+        count against the rate limit, and content and sha come back as None.
+        """
+        headers = {"If-None-Match": etag} if etag else None
+        try:
+            response = await self.request("GET", f"/contents/{path}", headers=headers)
+        except GitHubError as e:
+            if e.status_code == 404:
+                return None
+            raise
+        if response.status_code == 304:
+            return None, None, etag
+        item = response.json()
+        new_etag = response.headers.get("ETag")
+        if item.get("encoding") == "base64":
+            with timed("encode"):
+                return base64.b64decode(item["content"]), item["sha"], new_etag
+        raw = await self.request(
+            "GET", f"/contents/{path}", headers={"Accept": "application/vnd.github.raw"}
+        )
+        return raw.content, item["sha"], new_etag
+
+    async def put_file(self, path: str, content: bytes, message: str, sha: str | None = None) -> dict:
+        """Create or update a file. Pass the current sha to update an existing file."""
+        with timed("encode"):
+            body = {"message": message, "content": base64.b64encode(content).decode("ascii")}
+        if sha:
+            body["sha"] = sha
+        response = await self.request("PUT", f"/contents/{path}", json=body)
+        return response.json()
+
+    async def put_file_stream(self, path: str, chunks: AsyncIterator[bytes], message: str,
+                              sha: str | None = None) -> dict:
+        """Like put_file, but Base64-encodes the content into the request body as it streams."""
+        fields = {"message": message}
+        if sha:
+            fields["sha"] = sha
+        prefix = json.dumps(fields)[:-1] + ', "content": "'
+
+        async def body():
+            yield prefix.encode("utf-8")
+            pending = bytearray()
+            async for chunk in chunks:
+                pending += chunk
+                cut = len(pending) - len(pending) % 3  # Encode whole 3-byte groups only
+                if cut:
+                    yield base64.b64encode(bytes(pending[:cut]))
+                    del pending[:cut]
+            yield base64.b64encode(bytes(pending)) + b'"}'
+
+        response = await self.request(
+            "PUT", f"/contents/{path}", content=body(), headers={"Content-Type": "application/json"}
+        )
+        return response.json()
+
+    async def stream_file(self, path: str) -> AsyncIterator[bytes] | None:
+        """Stream the raw content of a file, or return None if it does not exist."""
+        request = self.http.build_request(
+            "GET", f"/repos/{self.repo}/contents/{path}", headers={"Accept": "application/vnd.github.raw"}
+        )
+        response = await self._send(request, stream=True)
+        if response.status_code == 404:
+            await response.aclose()
+            return None
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+            raise GitHubError(response.status_code, response.text)
+
+        async def body():
+            try:
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+            finally:
+                await response.aclose()
+
+        return body()
+
+    async def delete_file(self, path: str, message: str, sha: str) -> dict:
+        """Delete a file at the given sha and return the API response (with the commit)."""
+        response = await self.request("DELETE", f"/contents/{path}", json={"message": message, "sha": sha})
+        return response.json()
+
+    async def list_dir(self, path: str) -> list[dict]:
+        """Return the directory listing for a path, or [] if it does not exist."""
+        try:
+            response = await self.request("GET", f"/contents/{path}")
+        except GitHubError as e:
+            if e.status_code == 404:
+                return []
+            raise
+        items = response.json()
+        return items if isinstance(items, list) else []
+
+    # --- Git Data API (used for batched, single-commit writes) ---
+
+    async def get_branch(self) -> str:
+        """Return the configured branch, looking up the repo default once."""
+        if not self.branch:
+            self.branch = (await self.request("GET", "")).json()["default_branch"]
+        return self.branch
+
+    async def get_head(self) -> tuple[str, str]:
+        """Return (commit sha, tree sha) of the branch head."""
+        commit_sha, _ = await self.get_ref()
+        commit = await self.get_commit(commit_sha)
+        return commit_sha, commit["tree"]["sha"]
+
+    async def get_ref(self, etag: str | None = None) -> tuple[str | None, str | None]:
+        """Return (commit sha, etag) of the branch head.
+
+        With an ``etag`` the request is conditional: an unchanged ref answers
+        304, which does not count against the rate limit, and (None, etag) is
+        returned.
+        """
+        branch = await self.get_branch()
+        headers = {"If-None-Match": etag} if etag else None
+        response = await self.request("GET", f"/git/ref/heads/{branch}", headers=headers)
+        if response.status_code == 304:
+            return None, etag
+        return response.json()["object"]["sha"], response.headers.get("ETag")
+
+    async def get_commit(self, commit_sha: str) -> dict:
+        """Return a commit object."""
+        return (await self.request("GET", f"/git/commits/{commit_sha}")).json()
+
+    async def list_commits(self, sha: str, per_page: int = 100) -> list[dict]:
+        """Return up to ``per_page`` commits reachable from ``sha``, newest first, starting with it."""
+        response = await self.request("GET", "/commits", params={"sha": sha, "per_page": per_page})
+        return response.json()
+
+    async def get_tree(self, tree_sha: str, recursive: bool = True) -> list[dict]:
+        """Return the entries of a tree, recursively by default."""
+        params = {"recursive": "1"} if recursive else None
+        response = await self.request("GET", f"/git/trees/{tree_sha}", params=params)
+        return response.json()["tree"]
+
+    async def walk_tree(self, tree_sha: str, prefix: str = "") -> list[dict]:
+        """Return every entry below a tree, with paths relative to it.
+
+        One recursive listing normally does it; when GitHub truncates that
+        (over 100,000 entries or 7 MB), subtrees are listed one by one.
+        """
+        body = (await self.request("GET", f"/git/trees/{tree_sha}", params={"recursive": "1"})).json()
+        if not body.get("truncated"):
+            return [dict(entry, path=prefix + entry["path"]) for entry in body["tree"]]
+        entries = []
+        for entry in await self.get_tree(tree_sha, recursive=False):
+            entries.append(dict(entry, path=prefix + entry["path"]))
+            if entry["type"] == "tree":
+                entries.extend(await self.walk_tree(entry["sha"], f"{prefix}{entry['path']}/"))
+        return entries
+
+    async def get_blob(self, blob_sha: str) -> bytes:
+        """Return the raw content of a blob."""
+        response = await self.request(
+            "GET", f"/git/blobs/{blob_sha}", headers={"Accept": "application/vnd.github.raw"}
+        )
+        return response.content
+
+    async def create_blob(self, content: bytes) -> str:
+        """Upload a blob and return its sha."""
+        with timed("encode"):
+            encoded = base64.b64encode(content).decode("ascii")
+        response = await self.request("POST", "/git/blobs", json={"content": encoded, "encoding": "base64"})
+        return response.json()["sha"]
+
+    async def create_tree(self, base_tree: str, entries: list[dict]) -> str:
+        """Create a tree on top of ``base_tree`` and return its sha."""
+        response = await self.request("POST", "/git/trees", json={"base_tree": base_tree, "tree": entries})
+        return response.json()["sha"]
+
+    async def create_commit(self, message: str, tree_sha: str, parents: list[str]) -> str:
+        """Create a commit object and return its sha."""
+        response = await self.request("POST", "/git/commits", json={
+            "message": message, "tree": tree_sha, "parents": parents,
+        })
+        return response.json()["sha"]
+
+    async def update_ref(self, commit_sha: str) -> None:
+        """Fast-forward the branch to a commit. Fails if the branch moved."""
+        branch = await self.get_branch()
+        await self.request("PATCH", f"/git/refs/heads/{branch}", json={"sha": commit_sha, "force": False})
+
+
+client = GitHubClient(settings.GH_TOKEN, settings.GH_REPO, settings.GH_BRANCH)
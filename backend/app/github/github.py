@@ -1,43 +1,42 @@
-import os
-from github import Github
 from app.config import settings
-import pprint
-from app.crypto import encrypt_data
-import base64
+from app.crypto.envelope import generate_master_key, wrap_master_key
+from app.storage import get_storage
+from app.storage.history import Version
+from app.storage.blobcache import git_blob_sha
+from app.github.scheduler import SingleFlight, bulk_priority
+from app.metrics import timed
+from collections.abc import AsyncIterator
 
-GH_TOKEN = settings.GH_TOKEN
 GH_REPO = settings.GH_REPO
 
-g = Github(GH_TOKEN)
+# Identical reads already in flight (e.g. every client fetching "passphrase"
+# at start-up) share one storage call instead of each making their own.
+_reads = SingleFlight()
 
-def get_repo():
-    """Get the configured repo. If it doesn't exist, create it."""
-    try:
-        return g.get_repo(GH_REPO)
-    except Exception:
-        print(f"Repository {GH_REPO} not found.")
 
-def get_passphrase_file() -> str | None:
+async def get_passphrase_file() -> bytes | None:
     """Fetch the passphrase file from the repo, if it exists."""
     try:
-        decrypted_data = pull_file_data("passphrase")
-        print("passphrase.env.enc file found.")
-        return decrypted_data
+        decrypted_data = await pull_file_data("passphrase")
     except Exception:
+        decrypted_data = None
+    if decrypted_data is None:
         print("No passphrase.env.enc found in the repo.")
         return None
+    print("passphrase.env.enc file found.")
+    return decrypted_data
 
-def create_passphrase_file(passphrase: str) -> bool:
+async def create_passphrase_file(passphrase: str) -> bool:
     """Create an encrypted passphrase file in the repo.
     Returns:
         bool: True if created successfully, False otherwise.
     """
-    sample_content = "This is a sample passphrase file."
-    encrypted_data = encrypt_data(sample_content.encode("utf-8"), passphrase)
-    encrypted_b64 = base64.b64encode(encrypted_data).decode("utf-8")
+    # New vaults use envelope encryption from the start: the passphrase file
+    # holds the wrapped master key that every project is encrypted under.
+    encrypted_data = wrap_master_key(generate_master_key(), passphrase)
 
     try:
-        push_file_data(encrypted_b64, "passphrase")
+        await push_file_data(encrypted_data, "passphrase")
         print("Created passphrase.env.enc in the repo.")
         return True
     except Exception as e:
@@ -45,105 +44,144 @@ def create_passphrase_file(passphrase: str) -> bool:
         return False
 
 
-def passphrase_exists() -> bool:
+async def passphrase_exists() -> bool:
     """Check if the passphrase file exists in the repo."""
-    return get_passphrase_file() is not None
-
-def push_file_data(data: str, project_name: str):
-    """Push a Base64-encoded string data to the GitHub repo."""
-    repo = get_repo()
-    path_in_repo = f"encrypted_files/{project_name}.env.enc"
+    return await get_passphrase_file() is not None
 
-    try:
-        contents = repo.get_contents(path_in_repo)
-        repo.update_file(
-            contents.path,
-            f"Update {project_name}.env.enc",
-            data,
-            contents.sha
-        )
-        print(f"Updated {project_name}.env.enc.")
-    except Exception as e:
-        repo.create_file(
-            path_in_repo,
-            f"Add {project_name}.env.enc",
-            data
-        )
-        print(f"Created {project_name}.env.enc.")
+async def push_file_data(data: bytes, project_name: str, base_sha: str | None = None) -> str | None:
+    """Push an encrypted blob to the configured storage backend.
 
+    Pass ``base_sha`` to only overwrite that version (raises StorageConflict
+    otherwise). Returns the sha of the new blob.
+    """
+    with timed("storage_write"):
+        sha = await get_storage().push(project_name, data, base_sha)
+    print(f"Pushed {project_name}.env.enc.")
+    return sha
 
-def delete_file(project_name: str) -> bool:
-    """Delete an encrypted .env file from the GitHub repo."""
-    repo = get_repo()
-    path_in_repo = f"encrypted_files/{project_name}.env.enc"
 
+async def delete_file(project_name: str) -> bool:
+    """Delete an encrypted .env file from the configured storage backend."""
     try:
-        # Get the contents
-        contents = repo.get_contents(path_in_repo)
-
-        # Delete the file
-        repo.delete_file(
-            contents.path,
-            f"Delete {project_name}.env.enc",
-            contents.sha
-        )
-        print(f"Deleted {project_name}.env.enc from the repository.")
-        return True
+        deleted = await get_storage().delete(project_name)
     except Exception as e:
         print(f"Failed to delete {project_name}.env.enc: {e}")
         return False
+    if deleted:
+        print(f"Deleted {project_name}.env.enc from the repository.")
+    else:
+        print(f"Failed to delete {project_name}.env.enc: not found")
+    return deleted
 
 
-def pull_file_data(project_name: str) -> str | None:
-    """Pull a Base64-encoded string data from the GitHub repo."""
-    repo = get_repo()
-    path_in_repo = f"encrypted_files/{project_name}.env.enc"
-    
-    try:
-        contents = repo.get_contents(path_in_repo)
-        print(f"Retrieved {project_name}.env.enc.")
-        return contents.decoded_content.decode("utf-8")
-    except Exception as e:
+async def pull_file_data(project_name: str) -> bytes | None:
+    """Pull an encrypted blob from the configured storage backend."""
+    version = await pull_file_version(project_name)
+    return version[0] if version is not None else None
+
+async def pull_file_version(project_name: str) -> tuple[bytes, str] | None:
+    """Pull the stored bytes of a file together with its blob sha.
+
+    Stored bytes are binary, or Base64 text for blobs written before the compact format.
+    """
+    return await _reads.do(("pull", project_name), lambda: _pull_file_version(project_name))
+
+async def _pull_file_version(project_name: str) -> tuple[bytes, str] | None:
+    with timed("storage_read"):
+        data = await get_storage().pull(project_name)
+    if data is None:
+        print(f"No {project_name}.env.enc found in the repo.")
+        return None
+    print(f"Retrieved {project_name}.env.enc.")
+    return data, git_blob_sha(data)
+
+async def push_file_stream(chunks: AsyncIterator[bytes], project_name: str,
+                           base_sha: str | None = None) -> str | None:
+    """Push a binary blob from an async stream of chunks. Returns the new blob sha."""
+    with timed("storage_write"):  # Includes producing the chunks, i.e. encryption
+        sha = await get_storage().push_stream(project_name, chunks, base_sha)
+    print(f"Pushed {project_name}.env.enc (streamed).")
+    return sha
+
+async def pull_file_stream(project_name: str) -> AsyncIterator[bytes] | None:
+    """Pull the stored bytes of a file as an async stream of chunks."""
+    with timed("storage_read"):  # Until the stream is open; the body is read as it is served
+        chunks = await get_storage().pull_stream(project_name)
+    if chunks is None:
         print(f"No {project_name}.env.enc found in the repo.")
+    return chunks
+
+async def pull_all_file_data() -> tuple[dict[str, bytes], str | None]:
+    """Pull the stored bytes of every file in one batch, plus a revision marker."""
+    with timed("storage_read"), bulk_priority():
+        files, revision = await get_storage().pull_all()
+    print(f"Retrieved {len(files)} files in one batch.")
+    return files, revision
+
+async def push_all_file_data(files: dict[str, bytes], message: str,
+                             revision: str | None = None) -> dict[str, float]:
+    """Push several encrypted blobs as one atomic write. Returns phase timings."""
+    with timed("storage_write"), bulk_priority():
+        timings = await get_storage().push_many(files, message, revision)
+    print(f"Pushed {len(files)} files in one batch.")
+    return timings
+
+async def project_history(project_name: str) -> list[Version] | None:
+    """Versions of a project, newest first; None if the storage backend keeps no history."""
+    with timed("history"):
+        return await _reads.do(("history", project_name), lambda: get_storage().history(project_name))
+
+async def pull_file_at(project_name: str, commit: str) -> bytes:
+    """Stored bytes of the version of a project written by ``commit``; KeyError if there is none."""
+    with timed("storage_read"):
+        return await get_storage().pull_version(project_name, commit)
+
+async def restore_file_version(project_name: str, commit: str) -> str | None:
+    """Make the version of a project written by ``commit`` current again. Returns its blob sha."""
+    with timed("storage_write"):
+        sha = await get_storage().restore(project_name, commit)
+    print(f"Restored {project_name}.env.enc to {commit[:7]}.")
+    return sha
+
+def project_url(project_name: str) -> str | None:
+    """Link shown next to a project in the web UI (GitHub backend only)."""
+    if get_storage().name != "github" or not GH_REPO:
         return None
-    
-def list_projects_in_dir(directory: str) -> list:
-    """List all file names in a specific directory of the GitHub repo."""
-    repo = get_repo()
+    return "https://github.com/" + GH_REPO.split('/')[0] + '/' + project_name
+
+async def list_projects_in_dir() -> list:
+    """List all projects stored in the configured storage backend."""
     try:
-        contents = repo.get_contents(directory)
+        files = await _list_files()
     except Exception as e:
-        print(f"Error accessing directory {directory}: {e}")
+        print(f"Error listing projects: {e}")
         return []
-    
+
     projects = []
-    # pprint.pprint(contents[0].__dict__)
     passphrase = {}
-    for item in contents:
-        if item.type == "file" and item.name.endswith('.env.enc'):
-            name = item.name.split('.env')[0] 
-            url = "https://github.com/" + GH_REPO.split('/')[0] + '/' + name
-            project = { "name": name, "url": url, "size" : item.size }
-            if name == "passphrase":
-                passphrase = project
-            else:
-                projects.append(project)
+    for item in files:
+        project = { "name": item.name, "url": project_url(item.name), "size" : item.size, "modified": item.modified,
+                    "sha": item.sha }
+        if item.name == "passphrase":
+            passphrase = project
+        else:
+            projects.append(project)
     if passphrase:
         projects.insert(0, passphrase)  # Insert passphrase at the top of the list
     return projects
 
-def list_files_in_dir(directory: str = "encrypted_files") -> list:
-    """List all file names in a specific directory of the GitHub repo."""
-    repo = get_repo()
-    contents = repo.get_contents(directory)
-    filenames = []
-    for item in contents:
-        if item.type == "file" and item.name.endswith('.env.enc'):
-            filenames.append(item.name.split('.env')[0])
-            
-    return filenames
-
-def project_exists(project_name: str) -> bool:
-    """Check if a project (i.e., .env file) exists in the GitHub repo."""
-    filenames = list_files_in_dir()
-    return project_name in filenames
\ No newline at end of file
+async def _list_files() -> list:
+    with timed("list"):
+        return await _reads.do(("list",), get_storage().list)
+
+async def list_files_in_dir() -> list:
+    """List all project names in the configured storage backend."""
+    return [item.name for item in await _list_files()]
+
+async def project_sha(project_name: str) -> str | None:
+    """Sha of a project's current blob (including writes not committed yet), None if it does not exist."""
+    return next((item.sha for item in await _list_files() if item.name == project_name), None)
+
+async def project_exists(project_name: str) -> bool:
+    """Check if a project (i.e., .env file) exists in the storage backend."""
+    return await _reads.do(("exists", project_name), lambda: get_storage().exists(project_name))
@@ -0,0 +1,178 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+import httpx
+from app.metrics import github_throttled, singleflight_shared
+
+# Request priorities; lower is served first when every slot is busy
+READ = 0
+BULK = 1
+_PRIORITY_NAMES = {READ: "read", BULK: "bulk"}
+
+_priority: ContextVar[int] = ContextVar("github_priority", default=READ)
+
+
+@contextmanager
+def bulk_priority():
+    """Mark GitHub requests made inside the block (and tasks it spawns) as bulk traffic."""
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RateLimited(Exception):
+    """GitHub asked us to back off for longer than we are willing to wait."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"GitHub rate limit reached, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RequestScheduler:
+    """Admission for GitHub API requests: a priority-ordered concurrency limit plus backoff.
+
+    At most ``concurrency`` requests are in flight; when all slots are busy,
+    reads are let in before bulk (rotation) traffic. The X-RateLimit headers
+    of every response are tracked: bulk requests hold back once ``reserve``
+    requests or fewer are left in the window, so interactive reads keep
+    working, and a rate-limited response pauses every request for as long as
+    GitHub asks. Waits longer than ``max_wait`` raise RateLimited instead.
+    """
+
+    def __init__(self, concurrency: int, reserve: int, max_wait: float):
+        self.concurrency = concurrency
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at = 0.0         # epoch seconds, from X-RateLimit-Reset
+        self.paused_until = 0.0     # monotonic; set after a rate-limited response
+        self._backoffs = 0          # consecutive rate-limited responses
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    def _delay(self, priority: int) -> float:
+        delay = self.paused_until - time.monotonic()
+        if priority == BULK and self.remaining is not None and self.remaining <= self.reserve:
+            delay = max(delay, self.reset_at - time.time())
+        return delay
+
+    async def _wait_for_budget(self, priority: int) -> None:
+        while (delay := self._delay(priority)) > 0:
+            if delay > self.max_wait:
+                raise RateLimited(int(delay) + 1)
+            github_throttled.inc(_PRIORITY_NAMES[priority])
+            await asyncio.sleep(delay)
+
+    async def acquire(self) -> None:
+        priority = _priority.get()
+        await self._wait_for_budget(priority)
+        if self._active < self.concurrency and not self._waiters:
+            self._active += 1
+            return
+        slot = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), slot))
+        try:
+            await slot
+        except asyncio.CancelledError:
+            if slot.done() and not slot.cancelled():
+                self.release()  # The slot was handed to us just as we were cancelled
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, slot = heapq.heappop(self._waiters)
+            if not slot.done():
+                slot.set_result(None)  # Hand the slot over; the active count stays the same
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record(self, response: httpx.Response) -> float | None:
+        """Track the rate limit headers of a response.
+
+        Returns how long to wait before retrying if the response says we
+        were rate limited, else None. Follows GitHub's guidance: honour
+        Retry-After, else wait for the reset when nothing is left, else back
+        off exponentially from one minute.
+        """
+        headers = response.headers
+        for field in ("limit", "remaining", "reset"):
+            value = headers.get(f"X-RateLimit-{field.capitalize()}")
+            if value is not None and value.isdigit():
+                setattr(self, "reset_at" if field == "reset" else field, int(value))
+        if not self._is_rate_limited(response):
+            self._backoffs = 0
+            return None
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            delay = float(retry_after)
+        elif self.remaining == 0:
+            delay = max(self.reset_at - time.time(), 1.0)
+        else:
+            delay = min(60.0 * 2 ** self._backoffs, 900.0)
+        self._backoffs += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        return delay
+
+    def _is_rate_limited(self, response: httpx.Response) -> bool:
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        if self.remaining == 0 or "Retry-After" in response.headers:
+            return True
+        # Secondary limits may come without headers, only with this message
+        return response.is_stream_consumed and b"rate limit" in response.content.lower()
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "waiting": sum(1 for _, _, slot in self._waiters if not slot.done()),
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_at": int(self.reset_at),
+            "paused_for": round(max(self.paused_until - time.monotonic(), 0.0), 1),
+        }
+
+
+class SingleFlight:
+    """Collapse identical concurrent calls into one.
+
+    The first caller for a key starts the call; callers arriving while it
+    runs await the same result (or exception). The call runs as its own
+    task, so a caller giving up does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: dict[tuple, asyncio.Task] = {}
+
+    async def do(self, key: tuple, fn: Callable[[], Awaitable]):
+        task = self._calls.get(key)
+        if task is not None:
+            singleflight_shared.inc(key[0])
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: tuple, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every caller gave up waiting
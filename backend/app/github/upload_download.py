@@ -1,19 +1,208 @@
-import base64
-from app.github.github import pull_file_data, push_file_data
-from app.crypto import encrypt_data, decrypt_data
-
-
-# Accepts a project name, passphrase, and raw data (bytes)
-def encrypt_upload(project_name, passphrase, raw_data) -> bool:
-    encrypted_data = encrypt_data(raw_data, passphrase)
-    encrypted_b64 = base64.b64encode(encrypted_data).decode("utf-8")
-    push_file_data(encrypted_b64, project_name)
-    return True
-
-# Accepts a project name and passphrase
-def decrypt_download(project_name, passphrase) -> bytes:     
-    retrieved_b64 = pull_file_data(project_name)
-    retrieved_data = base64.b64decode(retrieved_b64)
-    decrypted_data = decrypt_data(retrieved_data, passphrase)
+import asyncio
+from app.github.github import pull_file_version, push_file_data, pull_file_stream, push_file_stream
+from app.github.github import pull_file_at, restore_file_version
+from app.github.scheduler import RateLimited
+from app.crypto import encrypt_for_vault, decrypt_from_vault, fingerprint, fingerprint_hmac, stored_fingerprint
+from app.crypto import crypto_pool, CryptoOverloaded
+from app.crypto.blob import FINGERPRINT_SIZE, KDF_MASTER_KEY, blob_kdf, is_blob
+from app.envfile import EnvFile
+from app.storage import StorageConflict
+from app.crypto.stream import CHUNK_SIZE, STREAM_MAGIC, is_stream, encrypt_stream, decrypt_stream, decrypt_stream_bytes
+
+
+# Enough leading bytes to hold the header of any blob format
+HEADER_PEEK = 64
+
+# Accepts a project name, unlocked vault keys, and raw data (bytes)
+# Returns (sha of the stored blob, whether it was written); base_sha guards against
+# overwriting a newer version. Content identical to the stored blob (same fingerprint)
+# is not written again, so saving an unchanged file creates no commit.
+async def encrypt_upload(project_name, keys, raw_data, base_sha=None) -> tuple[str | None, bool]:
+    data_fingerprint = await crypto_pool.run(fingerprint, raw_data, keys)
+    version = await pull_file_version(project_name)
+    if version is not None and stored_fingerprint(version[0]) == data_fingerprint:
+        print(f"{project_name}.env.enc unchanged, skipping write.")
+        return version[1], False
+    encrypted_data = await crypto_pool.run(encrypt_for_vault, raw_data, keys, data_fingerprint)
+    return await push_file_data(encrypted_data, project_name, base_sha), True
+
+# Fingerprint in the header of a stored blob, reading only its first bytes
+async def _stored_fingerprint_head(project_name) -> bytes | None:
+    chunks = await pull_file_stream(project_name)
+    if chunks is None:
+        return None
+    head = b""
+    try:
+        async for chunk in chunks:
+            head += chunk
+            if len(head) >= HEADER_PEEK:
+                break
+    finally:
+        await chunks.aclose()
+    return stored_fingerprint(head)
+
+# Accepts a project name and unlocked vault keys
+async def decrypt_download(project_name, keys) -> bytes:
+    decrypted_data, _ = await decrypt_download_version(project_name, keys)
     return decrypted_data
-    
\ No newline at end of file
+
+# Like decrypt_download, but also returns the sha of the stored blob
+async def decrypt_download_version(project_name, keys) -> tuple[bytes, str]:
+    version = await pull_file_version(project_name)
+    if version is None:
+        raise FileNotFoundError(f"{project_name}.env.enc not found")
+    stored, sha = version
+    return await _decrypt_stored(stored, keys), sha
+
+async def _decrypt_stored(stored, keys) -> bytes:
+    if is_stream(stored):
+        return await crypto_pool.run(decrypt_stream_bytes, stored, _master_key(keys))
+    return await crypto_pool.run(decrypt_from_vault, stored, keys)
+
+def _master_key(keys) -> bytes:
+    if keys.master_key is None:
+        raise ValueError("Chunked files need a vault master key")
+    return keys.master_key
+
+# Accepts a project name, unlocked vault keys, and an UploadFile
+# Encrypts and stores the file chunk by chunk, so it is never held whole in memory.
+# Returns (sha, whether it was written) like encrypt_upload; the sha is None when
+# unchanged. Legacy vaults without a master key fall back to encrypt_upload.
+async def encrypt_upload_stream(project_name, keys, file, base_sha=None) -> tuple[str | None, bool]:
+    if keys.master_key is None:
+        return await encrypt_upload(project_name, keys, await file.read(), base_sha)
+
+    # The server has already spooled the upload, so hashing it first is a cheap extra pass
+    mac = fingerprint_hmac(keys)
+    while chunk := await file.read(CHUNK_SIZE):
+        mac.update(chunk)
+    data_fingerprint = mac.digest()[:FINGERPRINT_SIZE]
+    if await _stored_fingerprint_head(project_name) == data_fingerprint:
+        print(f"{project_name}.env.enc unchanged, skipping write.")
+        return None, False
+    await file.seek(0)
+
+    async def plaintext():
+        while chunk := await file.read(CHUNK_SIZE):
+            yield chunk
+
+    encrypted_chunks = encrypt_stream(plaintext(), keys.master_key, data_fingerprint)
+    return await push_file_stream(encrypted_chunks, project_name, base_sha), True
+
+# Accepts a project name and unlocked vault keys
+# Returns an async iterator of decrypted chunks. The first chunk is decrypted
+# before returning, so a missing file or a wrong key raises here rather than
+# after a streaming response has started.
+async def decrypt_download_stream(project_name, keys):
+    chunks = await pull_file_stream(project_name)
+    if chunks is None:
+        raise FileNotFoundError(f"{project_name}.env.enc not found")
+
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if len(head) >= len(STREAM_MAGIC):
+            break
+
+    if not is_stream(head):
+        # Compact and legacy blobs have to be decrypted as a whole
+        async for chunk in chunks:
+            head += chunk
+        decrypted_data = await crypto_pool.run(decrypt_from_vault, head, keys)
+
+        async def whole():
+            yield decrypted_data
+        return whole()
+
+    async def ciphertext():
+        yield head
+        async for chunk in chunks:
+            yield chunk
+
+    plaintext = decrypt_stream(ciphertext(), _master_key(keys))
+    first = await anext(plaintext)
+
+    async def rest():
+        yield first
+        async for chunk in plaintext:
+            yield chunk
+    return rest()
+
+# Reads a project and parses it as a .env file
+# Returns (EnvFile, sha); raises FileNotFoundError if missing, ValueError if not UTF-8
+async def read_env_file(project_name, keys) -> tuple[EnvFile, str]:
+    decrypted_data, sha = await decrypt_download_version(project_name, keys)
+    try:
+        text = decrypted_data.decode("utf-8")
+    except UnicodeDecodeError:
+        raise ValueError(f"{project_name} is not a text .env file")
+    return EnvFile.parse(text), sha
+
+# Sets and unsets keys of a project, writing only if a value actually changed
+# Returns (changed keys, sha). With base_sha the patch only applies to that version;
+# without it a concurrent write is retried against the newer version.
+async def patch_env_file(project_name, keys, set_values, unset_keys, base_sha=None, retries=3):
+    for attempt in range(retries):
+        env_file, sha = await read_env_file(project_name, keys)
+        if base_sha is not None and base_sha != sha:
+            raise StorageConflict(project_name, sha)
+        changed = [key for key in unset_keys if env_file.unset(key)]
+        changed += [key for key, value in set_values.items() if env_file.set(key, value)]
+        if not changed:
+            return [], sha
+        try:
+            sha, _ = await encrypt_upload(project_name, keys, env_file.dumps().encode("utf-8"), sha)
+            return changed, sha
+        except StorageConflict:
+            if base_sha is not None or attempt == retries - 1:
+                raise
+
+# Fetches and decrypts several projects concurrently, yielding
+# (project_name, data, error, sha) in completion order; exactly one of data/error is set,
+# and sha (of the stored blob) comes with data
+async def decrypt_download_many(project_names, keys, concurrency=8):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(project_name):
+        async with semaphore:
+            try:
+                if project_name == "passphrase":
+                    raise ValueError("Project name cannot be 'passphrase'")
+                data, sha = await decrypt_download_version(project_name, keys)
+                return project_name, data, None, sha
+            except FileNotFoundError:
+                return project_name, None, "File not found", None
+            except (CryptoOverloaded, RateLimited):
+                return project_name, None, "Server busy, retry later", None
+            except ValueError as e:
+                return project_name, None, str(e), None
+            except Exception as e:
+                print(f"Error fetching {project_name}: {e}")
+                return project_name, None, "Decryption failed", None
+
+    tasks = [asyncio.create_task(fetch(name)) for name in dict.fromkeys(project_names)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()  # Client went away: stop the remaining fetches
+
+# Accepts a project name, the commit that wrote the wanted version and unlocked vault keys
+# Makes that version current again and returns its blob sha. A blob already in the vault's
+# current format is re-pointed to as is; one that only decrypts through a legacy path (e.g.
+# a passphrase blob from before /migrate-vault) is re-encrypted with the current keys. A
+# version that no longer decrypts (older master key, passphrase or dictionary) raises
+# ValueError instead of becoming a current version nobody can read.
+async def restore_version(project_name, commit, keys) -> str | None:
+    stored = await pull_file_at(project_name, commit)
+    try:
+        data = await _decrypt_stored(stored, keys)
+    except (CryptoOverloaded, RateLimited):
+        raise
+    except Exception as e:
+        raise ValueError("This version was encrypted with keys the vault no longer has") from e
+    if keys.master_key is None or is_stream(stored) or (is_blob(stored) and blob_kdf(stored) == KDF_MASTER_KEY):
+        return await restore_file_version(project_name, commit)
+    sha, _ = await encrypt_upload(project_name, keys, data)
+    return sha
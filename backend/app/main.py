@@ -1,8 +1,22 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api import router
+from app.crypto import crypto_pool, CryptoOverloaded
+from app.github import RateLimited
+from app.metrics import MetricsMiddleware
+from app.storage import get_storage
 
-app = FastAPI(title="EnvVault API", root_path="/")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await get_storage().start()  # e.g. the write-behind flusher
+    yield
+    await get_storage().aclose()  # Close pooled connections on shutdown
+    crypto_pool.shutdown()
+
+app = FastAPI(title="EnvVault API", root_path="/", lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -12,5 +26,17 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all methods
     allow_headers=["*"],  # Allow all headers
 )
+app.add_middleware(MetricsMiddleware)  # Added last, so it wraps everything else
+
+
+@app.exception_handler(CryptoOverloaded)
+@app.exception_handler(RateLimited)
+async def retry_later_handler(request: Request, exc: CryptoOverloaded | RateLimited):
+    """Shed load quickly: crypto work is queued too deep, or GitHub wants us to back off."""
+    return JSONResponse(
+        {"error": "Server busy, retry later"},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 app.include_router(router)
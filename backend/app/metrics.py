@@ -0,0 +1,203 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics served by /metrics in the Prometheus text format.
+# Deliberately tiny instead of a prometheus_client dependency: a few
+# histograms, counters and gauges, safe to update from the crypto threads.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], le: str | None = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        with self._lock:
+            samples = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in samples
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set_total(self, value: float, *labels: str) -> None:
+        """Mirror a total kept by another component (e.g. a cache's own hit counter)."""
+        with self._lock:
+            self._values[labels] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple = BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            samples = sorted((labels, (list(counts), total, count))
+                             for labels, (counts, total, count) in self._values.items())
+        lines = self._header()
+        for labels, (counts, total, count) in samples:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, str(bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, '+Inf')} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+request_seconds = Histogram(
+    "envault_request_seconds", "Time to serve a request, per route template.", ("method", "route", "status")
+)
+requests_in_flight = Gauge("envault_requests_in_flight", "Requests currently being served.")
+stage_seconds = Histogram(
+    "envault_stage_seconds",
+    "Time spent per stage: kdf, encrypt, decrypt, encode, storage_read, storage_write, list, history.",
+    ("stage",),
+)
+github_requests = Counter("envault_github_requests_total", "GitHub API responses, per status code.", ("status",))
+github_rate_limit = Gauge(
+    "envault_github_rate_limit", "Latest GitHub rate limit headers (limit, remaining, reset epoch).", ("field",)
+)
+github_throttled = Counter(
+    "envault_github_throttled_total", "GitHub requests held back by rate-limit backoff, per priority.", ("priority",)
+)
+singleflight_shared = Counter(
+    "envault_singleflight_shared_total", "Storage reads served by joining an identical read in flight.", ("op",)
+)
+cache_hit_ratio = Gauge("envault_cache_hit_ratio", "Hit ratio of each in-process cache.", ("cache",))
+cache_requests = Counter("envault_cache_requests_total", "Cache lookups, per cache and result.", ("cache", "result"))
+crypto_pool_gauge = Gauge("envault_crypto_pool", "Crypto thread pool load (workers, in_flight, rejected, ...).", ("field",))
+
+_REGISTRY = [
+    request_seconds, requests_in_flight, stage_seconds, github_requests, github_rate_limit,
+    github_throttled, singleflight_shared, cache_hit_ratio, cache_requests, crypto_pool_gauge,
+]
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a block into ``envault_stage_seconds``; works in sync and async code alike."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage)
+
+
+def record_github_response(status_code: int, headers) -> None:
+    """Count a GitHub API response and keep its rate limit headers."""
+    github_requests.inc(str(status_code))
+    for field in ("limit", "remaining", "reset"):
+        value = headers.get(f"X-RateLimit-{field.capitalize()}")
+        if value is not None and value.isdigit():
+            github_rate_limit.set(int(value), field)
+
+
+def record_cache(cache: str, stats: dict) -> None:
+    """Copy hit/miss counters from a cache's stats() into the exported gauges."""
+    cache_hit_ratio.set(stats.get("hit_ratio", 0.0), cache)
+    cache_requests.set_total(stats.get("hits", 0), cache, "hit")
+    cache_requests.set_total(stats.get("misses", 0), cache, "miss")
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware feeding ``envault_request_seconds`` and ``envault_requests_in_flight``.
+
+    Time is measured until the response body is fully sent, so streamed
+    downloads are included. Routes are labelled by their template, never the
+    raw path, to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_seconds.observe(time.perf_counter() - start, scope["method"], route, str(status))
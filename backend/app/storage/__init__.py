@@ -0,0 +1,2 @@
+from .base import StorageBackend, StorageConflict, FileInfo
+from .factory import create_backend, get_storage, set_storage
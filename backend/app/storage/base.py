@@ -0,0 +1,144 @@
+import hashlib
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from app.storage.blobcache import git_blob_sha
+from app.storage.history import Version
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class FileInfo:
+    """A stored project blob as seen by a storage backend."""
+    name: str
+    size: int
+    sha: str | None = None
+    modified: str | None = None   # ISO 8601 timestamp, when known
+    path: str | None = None       # where the backend keeps it, for backends with several layouts
+
+
+class StorageConflict(Exception):
+    """A write was based on a blob version that is no longer the current one."""
+
+    def __init__(self, project_name: str, current_sha: str | None):
+        super().__init__(f"{project_name} was modified concurrently (current sha: {current_sha})")
+        self.project_name = project_name
+        self.current_sha = current_sha
+
+
+def files_revision(files: dict[str, bytes]) -> str:
+    """Revision marker of a set of blobs: a digest of every project name and blob sha."""
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(f"{name}\0{git_blob_sha(files[name])}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class StorageBackend(ABC):
+    """Interface every storage backend implements.
+
+    Backends store opaque (already encrypted) bytes per project name. The
+    ``passphrase`` verifier file is stored like any other project.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def push(self, project_name: str, data: bytes, expected_sha: str | None = None) -> str | None:
+        """Create or overwrite the blob for a project and return its new sha.
+
+        With ``expected_sha`` the write only applies if the stored blob is
+        still that version; otherwise ``StorageConflict`` is raised.
+        """
+
+    @abstractmethod
+    async def pull(self, project_name: str) -> bytes | None:
+        """Return the blob for a project, or None if it does not exist."""
+
+    @abstractmethod
+    async def list(self) -> list[FileInfo]:
+        """Return every stored blob."""
+
+    @abstractmethod
+    async def delete(self, project_name: str) -> bool:
+        """Delete a project's blob. Returns False if it did not exist."""
+
+    async def push_stream(self, project_name: str, chunks: AsyncIterator[bytes],
+                          expected_sha: str | None = None) -> str | None:
+        """Like ``push`` but consumes the blob as an async stream of chunks.
+
+        The default collects the chunks; backends that can write
+        incrementally override it to keep memory use constant.
+        """
+        data = b"".join([chunk async for chunk in chunks])
+        return await self.push(project_name, data, expected_sha)
+
+    async def pull_stream(self, project_name: str) -> AsyncIterator[bytes] | None:
+        """Like ``pull`` but returns the blob as an async stream of chunks."""
+        data = await self.pull(project_name)
+        if data is None:
+            return None
+        return iter_chunks(data)
+
+    async def pull_all(self) -> tuple[dict[str, bytes], str | None]:
+        """Return every blob keyed by project name, plus a revision marker.
+
+        The revision is passed back to ``push_many`` so a batch write can
+        refuse to apply on top of changes made after the read.
+        """
+        files = {}
+        for info in await self.list():
+            data = await self.pull(info.name)
+            if data is not None:
+                files[info.name] = data
+        return files, files_revision(files)
+
+    async def push_many(self, files: dict[str, bytes], message: str,
+                        base: str | None = None) -> dict[str, float]:
+        """Write several blobs at once and return per-phase timings in seconds."""
+        for project_name, data in files.items():
+            await self.push(project_name, data)
+        return {}
+
+    async def exists(self, project_name: str) -> bool:
+        """Check whether a project's blob exists."""
+        return await self.pull(project_name) is not None
+
+    def stats(self) -> dict:
+        """Cache counters for monitoring; empty for backends without caches."""
+        return {}
+
+    async def history(self, project_name: str) -> "list[Version] | None":
+        """Versions of a project, newest first; None for backends that keep no history."""
+        return None
+
+    async def pull_version(self, project_name: str, commit: str) -> bytes:
+        """Stored bytes of the version of a project written by ``commit``.
+
+        Raises ``KeyError`` if the project has no such version.
+        """
+        raise NotImplementedError(f"{self.name} storage keeps no version history")
+
+    async def restore(self, project_name: str, commit: str) -> str | None:
+        """Make the version written by ``commit`` current again and return its blob sha.
+
+        Raises ``KeyError`` if the project has no such version.
+        """
+        raise NotImplementedError(f"{self.name} storage keeps no version history")
+
+    async def migrate_layout(self) -> int:
+        """Move every blob to the backend's preferred layout and return how many moved."""
+        return 0
+
+    async def start(self) -> None:
+        """Start any background work the backend needs; called on app start-up."""
+
+    async def aclose(self) -> None:
+        """Release any resources held by the backend."""
+
+
+async def iter_chunks(data: bytes, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Serve an in-memory blob as an async stream."""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def git_blob_sha(data: bytes) -> str:
+    """The sha git (and GitHub) assigns to a blob with this content."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class BlobCache:
+    """Content-addressed cache of encrypted blobs, keyed by git blob sha.
+
+    A bounded in-memory LRU tier sits in front of an optional on-disk tier.
+    Blobs are stored exactly as they are in the repo (already encrypted), and
+    disk entries are re-hashed on read so a corrupted file is never served.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str = ""):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, sha: str) -> str:
+        return os.path.join(self.disk_dir, sha[:2], sha)
+
+    def _read_disk(self, sha: str) -> bytes | None:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(sha), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if git_blob_sha(data) != sha:
+            os.remove(self._disk_path(sha))
+            return None
+        return data
+
+    def _write_disk(self, sha: str, data: bytes) -> None:
+        path = self._disk_path(sha)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A unique temp file, so concurrent puts of one blob never write to the same file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{sha}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+
+    def _put_memory(self, sha: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(sha, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[sha] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    async def get(self, sha: str) -> bytes | None:
+        """Return a cached blob, or None on a miss. Disk reads run in a worker thread."""
+        with self._lock:
+            data = self._entries.get(sha)
+            if data is not None:
+                self._entries.move_to_end(sha)
+                self.hits += 1
+                return data
+        data = await asyncio.to_thread(self._read_disk, sha) if self.disk_dir else None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put_memory(sha, data)
+        return data
+
+    async def put(self, sha: str, data: bytes) -> None:
+        """Store a blob under its sha in every tier. Disk writes run in a worker thread."""
+        with self._lock:
+            self._put_memory(sha, data)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, sha, data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,39 @@
+from app.config import settings
+from app.storage.base import StorageBackend
+
+_storage: StorageBackend | None = None
+
+
+def create_backend(kind: str) -> StorageBackend:
+    """Build a storage backend by name: "github", "local" or "memory"."""
+    kind = kind.lower()
+    # Imported lazily: the GitHub backend pulls in app.github, which itself
+    # goes through get_storage().
+    if kind == "github":
+        from app.github.client import client
+        from app.storage.github import GitHubBackend
+        return GitHubBackend(client)
+    if kind == "local":
+        from app.storage.local import LocalBackend
+        return LocalBackend(settings.STORAGE_DIR)
+    if kind == "memory":
+        from app.storage.memory import MemoryBackend
+        return MemoryBackend()
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def get_storage() -> StorageBackend:
+    """Return the process-wide backend selected by ``settings.STORAGE_BACKEND``."""
+    global _storage
+    if _storage is None:
+        _storage = create_backend(settings.STORAGE_BACKEND)
+        if settings.WRITE_BEHIND:
+            from app.storage.writebehind import WriteBehindBackend
+            _storage = WriteBehindBackend(_storage, settings.WRITE_BEHIND_JOURNAL, settings.WRITE_BEHIND_INTERVAL)
+    return _storage
+
+
+def set_storage(backend: StorageBackend) -> None:
+    """Swap the process-wide backend (used by tests and benchmarks)."""
+    global _storage
+    _storage = backend
@@ -0,0 +1,537 @@
+import asyncio
+import hashlib
+import time
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+from app.config import settings
+from app.github.client import GitHubClient, GitHubError
+from app.github.scheduler import bulk_priority
+from app.storage.base import FileInfo, StorageBackend, StorageConflict, iter_chunks
+from app.storage.blobcache import BlobCache
+from app.storage.history import HistoryIndex, Version
+from app.storage.manifest import Manifest
+
+DIRECTORY = "encrypted_files"
+SUFFIX = ".env.enc"
+BLOB_CONCURRENCY = 8
+SHARD_CHARS = 2     # 256 shard directories
+HISTORY_INLINE_COMMITS = 100  # longer history catch-ups run in the background
+
+
+def shard(project_name: str) -> str:
+    """Shard directory of a project: a hex prefix of the SHA-256 of its name."""
+    return hashlib.sha256(project_name.encode("utf-8")).hexdigest()[:SHARD_CHARS]
+
+
+class GitHubBackend(StorageBackend):
+    """Stores blobs as ``encrypted_files/<shard>/<name>.env.enc`` in a GitHub repo.
+
+    Vaults created before sharding keep ``encrypted_files/<name>.env.enc``
+    until ``migrate_layout`` moves them; both layouts are read, and new
+    projects follow whichever the vault uses. The manifest records where
+    each project actually is.
+    """
+
+    name = "github"
+
+    def __init__(self, client: GitHubClient, directory: str = DIRECTORY):
+        self.client = client
+        self.directory = directory
+        self.manifest = Manifest(settings.MANIFEST_TTL)
+        self.blob_cache = BlobCache(settings.BLOB_CACHE_BYTES, settings.BLOB_CACHE_DIR)
+        self.sharded = True     # False while the vault still has files in the flat layout
+        self._etags: dict[str, tuple[str, str]] = {}  # path -> (etag, sha)
+        self.history_index = HistoryIndex(settings.HISTORY_INDEX_PATH, f"{client.repo}@{client.branch}")
+        self._history_etag: str | None = None
+        self._history_build: asyncio.Task | None = None  # long catch-up running in the background
+
+    def path(self, project_name: str, sharded: bool | None = None) -> str:
+        """Where a project's encrypted file lives, or would be created, in the repo."""
+        info = self.manifest.get(project_name)
+        if sharded is None:
+            if info is not None and info.path:
+                return info.path
+            sharded = self.sharded
+        if sharded:
+            return f"{self.directory}/{shard(project_name)}/{project_name}{SUFFIX}"
+        return f"{self.directory}/{project_name}{SUFFIX}"
+
+    async def _locate(self, project_name: str) -> str:
+        """Like ``path``, but loads the manifest first if it never was."""
+        if not self.manifest.loaded:
+            await self.refresh_manifest()
+        return self.path(project_name)
+
+    async def _moved_to(self, project_name: str, path_in_repo: str) -> str | None:
+        """After a 404 at ``path_in_repo``: the project's new path if it was moved, else None."""
+        info = (await self.refresh_manifest(force=True)).get(project_name)
+        if info is None or info.path == path_in_repo:
+            return None
+        return info.path
+
+    async def refresh_manifest(self, force: bool = False) -> Manifest:
+        """Bring the manifest up to date with the branch head.
+
+        Uses a conditional request on the ref, then compares the sha of the
+        vault directory tree, so an unchanged vault costs one 304 and a
+        changed one costs a single recursive read of the vault directory,
+        which is not capped at 1,000 entries like contents API listings.
+        """
+        if not force and self.manifest.is_fresh():
+            return self.manifest
+        async with self.manifest.lock:
+            if not force and self.manifest.is_fresh():
+                return self.manifest  # Refreshed while we waited for the lock
+            commit_sha, etag = await self.client.get_ref(self.manifest.etag)
+            if commit_sha is not None:
+                commit = await self.client.get_commit(commit_sha)
+                root = await self.client.get_tree(commit["tree"]["sha"], recursive=False)
+                dir_sha = next(
+                    (e["sha"] for e in root if e["path"] == self.directory and e["type"] == "tree"), None
+                )
+                if dir_sha != self.manifest.version or not self.manifest.loaded:
+                    entries, flat = {}, False
+                    if dir_sha is not None:
+                        for entry in await self.client.walk_tree(dir_sha):
+                            path_in_repo = f"{self.directory}/{entry['path']}"
+                            name = self._project_name(path_in_repo)
+                            if entry["type"] == "blob" and name is not None:
+                                entries[name] = FileInfo(name, entry["size"], entry["sha"], path=path_in_repo)
+                                flat = flat or "/" not in entry["path"]
+                    self.sharded = not flat
+                    self.manifest.replace(entries, commit["committer"]["date"])
+                    self.manifest.version = dir_sha
+                self.manifest.etag = etag
+            self.manifest.mark_refreshed()
+        return self.manifest
+
+    async def push(self, project_name: str, data: bytes, expected_sha: str | None = None) -> str | None:
+        """Write a blob in one round trip using the sha already in the manifest.
+
+        GitHub rejects a stale sha with 409/422. Without ``expected_sha`` the
+        write is retried once with the current sha (the manifest was simply
+        out of date); with it, the conflict is raised as ``StorageConflict``.
+        """
+        info = (await self.refresh_manifest()).get(project_name)
+        if expected_sha is not None:
+            sha = expected_sha
+        else:
+            sha = info.sha if info is not None else None
+        path_in_repo = self.path(project_name)
+        try:
+            result = await self._put(project_name, path_in_repo, data, sha)
+        except GitHubError as e:
+            if e.status_code not in (409, 422):
+                raise
+            # The sha is stale, or the file was moved (e.g. by a layout migration)
+            current = (await self.refresh_manifest(force=True)).get(project_name)
+            current_sha = current.sha if current is not None else None
+            current_path = self.path(project_name)
+            if current_sha == sha and current_path == path_in_repo:
+                raise  # Not a stale sha, something else was rejected
+            if expected_sha is not None and current_sha != expected_sha:
+                raise StorageConflict(project_name, current_sha) from e
+            print(f"Stale sha or path for {project_name}{SUFFIX}, retrying with the current one.")
+            path_in_repo = current_path
+            try:
+                result = await self._put(project_name, path_in_repo, data, current_sha)
+            except GitHubError as retry_error:
+                if retry_error.status_code in (409, 422):
+                    raise StorageConflict(project_name, None) from retry_error
+                raise
+        await self._record_write(project_name, path_in_repo, data, result)
+        return (result.get("content") or {}).get("sha")
+
+    async def _put(self, project_name: str, path_in_repo: str, data: bytes, sha: str | None) -> dict:
+        if sha is not None:
+            return await self.client.put_file(path_in_repo, data, f"Update {project_name}{SUFFIX}", sha)
+        return await self.client.put_file(path_in_repo, data, f"Add {project_name}{SUFFIX}")
+
+    async def push_stream(self, project_name: str, chunks: AsyncIterator[bytes],
+                          expected_sha: str | None = None) -> str | None:
+        """Stream a blob into a single contents API PUT.
+
+        A consumed stream cannot be replayed, so any stale-sha rejection is
+        raised as ``StorageConflict`` instead of being retried.
+        """
+        info = (await self.refresh_manifest(force=expected_sha is None)).get(project_name)
+        if expected_sha is not None:
+            sha = expected_sha
+        else:
+            sha = info.sha if info is not None else None
+        path_in_repo = self.path(project_name)
+        message = f"{'Update' if sha else 'Add'} {project_name}{SUFFIX}"
+        try:
+            result = await self.client.put_file_stream(path_in_repo, chunks, message, sha)
+        except GitHubError as e:
+            if e.status_code in (409, 422):
+                raise StorageConflict(project_name, None) from e
+            raise
+        await self._record_write(project_name, path_in_repo, None, result)
+        return (result.get("content") or {}).get("sha")
+
+    async def pull_stream(self, project_name: str) -> AsyncIterator[bytes] | None:
+        """Stream a blob from the blob cache when its sha is known, else from GitHub raw."""
+        if self.manifest.is_fresh():
+            info = self.manifest.get(project_name)
+            if info is None:
+                return None
+            if info.sha is not None:
+                data = await self.blob_cache.get(info.sha)
+                if data is not None:
+                    return iter_chunks(data)
+        path_in_repo = await self._locate(project_name)
+        chunks = await self.client.stream_file(path_in_repo)
+        if chunks is None and (moved := await self._moved_to(project_name, path_in_repo)):
+            chunks = await self.client.stream_file(moved)
+        return chunks
+
+    async def _record_write(self, project_name: str, path_in_repo: str, data: bytes | None, result: dict) -> None:
+        """Update the manifest and blob cache from a contents API write response."""
+        content = result.get("content") or {}
+        commit = result.get("commit") or {}
+        modified = (commit.get("committer") or {}).get("date") or _now()
+        self.manifest.set(FileInfo(project_name, content.get("size", 0), content.get("sha"), modified, path_in_repo))
+        self._etags.pop(path_in_repo, None)
+        if content.get("sha") and data is not None:
+            await self.blob_cache.put(content["sha"], data)
+        self._record_commit(commit, {project_name: (content.get("sha"), content.get("size", 0))})
+
+    def _record_commit(self, commit: dict, changes: dict[str, tuple[str | None, int]]) -> None:
+        """Add a commit from a contents API response to the history index."""
+        parents = commit.get("parents") or []
+        if commit.get("sha") and parents:
+            date = (commit.get("committer") or {}).get("date")
+            self.history_index.record(commit["sha"], parents[0]["sha"], date, commit.get("message", ""), changes)
+
+    async def pull(self, project_name: str) -> bytes | None:
+        """Read a blob, from the blob cache whenever its sha is known.
+
+        A fresh manifest entry with a cached sha costs no request at all;
+        otherwise the fetch is conditional on the last ETag seen for the path.
+        """
+        if self.manifest.is_fresh():
+            info = self.manifest.get(project_name)
+            if info is None:
+                return None
+            if info.sha is not None:
+                data = await self.blob_cache.get(info.sha)
+                if data is not None:
+                    return data
+
+        path_in_repo = await self._locate(project_name)
+        etag, sha = self._etags.get(path_in_repo, (None, None))
+        result = await self.client.get_file_if_changed(path_in_repo, etag)
+        if result is None:
+            self._etags.pop(path_in_repo, None)
+            moved = await self._moved_to(project_name, path_in_repo)
+            if moved is None:
+                self.manifest.remove(project_name)
+                return None
+            path_in_repo = moved
+            result = await self.client.get_file_if_changed(path_in_repo, None)
+            if result is None:
+                return None
+        data, new_sha, new_etag = result
+        if data is None:
+            data = await self.blob_cache.get(sha)
+            if data is None:
+                # 304 but the blob was evicted: fetch it unconditionally
+                data, new_sha, new_etag = await self.client.get_file_if_changed(path_in_repo, None)
+        if new_sha is not None:
+            await self.blob_cache.put(new_sha, data)
+            if new_etag:
+                self._etags[path_in_repo] = (new_etag, new_sha)
+            info = self.manifest.get(project_name)
+            if info is None or info.sha != new_sha:
+                self.manifest.set(FileInfo(project_name, len(data), new_sha, path=path_in_repo))
+        return data
+
+    async def list(self) -> list[FileInfo]:
+        manifest = await self.refresh_manifest()
+        return list(manifest.entries.values())
+
+    async def exists(self, project_name: str) -> bool:
+        manifest = await self.refresh_manifest()
+        return manifest.get(project_name) is not None
+
+    async def delete(self, project_name: str) -> bool:
+        path_in_repo = await self._locate(project_name)
+        existing = await self.client.get_file(path_in_repo)
+        if existing is None and (moved := await self._moved_to(project_name, path_in_repo)):
+            path_in_repo = moved
+            existing = await self.client.get_file(path_in_repo)
+        if existing is None:
+            self.manifest.remove(project_name)
+            return False
+        result = await self.client.delete_file(path_in_repo, f"Delete {project_name}{SUFFIX}", existing[1])
+        self.manifest.remove(project_name)
+        self._etags.pop(path_in_repo, None)
+        self._record_commit(result.get("commit") or {}, {project_name: (None, 0)})
+        return True
+
+    def _project_name(self, path: str) -> str | None:
+        """Project stored at a repo path, in the flat or sharded layout; None for other files."""
+        prefix = f"{self.directory}/"
+        if not path.startswith(prefix) or not path.endswith(SUFFIX):
+            return None
+        directory, _, file_name = path[len(prefix):].rpartition("/")
+        name = file_name[:-len(SUFFIX)]
+        if directory and directory != shard(name):
+            return None
+        return name
+
+    async def _gather_limited(self, coros) -> list:
+        semaphore = asyncio.Semaphore(BLOB_CONCURRENCY)
+
+        async def run(coro):
+            async with semaphore:
+                return await coro
+
+        return await asyncio.gather(*(run(c) for c in coros))
+
+    async def pull_all(self) -> tuple[dict[str, bytes], str | None]:
+        """Read every blob from a single recursive tree listing of the head commit."""
+        commit_sha, tree_sha = await self.client.get_head()
+        entries = {}
+        for entry in await self.client.walk_tree(tree_sha):
+            project_name = self._project_name(entry["path"])
+            if entry["type"] == "blob" and project_name is not None:
+                entries[project_name] = entry["sha"]
+        files = {name: await self.blob_cache.get(sha) for name, sha in entries.items()}
+        missing = [name for name, data in files.items() if data is None]
+        blobs = await self._gather_limited(self.client.get_blob(entries[name]) for name in missing)
+        for name, data in zip(missing, blobs):
+            await self.blob_cache.put(entries[name], data)
+            files[name] = data
+        return files, commit_sha
+
+    async def push_many(self, files: dict[str, bytes], message: str,
+                        base: str | None = None) -> dict[str, float]:
+        """Write every file in one commit: blobs, then tree, then commit, then ref.
+
+        The ref update is a fast-forward from ``base`` (or the current head),
+        so nothing becomes visible unless every step succeeds.
+        """
+        if not files:
+            return {}
+        timings = {}
+        start = time.perf_counter()
+        head_sha, head_tree = await self.client.get_head()
+        if base is not None and base != head_sha:
+            raise StorageConflict("vault", head_sha)  # The branch moved since the files were read
+        timings["head"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        names = list(files)
+        blob_shas = await self._gather_limited(self.client.create_blob(files[n]) for n in names)
+        timings["blobs"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await self.refresh_manifest()  # Existing projects are written where they are
+        paths = [self.path(n) for n in names]
+        tree_sha = await self.client.create_tree(head_tree, [
+            {"path": path_in_repo, "mode": "100644", "type": "blob", "sha": sha}
+            for path_in_repo, sha in zip(paths, blob_shas)
+        ])
+        timings["tree"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        commit_sha = await self.client.create_commit(message, tree_sha, [head_sha])
+        timings["commit"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await self.client.update_ref(commit_sha)
+        timings["ref"] = time.perf_counter() - start
+
+        modified = _now()
+        for n, sha, path_in_repo in zip(names, blob_shas, paths):
+            self.manifest.set(FileInfo(n, len(files[n]), sha, modified, path_in_repo))
+            await self.blob_cache.put(sha, files[n])
+        self.history_index.record(commit_sha, head_sha, modified, message,
+                                  {n: (sha, len(files[n])) for n, sha in zip(names, blob_shas)})
+        return timings
+
+    async def migrate_layout(self) -> int:
+        """Move every flat ``<name>.env.enc`` into its shard directory, in one commit.
+
+        Blobs are not re-uploaded: the new tree points at the same blob shas.
+        Readers keep working throughout, since the manifest follows a project
+        to its new path, and a writer still holding an old path retries at the
+        new one. Fails (and changes nothing) if the branch moves meanwhile.
+        """
+        head_sha, head_tree = await self.client.get_head()
+        manifest = await self.refresh_manifest(force=True)
+        moves = [
+            (info, self.path(info.name, sharded=True))
+            for info in manifest.entries.values()
+            if info.path != self.path(info.name, sharded=True)
+        ]
+        if not moves:
+            self.sharded = True
+            return 0
+        tree_sha = await self.client.create_tree(head_tree, [
+            entry
+            for info, new_path in moves
+            for entry in (
+                {"path": new_path, "mode": "100644", "type": "blob", "sha": info.sha},
+                {"path": info.path, "mode": "100644", "type": "blob", "sha": None},
+            )
+        ])
+        commit_sha = await self.client.create_commit(
+            f"Move {len(moves)} projects to the sharded layout", tree_sha, [head_sha]
+        )
+        await self.client.update_ref(commit_sha)
+        # Projects keep their blobs, so the commit adds no versions
+        self.history_index.record(commit_sha, head_sha, _now(), "", {})
+        for info, new_path in moves:
+            self._etags.pop(info.path, None)
+            info.path = new_path
+        self.sharded = True
+        self.manifest.invalidate()
+        print(f"🎉 {len(moves)} projects moved to the sharded layout.")
+        return len(moves)
+
+    async def _commit_chain(self, head: str, stop: str | None) -> "tuple[list[dict], str | None]":
+        """First-parent chain from ``head`` back to ``stop`` (excluded), newest first.
+
+        Commits are listed 100 per request. Also returns where the walk
+        ended: ``stop``, None at the first commit, or the commit past
+        ``HISTORY_MAX_COMMITS``.
+        """
+        chain, sha, listed = [], head, {}
+        while sha is not None and sha != stop and len(chain) < settings.HISTORY_MAX_COMMITS:
+            if sha not in listed:
+                listed = {commit["sha"]: commit for commit in await self.client.list_commits(sha)}
+            commit = listed[sha]
+            chain.append(commit)
+            parents = commit["parents"]
+            sha = parents[0]["sha"] if parents else None
+        return chain, sha
+
+    async def _apply_chain(self, chain: "list[dict]") -> None:
+        """Apply listed commits to the history index, oldest first; one tree read each."""
+        index = self.history_index
+        for commit in reversed(chain):
+            entries = await self.client.walk_tree(commit["commit"]["tree"]["sha"])
+            dir_sha = next((e["sha"] for e in entries if e["path"] == self.directory and e["type"] == "tree"), None)
+            changes = {}
+            if dir_sha != index.tree:
+                current = {}
+                for entry in entries:
+                    name = self._project_name(entry["path"])
+                    if entry["type"] == "blob" and name is not None:
+                        current[name] = (entry["sha"], entry["size"])
+                changes = {name: blob for name, blob in current.items() if index.snapshot.get(name) != blob[0]}
+                changes.update({name: (None, 0) for name in index.snapshot if name not in current})
+            details = commit["commit"]
+            index.apply(commit["sha"], details["committer"]["date"], details.get("message", ""), changes, dir_sha)
+
+    async def _build_history(self, chain: "list[dict]", etag: str | None) -> None:
+        """Apply a long chain in the background, as bulk traffic."""
+        index = self.history_index
+        try:
+            with bulk_priority():
+                async with index.lock:
+                    await self._apply_chain(chain)
+                    self._history_etag = etag
+            print(f"History index built from {len(chain)} commits in the background.")
+        except Exception as e:
+            print(f"Building the history index failed: {e}")
+        await asyncio.to_thread(index.save)
+
+    def _history_building(self) -> bool:
+        return self._history_build is not None and not self._history_build.done()
+
+    async def _catch_up_history(self) -> HistoryIndex:
+        """Fold the commits made since the index head into the history index.
+
+        An unchanged branch costs one conditional request (304). Otherwise
+        the new commits are listed back to the index head, then applied
+        oldest first at one tree read each. If the index head is not found
+        within ``HISTORY_MAX_COMMITS`` (first run, or a force push) the index
+        is rebuilt from the commits that were listed. Chains longer than
+        ``HISTORY_INLINE_COMMITS`` are applied in the background; until they
+        are, the index is returned as it stands and reported incomplete.
+        """
+        index = self.history_index
+        if self._history_building():
+            return index
+        async with index.lock:
+            head, etag = await self.client.get_ref(self._history_etag)
+            if head is None or head == index.head:
+                self._history_etag = etag
+                return index
+            chain, sha = await self._commit_chain(head, index.head)
+            if sha != index.head:
+                index.reset()
+                index.complete = sha is None  # Reached the first commit
+            if len(chain) > HISTORY_INLINE_COMMITS:
+                self._history_build = asyncio.create_task(self._build_history(chain, etag))
+                return index
+            await self._apply_chain(chain)
+            self._history_etag = etag
+            print(f"History index caught up with {len(chain)} commits.")
+        await asyncio.to_thread(index.save)
+        return index
+
+    async def history(self, project_name: str) -> "list[Version] | None":
+        """Versions of a project from the history index, caught up with the branch first."""
+        index = await self._catch_up_history()
+        return index.get(project_name)
+
+    async def _version(self, project_name: str, commit: str) -> Version:
+        version = next((v for v in await self.history(project_name) if v.commit == commit and v.sha), None)
+        if version is None:
+            raise KeyError(f"{project_name} has no version written by commit {commit}")
+        return version
+
+    async def pull_version(self, project_name: str, commit: str) -> bytes:
+        """Read an earlier version's blob by its sha, from the blob cache when it is there."""
+        version = await self._version(project_name, commit)
+        data = await self.blob_cache.get(version.sha)
+        if data is None:
+            data = await self.client.get_blob(version.sha)
+            await self.blob_cache.put(version.sha, data)
+        return data
+
+    async def restore(self, project_name: str, commit: str) -> str | None:
+        """Point a project back at the blob an earlier commit wrote, in one new commit.
+
+        The blob is already in the repo, so nothing is downloaded or
+        re-encrypted: the new tree reuses its sha. Fails (and changes
+        nothing) if the branch moves meanwhile.
+        """
+        version = await self._version(project_name, commit)
+        info = (await self.refresh_manifest(force=True)).get(project_name)
+        if info is not None and info.sha == version.sha:
+            return version.sha  # Already the current version
+        head_sha, head_tree = await self.client.get_head()
+        path_in_repo = self.path(project_name)
+        tree_sha = await self.client.create_tree(head_tree, [
+            {"path": path_in_repo, "mode": "100644", "type": "blob", "sha": version.sha},
+        ])
+        message = f"Restore {project_name}{SUFFIX} to {commit[:7]}"
+        commit_sha = await self.client.create_commit(message, tree_sha, [head_sha])
+        await self.client.update_ref(commit_sha)
+        modified = _now()
+        self.manifest.set(FileInfo(project_name, version.size, version.sha, modified, path_in_repo))
+        self._etags.pop(path_in_repo, None)
+        self.history_index.record(commit_sha, head_sha, modified, message, {project_name: (version.sha, version.size)})
+        return version.sha
+
+    def stats(self) -> dict:
+        history = self.history_index.stats()
+        history["complete"] = history["complete"] and not self._history_building()
+        return {"blob_cache": self.blob_cache.stats(), "history": history}
+
+    async def aclose(self) -> None:
+        if self._history_building():
+            self._history_build.cancel()
+            await asyncio.gather(self._history_build, return_exceptions=True)
+        self.history_index.save()
+        await self.client.aclose()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
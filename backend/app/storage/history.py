@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class Version:
+    """One version of a project: the commit that wrote it and the blob it points at."""
+    commit: str
+    date: str | None
+    sha: str | None       # blob sha; None when the commit deleted the project
+    size: int = 0
+    message: str = ""
+
+
+class HistoryIndex:
+    """Per-project version history of a branch, kept in memory and on disk.
+
+    The index is a fold over the branch's commits: ``head`` is the last
+    commit applied and ``snapshot`` maps each project to its blob sha there.
+    Applying a commit on top of ``head`` appends a version to every project
+    whose blob changed, so the index only ever grows at the end and each
+    commit is looked at once. Writes made through this process are applied
+    as they happen; anything else is caught up from the branch by the owner.
+    ``complete`` is False when the scan that built the index stopped before
+    the first commit, so older versions are missing.
+    """
+
+    def __init__(self, path: str = "", source: str = ""):
+        self.path = path
+        self.source = source        # repo and branch the index belongs to
+        self.head: str | None = None
+        self.tree: str | None = None  # sha of the vault directory tree at head
+        self.snapshot: dict[str, str] = {}
+        self.versions: dict[str, list[Version]] = {}
+        self.complete = True
+        self.lock = asyncio.Lock()  # held while catching up with the branch
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            print(f"History index at {self.path} is unreadable, rebuilding it.")
+            return
+        if state.get("source") != self.source:
+            return
+        self.head = state["head"]
+        self.tree = state.get("tree")
+        self.snapshot = state["snapshot"]
+        self.versions = {name: [Version(**v) for v in versions] for name, versions in state["versions"].items()}
+        self.complete = state["complete"]
+
+    def save(self) -> None:
+        """Write the index to disk if it changed since the last save."""
+        if not self.path or not self._dirty:
+            return
+        state = {
+            "source": self.source, "head": self.head, "tree": self.tree, "snapshot": self.snapshot,
+            "complete": self.complete,
+            "versions": {name: [asdict(v) for v in versions] for name, versions in self.versions.items()},
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def reset(self) -> None:
+        self.head = self.tree = None
+        self.snapshot = {}
+        self.versions = {}
+        self.complete = True
+        self._dirty = True
+
+    def record(self, commit: str, parent: str | None, date: str | None, message: str,
+               changes: dict[str, tuple[str | None, int]]) -> bool:
+        """Record a commit made by this process (``changes``: name -> (blob sha or None, size)).
+
+        Only applies directly on top of ``head`` and outside a catch-up;
+        returns False otherwise, leaving the commit to the next catch-up.
+        """
+        if parent is None or parent != self.head or self.lock.locked():
+            return False
+        self.apply(commit, date, message, changes, None)
+        return True
+
+    def apply(self, commit: str, date: str | None, message: str,
+              changes: dict[str, tuple[str | None, int]], tree: str | None) -> None:
+        """Append a commit at ``head``; ``tree`` is its vault directory sha, if known."""
+        for name, (sha, size) in changes.items():
+            if self.snapshot.get(name) == sha:
+                continue
+            if sha is None:
+                self.snapshot.pop(name, None)
+            else:
+                self.snapshot[name] = sha
+            self.versions.setdefault(name, []).append(Version(commit, date, sha, size, message))
+        self.head = commit
+        self.tree = tree
+        self._dirty = True
+
+    def get(self, project_name: str) -> list[Version]:
+        """Versions of a project, newest first."""
+        return list(reversed(self.versions.get(project_name, [])))
+
+    def stats(self) -> dict:
+        return {
+            "head": self.head,
+            "projects": len(self.versions),
+            "versions": sum(len(versions) for versions in self.versions.values()),
+            "complete": self.complete,
+        }
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from collections.abc import AsyncIterator
+import threading
+from datetime import datetime, timezone
+from app.storage.base import STREAM_CHUNK_SIZE, FileInfo, StorageBackend, StorageConflict, files_revision
+from app.storage.blobcache import git_blob_sha
+
+SUFFIX = ".env.enc"
+
+
+class LocalBackend(StorageBackend):
+    """Stores blobs as ``<name>.env.enc`` files in a local directory."""
+
+    name = "local"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._write_lock = threading.Lock()  # serialises compare-and-swap writes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, project_name: str) -> str:
+        if not project_name or os.sep in project_name or "/" in project_name or project_name.startswith("."):
+            raise ValueError(f"Invalid project name: {project_name!r}")
+        return os.path.join(self.directory, f"{project_name}{SUFFIX}")
+
+    def _open_tmp(self, project_name: str):
+        """A new temp file next to a project's blob, unique so concurrent writes never share one."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{project_name}.", suffix=".tmp")
+        return os.fdopen(fd, "wb"), tmp_path
+
+    def _write_tmp(self, project_name: str, data: bytes) -> tuple[str, str]:
+        path = self._path(project_name)
+        f, tmp_path = self._open_tmp(project_name)
+        with f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path, path
+
+    def _write(self, project_name: str, data: bytes, expected_sha: str | None) -> str:
+        with self._write_lock:
+            if expected_sha is not None:
+                current = self._read(project_name)
+                current_sha = git_blob_sha(current) if current is not None else None
+                if current_sha != expected_sha:
+                    raise StorageConflict(project_name, current_sha)
+            os.replace(*self._write_tmp(project_name, data))  # Atomic, readers never see a partial file
+        return git_blob_sha(data)
+
+    def _write_many(self, files: dict[str, bytes], base: str | None) -> None:
+        # Stage every file first so a failure leaves the vault untouched
+        staged = []
+        try:
+            for project_name, data in files.items():
+                staged.append(self._write_tmp(project_name, data))
+            with self._write_lock:
+                if base is not None:
+                    current = files_revision(self._read_all())
+                    if current != base:
+                        raise StorageConflict("vault", current)
+                for tmp_path, path in staged:
+                    os.replace(tmp_path, path)
+                staged = []
+        finally:
+            for tmp_path, _ in staged:
+                os.remove(tmp_path)
+
+    def _read(self, project_name: str) -> bytes | None:
+        try:
+            with open(self._path(project_name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _read_all(self) -> dict[str, bytes]:
+        files = {}
+        for info in self._list():
+            data = self._read(info.name)
+            if data is not None:
+                files[info.name] = data
+        return files
+
+    def _list(self) -> list[FileInfo]:
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(SUFFIX):
+                    stat = entry.stat()
+                    modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                    files.append(FileInfo(entry.name[:-len(SUFFIX)], stat.st_size, modified=modified))
+        return files
+
+    def _delete(self, project_name: str) -> bool:
+        path = self._path(project_name)
+        with self._write_lock:
+            try:
+                os.remove(path)
+                return True
+            except FileNotFoundError:
+                return False
+
+    async def push(self, project_name: str, data: bytes, expected_sha: str | None = None) -> str | None:
+        return await asyncio.to_thread(self._write, project_name, data, expected_sha)
+
+    def _file_sha(self, path: str) -> str:
+        """Git blob sha of a file, hashed in chunks."""
+        digest = hashlib.sha1(b"blob %d\0" % os.path.getsize(path))
+        with open(path, "rb") as f:
+            while chunk := f.read(STREAM_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _commit_tmp(self, project_name: str, tmp_path: str, expected_sha: str | None) -> str:
+        path = self._path(project_name)
+        sha = self._file_sha(tmp_path)  # Still ours alone; the path may be replaced again once unlocked
+        with self._write_lock:
+            if expected_sha is not None:
+                current_sha = self._file_sha(path) if os.path.exists(path) else None
+                if current_sha != expected_sha:
+                    os.remove(tmp_path)
+                    raise StorageConflict(project_name, current_sha)
+            os.replace(tmp_path, path)
+        return sha
+
+    async def push_stream(self, project_name: str, chunks: AsyncIterator[bytes],
+                          expected_sha: str | None = None) -> str | None:
+        self._path(project_name)  # Validate the name before creating anything
+        f, tmp_path = await asyncio.to_thread(self._open_tmp, project_name)
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+            await asyncio.to_thread(os.fsync, f.fileno())
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+        f.close()
+        return await asyncio.to_thread(self._commit_tmp, project_name, tmp_path, expected_sha)
+
+    async def pull_stream(self, project_name: str) -> AsyncIterator[bytes] | None:
+        try:
+            f = await asyncio.to_thread(open, self._path(project_name), "rb")
+        except FileNotFoundError:
+            return None
+
+        async def read_chunks():
+            try:
+                while chunk := await asyncio.to_thread(f.read, STREAM_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                f.close()
+
+        return read_chunks()
+
+    async def push_many(self, files: dict[str, bytes], message: str,
+                        base: str | None = None) -> dict[str, float]:
+        await asyncio.to_thread(self._write_many, files, base)
+        return {}
+
+    async def pull(self, project_name: str) -> bytes | None:
+        return await asyncio.to_thread(self._read, project_name)
+
+    async def list(self) -> list[FileInfo]:
+        return await asyncio.to_thread(self._list)
+
+    async def delete(self, project_name: str) -> bool:
+        return await asyncio.to_thread(self._delete, project_name)
+
+    async def exists(self, project_name: str) -> bool:
+        return await asyncio.to_thread(os.path.isfile, self._path(project_name))
@@ -0,0 +1,54 @@
+import asyncio
+import time
+from app.storage.base import FileInfo
+
+
+class Manifest:
+    """In-memory index of the vault: project name -> FileInfo.
+
+    Backends that pay a network round trip for listings keep one of these
+    and refresh it incrementally; writes made through this process update
+    it directly, so only external changes need a refresh.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.entries: dict[str, FileInfo] = {}
+        self.version: str | None = None       # e.g. sha of the directory tree
+        self.etag: str | None = None          # validator for conditional refreshes
+        self.loaded = False
+        self.lock = asyncio.Lock()
+        self._refreshed_at = 0.0
+
+    def is_fresh(self) -> bool:
+        return self.loaded and time.monotonic() - self._refreshed_at < self.ttl
+
+    def mark_refreshed(self) -> None:
+        self.loaded = True
+        self._refreshed_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Force the next lookup to revalidate against the backend."""
+        self._refreshed_at = 0.0
+
+    def get(self, name: str) -> FileInfo | None:
+        return self.entries.get(name)
+
+    def set(self, info: FileInfo) -> None:
+        self.entries[info.name] = info
+
+    def remove(self, name: str) -> None:
+        self.entries.pop(name, None)
+
+    def replace(self, entries: dict[str, FileInfo], modified: str | None = None) -> None:
+        """Replace the index with a fresh listing, keeping known timestamps.
+
+        Entries whose sha changed since the last listing get ``modified``.
+        """
+        for name, info in entries.items():
+            old = self.entries.get(name)
+            if old is not None and old.sha == info.sha:
+                info.modified = info.modified or old.modified
+            elif self.loaded:
+                info.modified = info.modified or modified
+        self.entries = entries
@@ -0,0 +1,41 @@
+from app.storage.base import FileInfo, StorageBackend, StorageConflict, files_revision
+from app.storage.blobcache import git_blob_sha
+
+
+class MemoryBackend(StorageBackend):
+    """Keeps every blob in a dict. Contents are lost when the process exits."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._files: dict[str, bytes] = {}
+
+    async def push(self, project_name: str, data: bytes, expected_sha: str | None = None) -> str | None:
+        if expected_sha is not None:
+            current = self._files.get(project_name)
+            current_sha = git_blob_sha(current) if current is not None else None
+            if current_sha != expected_sha:
+                raise StorageConflict(project_name, current_sha)
+        self._files[project_name] = bytes(data)
+        return git_blob_sha(data)
+
+    async def pull(self, project_name: str) -> bytes | None:
+        return self._files.get(project_name)
+
+    async def list(self) -> list[FileInfo]:
+        return [FileInfo(name, len(data), git_blob_sha(data)) for name, data in self._files.items()]
+
+    async def delete(self, project_name: str) -> bool:
+        return self._files.pop(project_name, None) is not None
+
+    async def push_many(self, files: dict[str, bytes], message: str,
+                        base: str | None = None) -> dict[str, float]:
+        if base is not None:
+            current = files_revision(self._files)
+            if current != base:
+                raise StorageConflict("vault", current)
+        self._files.update({name: bytes(data) for name, data in files.items()})
+        return {}
+
+    async def exists(self, project_name: str) -> bool:
+        return project_name in self._files
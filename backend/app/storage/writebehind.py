@@ -0,0 +1,274 @@
+import asyncio
+import os
+import struct
+import time
+import zlib
+from collections.abc import AsyncIterator
+from app.storage.base import FileInfo, StorageBackend, StorageConflict, iter_chunks
+from app.storage.blobcache import git_blob_sha
+from app.storage.history import Version
+
+# Journal records: op | name length | data length | name | data | CRC-32 of all before it.
+# A record cut short by a crash fails its CRC and, with everything after it,
+# is dropped on replay; such a write was never acknowledged.
+_RECORD = struct.Struct(">BHI")
+_CRC = struct.Struct(">I")
+OP_PUT = 1
+
+
+class WriteBehindBackend(StorageBackend):
+    """Acknowledges writes once they are in a local journal and commits them in batches.
+
+    Wraps another backend. ``push`` appends the blob to an fsynced journal
+    and keeps it in memory, where reads see it at once; a background task
+    writes everything pending with a single ``push_many`` (one commit on
+    GitHub) every ``interval`` seconds, then compacts the journal. Later
+    writes to the same project replace earlier pending ones, so a burst of
+    edits becomes one commit. Entries left in the journal by a crash are
+    replayed on start-up.
+
+    ``expected_sha`` is checked when the write is queued, against the
+    pending version if there is one. Streamed writes, deletes, restores and
+    batch writes go straight to the wrapped backend, after pending writes
+    are dealt with.
+    """
+
+    def __init__(self, inner: StorageBackend, journal_path: str, interval: float):
+        self.inner = inner
+        self.name = inner.name
+        self.journal_path = journal_path
+        self.interval = interval
+        self.flushes = 0
+        self.last_error: str | None = None
+        self._pending: dict[str, tuple[bytes, str]] = {}   # name -> (data, modified)
+        self._generation = 0                # bumped whenever the pending writes change
+        self._lock = asyncio.Lock()         # serialises journal appends and rewrites
+        self._flush_lock = asyncio.Lock()   # one flush (or delete, or batch write) at a time
+        self._worker: asyncio.Task | None = None
+        os.makedirs(os.path.dirname(journal_path) or ".", exist_ok=True)
+        self._replay()
+        self._journal = open(journal_path, "ab")
+
+    # --- journal ---
+
+    def _replay(self) -> None:
+        try:
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        offset = 0
+        while offset + _RECORD.size <= len(data):
+            op, name_size, data_size = _RECORD.unpack_from(data, offset)
+            end = offset + _RECORD.size + name_size + data_size
+            if end + _CRC.size > len(data) or op != OP_PUT:
+                break
+            (crc,) = _CRC.unpack_from(data, end)
+            if zlib.crc32(data[offset:end]) != crc:
+                break
+            name = data[offset + _RECORD.size:offset + _RECORD.size + name_size].decode("utf-8")
+            self._pending[name] = (data[end - data_size:end], _now())
+            offset = end + _CRC.size
+        if offset < len(data):
+            print(f"Write-behind journal: dropped {len(data) - offset} trailing bytes of an incomplete write.")
+        if self._pending:
+            print(f"Write-behind journal: replaying {len(self._pending)} pending writes.")
+
+    @staticmethod
+    def _record(name: str, data: bytes) -> bytes:
+        encoded = name.encode("utf-8")
+        body = _RECORD.pack(OP_PUT, len(encoded), len(data)) + encoded + data
+        return body + _CRC.pack(zlib.crc32(body))
+
+    def _append(self, record: bytes) -> None:
+        self._journal.write(record)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _rewrite(self, pending: dict[str, bytes]) -> None:
+        """Replace the journal with just the writes still pending."""
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for name, data in pending.items():
+                f.write(self._record(name, data))
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal.close()
+        os.replace(tmp_path, self.journal_path)
+        self._journal = open(self.journal_path, "ab")
+
+    # --- flushing ---
+
+    async def start(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Write-behind flush failed, retrying in {self.interval}s: {e}")
+
+    async def flush(self) -> int:
+        """Write every pending blob in one batch. Returns how many were written.
+
+        Writes keep being accepted while the batch is uploaded.
+        """
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self) -> int:
+        if not self._pending:
+            return 0
+        batch = dict(self._pending)
+        names = ", ".join(sorted(batch)[:5]) + (", ..." if len(batch) > 5 else "")
+        await self.inner.push_many({name: data for name, (data, _) in batch.items()},
+                                   f"Update {len(batch)} projects ({names})")
+        await self._settle(batch)
+        self.flushes += 1
+        self.last_error = None
+        return len(batch)
+
+    async def _settle(self, written: dict[str, tuple[bytes, str]]) -> None:
+        """Drop pending entries that were written, unless replaced meanwhile, and compact the journal."""
+        async with self._lock:
+            for name, entry in written.items():
+                if self._pending.get(name) is entry:
+                    del self._pending[name]
+            self._generation += 1
+            await asyncio.to_thread(self._rewrite, {name: data for name, (data, _) in self._pending.items()})
+
+    # --- StorageBackend ---
+
+    async def push(self, project_name: str, data: bytes, expected_sha: str | None = None) -> str | None:
+        data = bytes(data)
+        async with self._lock:
+            if expected_sha is not None:
+                pending = self._pending.get(project_name)
+                current = pending[0] if pending is not None else await self.inner.pull(project_name)
+                current_sha = git_blob_sha(current) if current is not None else None
+                if current_sha != expected_sha:
+                    raise StorageConflict(project_name, current_sha)
+            await asyncio.to_thread(self._append, self._record(project_name, data))
+            self._pending[project_name] = (data, _now())
+            self._generation += 1
+        await self.start()
+        return git_blob_sha(data)
+
+    async def push_stream(self, project_name: str, chunks: AsyncIterator[bytes],
+                          expected_sha: str | None = None) -> str | None:
+        """Stream straight to the wrapped backend instead of buffering the blob in the journal."""
+        async with self._flush_lock:
+            if project_name in self._pending:
+                await self._flush()  # Otherwise a later flush would overwrite the streamed blob
+            return await self.inner.push_stream(project_name, chunks, expected_sha)
+
+    async def pull(self, project_name: str) -> bytes | None:
+        pending = self._pending.get(project_name)
+        if pending is not None:
+            return pending[0]
+        return await self.inner.pull(project_name)
+
+    async def pull_stream(self, project_name: str) -> AsyncIterator[bytes] | None:
+        pending = self._pending.get(project_name)
+        if pending is not None:
+            return iter_chunks(pending[0])
+        return await self.inner.pull_stream(project_name)
+
+    async def list(self) -> list[FileInfo]:
+        files = {info.name: info for info in await self.inner.list()}
+        for name, (data, modified) in self._pending.items():
+            files[name] = FileInfo(name, len(data), git_blob_sha(data), modified)
+        return list(files.values())
+
+    async def exists(self, project_name: str) -> bool:
+        return project_name in self._pending or await self.inner.exists(project_name)
+
+    async def delete(self, project_name: str) -> bool:
+        async with self._flush_lock:
+            if project_name in self._pending:
+                await self._flush()  # Otherwise a later flush would bring the project back
+            return await self.inner.delete(project_name)
+
+    async def pull_all(self) -> tuple[dict[str, bytes], str | None]:
+        """Every blob, pending writes included.
+
+        The revision also records which pending writes were read, so that
+        ``push_many`` can tell whether they changed since.
+        """
+        generation, pending = self._generation, dict(self._pending)
+        files, revision = await self.inner.pull_all()
+        files.update({name: data for name, (data, _) in pending.items()})
+        return files, f"{revision or ''}@{generation}"
+
+    async def push_many(self, files: dict[str, bytes], message: str,
+                        base: str | None = None) -> dict[str, float]:
+        """Write a batch straight through; it supersedes pending writes to the same projects.
+
+        Batches come from rotation, which read the pending writes through
+        ``pull_all`` and passes its revision as ``base``. If a write was
+        queued or flushed since that read, the batch is refused with
+        ``StorageConflict``: it would overwrite an acknowledged write, or
+        leave one to be flushed later under keys the batch replaced. Without
+        ``base``, pending writes are flushed first.
+        """
+        async with self._flush_lock:
+            if base is None:
+                await self._flush()
+                return await self.inner.push_many(files, message)
+            revision, _, generation = base.rpartition("@")
+            async with self._lock:  # No write is queued until the batch has landed
+                if int(generation) != self._generation:
+                    raise StorageConflict("vault", None)
+                timings = await self.inner.push_many(files, message, revision or None)
+                for name in files:
+                    self._pending.pop(name, None)
+                self._generation += 1
+                await asyncio.to_thread(self._rewrite, {name: data for name, (data, _) in self._pending.items()})
+        return timings
+
+    async def history(self, project_name: str) -> "list[Version] | None":
+        return await self.inner.history(project_name)  # Committed versions only
+
+    async def pull_version(self, project_name: str, commit: str) -> bytes:
+        return await self.inner.pull_version(project_name, commit)
+
+    async def restore(self, project_name: str, commit: str) -> str | None:
+        async with self._flush_lock:
+            if project_name in self._pending:
+                await self._flush()  # Otherwise a later flush would overwrite the restored version
+            return await self.inner.restore(project_name, commit)
+
+    async def migrate_layout(self) -> int:
+        async with self._flush_lock:
+            await self._flush()
+            return await self.inner.migrate_layout()
+
+    def stats(self) -> dict:
+        return {
+            **self.inner.stats(),
+            "write_behind": {
+                "pending": len(self._pending),
+                "pending_bytes": sum(len(data) for data, _ in self._pending.values()),
+                "flushes": self.flushes,
+                "last_error": self.last_error,
+            },
+        }
+
+    async def aclose(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Write-behind flush on shutdown failed, {len(self._pending)} writes stay journaled: {e}")
+        self._journal.close()
+        await self.inner.aclose()
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
@@ -0,0 +1,160 @@
+"""API benchmark: throughput and latency of the main endpoints against a fake GitHub.
+
+The app is served in-process (httpx ASGI transport) on top of the real
+GitHub storage backend, whose HTTP calls go to the in-memory stand-in in
+benchmarks/fakegithub.py, so runs need no network and are repeatable. For
+each vault size a fresh vault is created and seeded with synthetic projects,
+then /projects, /download-data and /upload-data are driven at each
+concurrency level and /update-passphrase is timed on its own.
+
+Run from the backend directory:
+
+    python -m benchmarks.api                                  # 10 to 5000 projects, concurrency 1/8/32
+    python -m benchmarks.api --sizes 10,100 --latency 0.05    # add 50 ms per GitHub round trip
+    python -m benchmarks.api --output after.json              # then: python -m benchmarks.results before.json after.json
+"""
+import os
+
+# Settings are read at import time; keep the run independent of a local .env
+os.environ.setdefault("PASSWORD", "benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("GH_TOKEN", "benchmark-token")
+os.environ["GH_REPO"] = "bench/vault"
+os.environ["STORAGE_BACKEND"] = "github"
+os.environ["WRITE_BEHIND"] = "false"
+os.environ["BLOB_CACHE_DIR"] = ""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+import httpx
+from app.auth.auth import create_access_token
+from app.crypto.envelope import encrypt_for_vault
+from app.crypto.keycache import key_cache
+from app.crypto.verify import unlock_vault
+from app.github.client import GitHubClient
+from app.main import app
+from app.storage import get_storage, set_storage
+from app.storage.github import GitHubBackend
+from benchmarks import results
+from benchmarks.compression import synthetic_vault
+from benchmarks.fakegithub import BRANCH, REPO, FakeGitHub
+
+PASSPHRASES = ("benchmark passphrase one", "benchmark passphrase two")
+
+
+async def seed_vault(http: httpx.AsyncClient, projects: int) -> list[str]:
+    """Create the passphrase through the API and write the projects in one commit."""
+    response = await http.post("/create-passphrase", data={"passphrase": PASSPHRASES[0]})
+    response.raise_for_status()
+    keys = await unlock_vault(PASSPHRASES[0])
+    names = [f"project-{i:05d}" for i in range(projects)]
+    files = {name: encrypt_for_vault(data, keys) for name, data in zip(names, synthetic_vault(projects))}
+    await get_storage().push_many(files, f"Seed {projects} projects")
+    return names
+
+
+async def drive(send, total: int, concurrency: int) -> tuple[list[float], int, float]:
+    """Issue ``total`` requests, ``concurrency`` at a time. Returns latencies, errors and wall time."""
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await send(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def bench_size(projects: int, args: argparse.Namespace) -> list[dict]:
+    fake = FakeGitHub(latency=args.latency)
+    set_storage(GitHubBackend(GitHubClient("benchmark-token", REPO, BRANCH, transport=fake.transport())))
+    key_cache.clear()
+    rng = random.Random(projects)
+    cookies = {"access_token": create_access_token({"sub": "benchmark"})}
+    transport = httpx.ASGITransport(app=app)
+    rows = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies,
+                                 timeout=None) as http:
+        start = time.perf_counter()
+        names = await seed_vault(http, projects)
+        print(f"\n{projects} projects (seeded in {time.perf_counter() - start:.1f}s)")
+        passphrase = PASSPHRASES[0]
+        bodies = synthetic_vault(args.requests, seed=projects + 1)
+        revision = itertools.count()  # Every upload changes the project, so none is skipped as unchanged
+
+        scenarios = {
+            "projects": lambda i: http.get("/projects"),
+            "download-data": lambda i: http.post(
+                "/download-data", data={"passphrase": passphrase, "project_name": rng.choice(names)}),
+            "upload-data": lambda i: http.post("/upload-data", json={
+                "passphrase": passphrase, "project_name": names[i % len(names)],
+                "data": f"{bodies[i].decode()}# revision {next(revision)}\n", "update": True}),
+        }
+        for name, send in scenarios.items():
+            for concurrency in args.concurrency:
+                calls = fake.requests
+                latencies, errors, elapsed = await drive(send, args.requests, concurrency)
+                rows.append(_row(name, projects, concurrency, latencies, errors, elapsed,
+                                 fake.requests - calls))
+
+        latencies, errors, calls = [], 0, fake.requests
+        start = time.perf_counter()
+        for i in range(args.rotations):
+            old, new = PASSPHRASES[i % 2], PASSPHRASES[(i + 1) % 2]
+            begin = time.perf_counter()
+            response = await http.post("/update-passphrase", data={"old_passphrase": old, "new_passphrase": new})
+            latencies.append(time.perf_counter() - begin)
+            errors += response.status_code >= 400
+        rows.append(_row("update-passphrase", projects, 1, latencies, errors, time.perf_counter() - start,
+                         fake.requests - calls))
+    await get_storage().aclose()
+    return rows
+
+
+def _row(name: str, projects: int, concurrency: int, latencies: list[float], errors: int,
+         elapsed: float, github_calls: int) -> dict:
+    row = {"name": name, "projects": projects, "concurrency": concurrency,
+           **results.summarize(latencies, elapsed), "errors": errors,
+           "github_calls_per_request": round(github_calls / max(len(latencies), 1), 2)}
+    print(f"  {name:<18} c={concurrency:<4} {row['throughput']:>9.1f} req/s  p50 {row['p50_ms']:>9.2f}  "
+          f"p95 {row['p95_ms']:>9.2f}  p99 {row['p99_ms']:>9.2f} ms  "
+          f"gh/req {row['github_calls_per_request']:>6}  errors {errors}")
+    return row
+
+
+def _ints(value: str) -> list[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    rows = []
+    for projects in args.sizes:
+        rows.extend(await bench_size(projects, args))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=_ints, default=[10, 100, 1000, 5000], help="vault sizes, comma separated")
+    parser.add_argument("--concurrency", type=_ints, default=[1, 8, 32], help="concurrency levels, comma separated")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+    parser.add_argument("--rotations", type=int, default=1, help="passphrase updates timed per vault size")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every GitHub API call")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args()
+    rows = asyncio.run(run(args))
+    results.write(args.output, "api", args, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Crypto micro-benchmarks: per-call latency of the encryption primitives.
+
+Times encrypt_data, decrypt_data and verify (passphrase Fernet format),
+unwrap_key_file (opening the passphrase file) and encrypt_for_vault /
+decrypt_from_vault (compact blobs under the master key), on 1 KiB and 64 KiB
+inputs. Passphrase operations are measured with a warm key cache and a cold
+one, where every call pays for the KDF.
+
+Run from the backend directory:
+
+    python -m benchmarks.crypto
+    python -m benchmarks.crypto --output after.json   # then: python -m benchmarks.results before.json after.json
+"""
+import argparse
+import time
+from app.crypto.decrypt import decrypt_data
+from app.crypto.encrypt import encrypt_data
+from app.crypto.envelope import (
+    VaultKeys, decrypt_from_vault, encrypt_for_vault, generate_master_key, unwrap_key_file, wrap_master_key,
+)
+from app.crypto.keycache import key_cache
+from app.crypto.verify import verify
+from benchmarks import results
+from benchmarks.compression import synthetic_vault
+
+PASSPHRASE = "benchmark passphrase"
+SIZES = {"1KiB": 1024, "64KiB": 64 * 1024}
+
+
+def env_file(size: int) -> bytes:
+    """Realistic .env content of exactly ``size`` bytes."""
+    data = b"".join(synthetic_vault(max(size // 300, 1) + 1))
+    while len(data) < size:
+        data += data
+    return data[:size]
+
+
+def measure(name: str, size: str, cache: str, fn, iterations: int) -> dict:
+    if cache == "warm":
+        fn()  # Fill the key cache
+    timings = []
+    for _ in range(iterations):
+        if cache == "cold":
+            key_cache.clear()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    row = {
+        "name": name, "size": size, "cache": cache, "iterations": iterations,
+        "p50_us": round(results.percentile(timings, 0.50) * 1e6, 1),
+        "p95_us": round(results.percentile(timings, 0.95) * 1e6, 1),
+        "p99_us": round(results.percentile(timings, 0.99) * 1e6, 1),
+    }
+    print(f"{name:<20} {size:>6} {cache:>5} {row['p50_us']:>12.1f} {row['p95_us']:>12.1f} {row['p99_us']:>12.1f}")
+    return row
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200, help="calls per measurement with a warm key cache")
+    parser.add_argument("--cold-iterations", type=int, default=10, help="calls per measurement that run the KDF")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args()
+
+    keys = VaultKeys(PASSPHRASE, generate_master_key(), migrated=True)
+    key_file = wrap_master_key(keys.master_key, PASSPHRASE)
+    rows = []
+    print(f"{'operation':<20} {'size':>6} {'cache':>5} {'p50 µs':>12} {'p95 µs':>12} {'p99 µs':>12}")
+    for size, length in SIZES.items():
+        data = env_file(length)
+        token = encrypt_data(data, PASSPHRASE)
+        blob = encrypt_for_vault(data, keys)
+        passphrase_ops = {
+            "encrypt_data": lambda: encrypt_data(data, PASSPHRASE),
+            "decrypt_data": lambda: decrypt_data(token, PASSPHRASE),
+            "verify": lambda: verify(token, PASSPHRASE),
+        }
+        for name, fn in passphrase_ops.items():
+            rows.append(measure(name, size, "warm", fn, args.iterations))
+            rows.append(measure(name, size, "cold", fn, args.cold_iterations))
+        rows.append(measure("encrypt_for_vault", size, "none", lambda: encrypt_for_vault(data, keys), args.iterations))
+        rows.append(measure("decrypt_from_vault", size, "none", lambda: decrypt_from_vault(blob, keys), args.iterations))
+    rows.append(measure("unwrap_key_file", "-", "warm", lambda: unwrap_key_file(key_file, PASSPHRASE), args.iterations))
+    rows.append(measure("unwrap_key_file", "-", "cold", lambda: unwrap_key_file(key_file, PASSPHRASE),
+                        args.cold_iterations))
+    results.write(args.output, "crypto", args, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""In-memory stand-in for the parts of the GitHub REST API that Envault uses.
+
+Implements the contents API (get, raw get, put, delete, directory listing,
+ETag revalidation) and the git data API (refs, commits, trees, blobs) for a
+single repo and branch, as an ``httpx.MockTransport``. Every response carries
+rate limit headers. An optional latency stands in for the network round trip.
+"""
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import time
+import httpx
+
+REPO = "bench/vault"
+BRANCH = "main"
+
+
+def blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FakeGitHub:
+    def __init__(self, latency: float = 0.0, rate_limit: int = 1_000_000):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.blobs: dict[str, bytes] = {}
+        self.trees: dict[str, dict[str, str]] = {}      # tree sha -> {full path: blob sha}
+        self.commits: dict[str, dict] = {}
+        self._ids = itertools.count()
+        self.head = self._commit({}, [], "Initial commit")
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    # --- repo state ---
+
+    def _new_sha(self) -> str:
+        return hashlib.sha1(f"fake-{next(self._ids)}".encode()).hexdigest()
+
+    def _commit(self, files: dict[str, str], parents: list[str], message: str) -> str:
+        tree_sha = self._new_sha()
+        self.trees[tree_sha] = dict(files)
+        commit_sha = self._new_sha()
+        self.commits[commit_sha] = {
+            "tree": tree_sha, "parents": parents, "message": message,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        return commit_sha
+
+    def _commit_json(self, commit_sha: str) -> dict:
+        commit = self.commits[commit_sha]
+        return {"sha": commit_sha, "tree": {"sha": commit["tree"]}, "message": commit["message"],
+                "parents": [{"sha": parent} for parent in commit["parents"]],
+                "committer": {"date": commit["date"]}}
+
+    def files(self) -> dict[str, str]:
+        return self.trees[self.commits[self.head]["tree"]]
+
+    def _put_blob(self, data: bytes) -> str:
+        sha = blob_sha(data)
+        self.blobs[sha] = data
+        return sha
+
+    def _listing(self, files: dict[str, str], prefix: str, recursive: bool) -> list[dict]:
+        """Entries below ``prefix`` ("" for the root), as the git trees API returns them."""
+        entries, subtrees = [], {}
+        for path, sha in files.items():
+            if not path.startswith(prefix):
+                continue
+            rest = path[len(prefix):]
+            directory, _, _ = rest.partition("/")
+            if "/" in rest:
+                subtrees.setdefault(directory, {})[path] = sha
+                if not recursive:
+                    continue
+            entries.append({"path": rest, "type": "blob", "mode": "100644", "sha": sha,
+                            "size": len(self.blobs[sha])})
+        for directory, contents in subtrees.items():
+            sha = self._tree_sha(f"{prefix}{directory}/", contents)
+            entries.append({"path": directory, "type": "tree", "mode": "040000", "sha": sha})
+        return entries
+
+    def _tree_sha(self, prefix: str, contents: dict[str, str]) -> str:
+        """Content-addressed id for a subtree, registered so it can be listed later."""
+        sha = hashlib.sha1(json.dumps([prefix, sorted(contents.items())]).encode()).hexdigest()
+        self.trees.setdefault(sha, {"__prefix__": prefix, **contents})
+        return sha
+
+    # --- HTTP ---
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.requests += 1
+        response = self._route(request)
+        response.headers.update({
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(self.rate_limit - self.requests, 0)),
+            "X-RateLimit-Reset": str(int(time.time()) + 3600),
+        })
+        return response
+
+    def _route(self, request: httpx.Request) -> httpx.Response:
+        prefix = f"/repos/{REPO}"
+        path = request.url.path
+        if not path.startswith(prefix):
+            return _error(404, "Not Found")
+        path = path[len(prefix):]
+        method = request.method
+        body = json.loads(request.content) if request.content else {}
+        raw = request.headers.get("Accept") == "application/vnd.github.raw"
+
+        if path == "":
+            return httpx.Response(200, json={"default_branch": BRANCH})
+        if path.startswith("/contents/"):
+            return self._contents(method, path[len("/contents/"):], body, raw, request.headers)
+        if path == f"/git/ref/heads/{BRANCH}":
+            etag = f'"{self.head}"'
+            if request.headers.get("If-None-Match") == etag:
+                return httpx.Response(304)
+            return httpx.Response(200, json={"object": {"sha": self.head}}, headers={"ETag": etag})
+        if path == f"/git/refs/heads/{BRANCH}" and method == "PATCH":
+            if self.head not in self.commits[body["sha"]]["parents"] and not body.get("force"):
+                return _error(422, "Update is not a fast forward")
+            self.head = body["sha"]
+            return httpx.Response(200, json={"object": {"sha": self.head}})
+        if path == "/commits" and method == "GET":
+            # First-parent walk from ``sha``; the real API lists every ancestor, newest first
+            sha, listed = request.url.params.get("sha") or self.head, []
+            while sha is not None and len(listed) < int(request.url.params.get("per_page", 30)):
+                commit = self._commit_json(sha)
+                listed.append({"sha": sha, "parents": commit["parents"], "commit": {
+                    "tree": commit["tree"], "message": commit["message"], "committer": commit["committer"],
+                }})
+                sha = commit["parents"][0]["sha"] if commit["parents"] else None
+            return httpx.Response(200, json=listed)
+        if path.startswith("/git/commits/"):
+            return httpx.Response(200, json=self._commit_json(path.rsplit("/", 1)[1]))
+        if path == "/git/commits":
+            commit_sha = self._new_sha()
+            self.commits[commit_sha] = {"tree": body["tree"], "parents": body["parents"],
+                                        "message": body["message"], "date": time.strftime("%Y-%m-%dT%H:%M:%SZ")}
+            return httpx.Response(201, json={"sha": commit_sha})
+        if path.startswith("/git/trees/") and method == "GET":
+            tree_sha = path.rsplit("/", 1)[1]
+            files = dict(self.trees[tree_sha])
+            tree_prefix = files.pop("__prefix__", "")
+            recursive = bool(request.url.params.get("recursive"))
+            return httpx.Response(200, json={"sha": tree_sha, "truncated": False,
+                                             "tree": self._listing(files, tree_prefix, recursive)})
+        if path == "/git/trees":
+            files = dict(self.trees[body["base_tree"]])
+            for entry in body["tree"]:
+                if entry.get("sha") is None:
+                    files.pop(entry["path"], None)
+                else:
+                    files[entry["path"]] = entry["sha"]
+            tree_sha = self._new_sha()
+            self.trees[tree_sha] = files
+            return httpx.Response(201, json={"sha": tree_sha})
+        if path.startswith("/git/blobs/"):
+            data = self.blobs[path.rsplit("/", 1)[1]]
+            if raw:
+                return httpx.Response(200, content=data)
+            return httpx.Response(200, json={"content": base64.b64encode(data).decode(), "encoding": "base64"})
+        if path == "/git/blobs":
+            return httpx.Response(201, json={"sha": self._put_blob(base64.b64decode(body["content"]))})
+        return _error(404, f"Not handled by the fake: {method} {path}")
+
+    def _contents(self, method: str, file_path: str, body: dict, raw: bool, headers) -> httpx.Response:
+        files = self.files()
+        current = files.get(file_path)
+        if method == "GET":
+            if current is None:
+                listing = [
+                    {"type": "file", "name": path.rsplit("/", 1)[-1], "path": path, "sha": sha,
+                     "size": len(self.blobs[sha])}
+                    for path, sha in files.items() if path.rsplit("/", 1)[0] == file_path
+                ]
+                return httpx.Response(200, json=listing) if listing else _error(404, "Not Found")
+            data = self.blobs[current]
+            if raw:
+                return httpx.Response(200, content=data)
+            etag = f'"{current}"'
+            if headers.get("If-None-Match") == etag:
+                return httpx.Response(304)
+            return httpx.Response(200, headers={"ETag": etag}, json={
+                "type": "file", "path": file_path, "sha": current, "size": len(data),
+                "encoding": "base64", "content": base64.b64encode(data).decode(),
+            })
+        if method == "PUT":
+            if current is not None and body.get("sha") != current:
+                return _error(409, f"{file_path} does not match {body.get('sha')}")
+            if current is None and body.get("sha"):
+                return _error(422, "sha was given for a file that does not exist")
+            files = {**files, file_path: self._put_blob(base64.b64decode(body["content"]))}
+            self.head = self._commit(files, [self.head], body["message"])
+            return httpx.Response(200, json={
+                "content": {"path": file_path, "sha": files[file_path], "size": len(self.blobs[files[file_path]])},
+                "commit": self._commit_json(self.head),
+            })
+        if method == "DELETE":
+            if current is None:
+                return _error(404, "Not Found")
+            if body.get("sha") != current:
+                return _error(409, f"{file_path} does not match {body.get('sha')}")
+            files = {path: sha for path, sha in files.items() if path != file_path}
+            self.head = self._commit(files, [self.head], body["message"])
+            return httpx.Response(200, json={"commit": self._commit_json(self.head)})
+        return _error(405, "Method not allowed")
+
+
+def _error(status_code: int, message: str) -> httpx.Response:
+    return httpx.Response(status_code, json={"message": message})
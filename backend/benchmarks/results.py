@@ -0,0 +1,106 @@
+"""Benchmark results: latency summaries, JSON output and run-to-run comparison.
+
+Compare two result files (exits with status 1 if anything regressed):
+
+    python -m benchmarks.results before.json after.json --threshold 0.10
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    """Throughput and latency percentiles (in milliseconds) of one measured run."""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "throughput": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(ordered) * 1e3, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1e3, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1e3, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1e3, 3),
+        "max_ms": round(ordered[-1] * 1e3, 3) if ordered else 0.0,
+    }
+
+
+def metadata(args: argparse.Namespace) -> dict:
+    """Where and how a run was made, so results are only compared like for like."""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {key: value for key, value in vars(args).items() if key != "output"},
+    }
+
+
+def write(path: str | None, suite: str, args: argparse.Namespace, results: list[dict]) -> None:
+    if not path:
+        return
+    with open(path, "w") as f:
+        json.dump({"suite": suite, "meta": metadata(args), "results": results}, f, indent=2)
+        f.write("\n")
+    print(f"\nResults written to {path}")
+
+
+def _key(result: dict) -> tuple:
+    return tuple((name, result[name]) for name in ("name", "projects", "concurrency", "size", "cache") if name in result)
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[str]:
+    """Print a side-by-side of two runs and return the descriptions of regressions."""
+    if before["meta"]["args"] != after["meta"]["args"]:
+        print("Warning: the runs used different arguments, only matching benchmarks are compared\n")
+    old = {_key(result): result for result in before["results"]}
+    regressions = []
+    print(f"{'benchmark':<48} {'p50 before':>11} {'p50 after':>10} {'change':>8}")
+    for result in after["results"]:
+        previous = old.get(_key(result))
+        if previous is None:
+            continue
+        label = " ".join(f"{name}={value}" for name, value in _key(result))
+        metric = "p50_ms" if "p50_ms" in result else "p50_us"
+        change = (result[metric] - previous[metric]) / previous[metric] if previous[metric] else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{label:<48} {previous[metric]:>11} {result[metric]:>10} {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(label)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative p50 slowdown that counts as a regression")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    regressions = compare(before, after, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regressions above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import os
+
+# Settings are read when app.config is first imported
+os.environ.setdefault("PASSWORD", "test-password")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["WRITE_BEHIND"] = "false"
+os.environ["HISTORY_INDEX_PATH"] = ""
+os.environ["REENCRYPT_WORKERS"] = "1"
+
+from contextlib import asynccontextmanager
+import httpx
+import pytest
+from app.auth.auth import create_access_token
+from app.auth.sessions import unlock_sessions
+from app.crypto import key_cache, rotation_progress
+from app.github.client import GitHubClient
+from app.main import app
+from app.storage import set_storage
+from app.storage.github import GitHubBackend
+from app.storage.memory import MemoryBackend
+from benchmarks.fakegithub import BRANCH, REPO, FakeGitHub
+
+PASSPHRASE = "correct horse battery staple"
+UNLOCK_HEADERS = {"X-Envault-Unlock": "1"}  # Sent by the web app on every request that may use a session
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    key_cache.clear()
+    unlock_sessions.clear()
+    rotation_progress.update(state="idle", phase=None, done=0, total=0, error=None)
+    yield
+
+
+@pytest.fixture
+def memory():
+    backend = MemoryBackend()
+    set_storage(backend)
+    return backend
+
+
+@pytest.fixture
+def fake_github():
+    return FakeGitHub()
+
+
+@pytest.fixture
+def github(fake_github):
+    backend = GitHubBackend(GitHubClient("test-token", REPO, BRANCH, transport=fake_github.transport()))
+    set_storage(backend)
+    return backend
+
+
+@asynccontextmanager
+async def logged_in_client(create_passphrase: bool = True):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="https://testserver") as client:
+        client.cookies.set("access_token", create_access_token({"sub": "admin"}))
+        if create_passphrase:
+            response = await client.post("/create-passphrase", data={"passphrase": PASSPHRASE})
+            assert response.status_code == 200, response.text
+        yield client
+
+
+@pytest.fixture
+async def client(memory):
+    """Logged-in API client on a fresh in-memory vault."""
+    async with logged_in_client() as client:
+        yield client
+
+
+@pytest.fixture
+async def github_client(github):
+    """Logged-in API client on a fresh vault in the fake GitHub repo."""
+    async with logged_in_client() as client:
+        yield client
+
+
+async def upload(client, project_name: str, data: str, update: bool = False, **extra) -> httpx.Response:
+    payload = {"passphrase": PASSPHRASE, "project_name": project_name, "data": data, "update": update, **extra}
+    return await client.post("/upload-data", json=payload)
+
+
+async def download(client, project_name: str, passphrase: str = PASSPHRASE) -> httpx.Response:
+    return await client.post("/download-data", data={"passphrase": passphrase, "project_name": project_name},
+                             headers=UNLOCK_HEADERS)
@@ -0,0 +1,38 @@
+import pytest
+from cryptography.fernet import InvalidToken
+from app.crypto.blob import BLOB_MAGIC, HEADER_SIZE
+from app.crypto.envelope import (
+    VaultKeys, decrypt_from_vault, encrypt_for_vault, fingerprint, generate_master_key, stored_fingerprint,
+)
+
+ENV = b"DATABASE_URL=postgres://db.example.com/app\nREDIS_URL=redis://cache.example.com:6379\n"
+
+
+def master_keys() -> VaultKeys:
+    return VaultKeys("passphrase", generate_master_key(), True)
+
+
+def test_compact_blob_round_trip_and_header():
+    keys = master_keys()
+    blob = encrypt_for_vault(ENV, keys)
+    assert blob.startswith(BLOB_MAGIC)
+    assert decrypt_from_vault(blob, keys) == ENV
+    assert stored_fingerprint(blob) == fingerprint(ENV, keys)
+
+
+def test_compact_blob_detects_tampering():
+    keys = master_keys()
+    blob = bytearray(encrypt_for_vault(ENV, keys))
+    blob[-1] ^= 1
+    with pytest.raises(InvalidToken):
+        decrypt_from_vault(bytes(blob), keys)
+    header_tampered = bytearray(encrypt_for_vault(ENV, keys))
+    header_tampered[HEADER_SIZE - 1] ^= 1  # Last fingerprint byte, authenticated as associated data
+    with pytest.raises(InvalidToken):
+        decrypt_from_vault(bytes(header_tampered), keys)
+
+
+def test_compact_blob_needs_the_right_key():
+    blob = encrypt_for_vault(ENV, master_keys())
+    with pytest.raises(InvalidToken):
+        decrypt_from_vault(blob, master_keys())
@@ -0,0 +1,25 @@
+import asyncio
+import os
+import pytest
+from app.storage.blobcache import BlobCache, git_blob_sha
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_disk_writes_of_one_blob(tmp_path):
+    cache = BlobCache(0, str(tmp_path))  # Nothing fits in memory: every hit comes from disk
+    data = b"encrypted" * 10_000
+    sha = git_blob_sha(data)
+    await asyncio.gather(*(cache.put(sha, data) for _ in range(8)))
+    assert os.listdir(tmp_path / sha[:2]) == [sha]
+    assert await BlobCache(0, str(tmp_path)).get(sha) == data
+
+
+async def test_corrupt_disk_entry_is_a_miss(tmp_path):
+    cache = BlobCache(1024, str(tmp_path))
+    sha = git_blob_sha(b"blob")
+    await cache.put(sha, b"blob")
+    with open(tmp_path / sha[:2] / sha, "wb") as f:
+        f.write(b"bitrot")
+    assert await BlobCache(1024, str(tmp_path)).get(sha) is None
+    assert not (tmp_path / sha[:2] / sha).exists()
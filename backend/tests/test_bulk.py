@@ -0,0 +1,46 @@
+import base64
+import io
+import json
+import tarfile
+import pytest
+from tests.conftest import PASSPHRASE, upload
+
+pytestmark = pytest.mark.anyio
+
+ENV = "DATABASE_URL=postgres://db/app\nDEBUG=false\n"
+
+
+async def test_bulk_ndjson(client):
+    await upload(client, "api", ENV)
+    binary = b"KEY=\xff\xfe\n"
+    await client.post("/cli-upload", data={"passphrase": PASSPHRASE, "project_name": "bin"},
+                      files={"file": ("bin.env", binary)})
+    response = await client.post("/cli-download-bulk", json={
+        "passphrase": PASSPHRASE, "project_names": ["api", "bin", "missing"],
+    })
+    records = {record["project_name"]: record for record in map(json.loads, response.text.splitlines())}
+    assert records["api"]["data"] == ENV and "encoding" not in records["api"]
+    assert records["bin"]["encoding"] == "base64"
+    assert base64.b64decode(records["bin"]["data"]) == binary
+    assert records["missing"]["status"] == "error"
+    response = await client.post("/cli-download-bulk", json={"passphrase": "wrong", "project_names": ["api"]})
+    assert response.status_code == 401
+
+
+async def test_bulk_tar(client):
+    await upload(client, "api", ENV)
+    await upload(client, "web", "PORT=8080\n")
+    response = await client.post("/cli-download-bulk", json={
+        "passphrase": PASSPHRASE, "project_names": ["api", "web", "missing"], "format": "tar",
+    })
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+        members = {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+    assert members["api.env"] == ENV.encode()
+    assert members["web.env"] == b"PORT=8080\n"
+    assert "missing.error" in members
+
+
+async def test_cli_projects_lists_shas(client):
+    sha = (await upload(client, "api", ENV)).json()["sha"]
+    response = await client.post("/cli-projects", json={"passphrase": PASSPHRASE})
+    assert [(project["name"], project["sha"]) for project in response.json()] == [("api", sha)]
@@ -0,0 +1,67 @@
+import pytest
+from app.crypto.blob import blob_dictionary_id, encrypt_blob_with_master_key
+from app.crypto.compress import CODEC_ZLIB, compress, dictionary_id, train_dictionary
+from app.crypto.envelope import (
+    VaultKeys, decrypt_from_vault, encrypt_for_vault, generate_master_key, unwrap_key_file, wrap_master_key,
+)
+from tests.conftest import PASSPHRASE, download, upload
+
+ENV = b"DATABASE_URL=postgres://db.example.com/app\nREDIS_URL=redis://cache.example.com:6379\n"
+PROJECTS = {
+    "api": "DATABASE_URL=postgres://db/api\nSENTRY_DSN=https://sentry.example.org/1\n",
+    "web": "DATABASE_URL=postgres://db/web\nSENTRY_DSN=https://sentry.example.org/2\n",
+    "worker": "DATABASE_URL=postgres://db/worker\nSENTRY_DSN=https://sentry.example.org/3\n",
+}
+
+
+def master_keys(dictionary=None) -> VaultKeys:
+    return VaultKeys("passphrase", generate_master_key(), True, dictionary)
+
+
+def test_dictionary_compression():
+    samples = [ENV.replace(b"app", name) for name in (b"api", b"web", b"worker", b"cron")]
+    dictionary = train_dictionary(samples)
+    assert dictionary
+    codec, with_dict = compress(samples[0], dictionary)
+    assert codec == CODEC_ZLIB
+    assert len(with_dict) < len(compress(samples[0])[1])
+    keys = master_keys(dictionary)
+    blob = encrypt_blob_with_master_key(samples[0], keys.master_key, dictionary)
+    assert blob_dictionary_id(blob) == dictionary_id(dictionary)
+    assert decrypt_from_vault(blob, keys) == samples[0]
+
+
+def test_key_file_keeps_dictionaries():
+    master_key = generate_master_key()
+    keys = unwrap_key_file(wrap_master_key(master_key, "passphrase", dictionary=b"dict",
+                                           previous_dictionaries=(b"old",)), "passphrase")
+    assert (keys.dictionary, keys.previous_dictionaries) == (b"dict", (b"old",))
+
+
+def test_blob_with_a_replaced_dictionary_still_opens():
+    old = train_dictionary([ENV] * 3)
+    new = train_dictionary([b"SENTRY_DSN=https://sentry.example.org/42\n"] * 3)
+    keys = master_keys(old)
+    stale = encrypt_for_vault(ENV, keys)  # Written with the old keys while the retrain committed
+    retrained = keys.retired(new)
+    assert retrained.previous_dictionaries == (old,)
+    assert decrypt_from_vault(stale, retrained) == ENV
+    with pytest.raises(ValueError):
+        decrypt_from_vault(stale, VaultKeys("passphrase", keys.master_key, True, new))
+
+
+@pytest.mark.anyio
+async def test_train_dictionary_keeps_files_readable(client, memory):
+    for name, data in PROJECTS.items():
+        await upload(client, name, data)
+    response = await client.post("/train-dictionary", data={"passphrase": PASSPHRASE})
+    assert response.status_code == 200, response.text
+    assert response.json()["files"] == len(PROJECTS)
+    keys = unwrap_key_file(await memory.pull("passphrase"), PASSPHRASE)
+    assert keys.dictionary
+    for name, data in PROJECTS.items():
+        assert (await download(client, name)).json()["data"] == data
+    for name in ("cron", "mailer", "search"):  # New shared content, so the next dictionary differs
+        await upload(client, name, f"QUEUE_URL=amqp://mq.example.com/{name}\nSMTP_HOST=smtp.example.com\n")
+    await client.post("/train-dictionary", data={"passphrase": PASSPHRASE})
+    assert unwrap_key_file(await memory.pull("passphrase"), PASSPHRASE).previous_dictionaries[0] == keys.dictionary
@@ -0,0 +1,50 @@
+import pytest
+from app.storage import StorageConflict
+from app.storage.blobcache import git_blob_sha
+from app.storage.local import LocalBackend
+from app.storage.memory import MemoryBackend
+from tests.conftest import download, upload
+
+pytestmark = pytest.mark.anyio
+
+ENV = "DATABASE_URL=postgres://db/app\nDEBUG=false\n"
+
+
+@pytest.fixture(params=["memory", "local", "github"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    if request.param == "local":
+        return LocalBackend(str(tmp_path))
+    return request.getfixturevalue("github")
+
+
+async def test_conditional_writes(backend):
+    sha = await backend.push("api", b"one")
+    assert sha == git_blob_sha(b"one")
+    assert await backend.push("api", b"two", expected_sha=sha) == git_blob_sha(b"two")
+    with pytest.raises(StorageConflict) as conflict:
+        await backend.push("api", b"three", expected_sha=sha)
+    assert conflict.value.current_sha == git_blob_sha(b"two")
+    assert await backend.pull("api") == b"two"
+
+
+async def test_conditional_upload_conflict(client):
+    sha = (await upload(client, "api", ENV)).json()["sha"]
+    newer = (await upload(client, "api", ENV + "A=1\n", update=True, base_sha=sha)).json()["sha"]
+    response = await upload(client, "api", ENV + "B=2\n", update=True, base_sha=sha)
+    assert response.status_code == 409
+    assert response.json()["sha"] == newer
+    assert (await download(client, "api")).json()["data"] == ENV + "A=1\n"
+
+
+async def test_batch_refused_if_the_vault_changed_after_the_read(backend):
+    await backend.push("api", b"one")
+    files, revision = await backend.pull_all()
+    await backend.push("api", b"two")
+    with pytest.raises(StorageConflict):
+        await backend.push_many({name: data + b"!" for name, data in files.items()}, "Rotate", revision)
+    assert await backend.pull("api") == b"two"
+    files, revision = await backend.pull_all()
+    await backend.push_many({"api": b"three"}, "Rotate", revision)
+    assert await backend.pull("api") == b"three"
@@ -0,0 +1,81 @@
+import base64
+import pytest
+from cryptography.fernet import InvalidToken
+from app.crypto.encrypt import encrypt_data
+from app.crypto.envelope import decrypt_from_vault, generate_master_key, unwrap_key_file, wrap_master_key
+from tests.conftest import PASSPHRASE, download, logged_in_client, upload
+
+pytestmark = pytest.mark.anyio
+
+NEW_PASSPHRASE = "tr0ub4dor&3"
+PROJECTS = {
+    "api": "DATABASE_URL=postgres://db/api\nSENTRY_DSN=https://sentry.example.org/1\n",
+    "web": "DATABASE_URL=postgres://db/web\nSENTRY_DSN=https://sentry.example.org/2\n",
+    "worker": "DATABASE_URL=postgres://db/worker\nSENTRY_DSN=https://sentry.example.org/3\n",
+}
+
+
+async def update_passphrase(client, rotate_key: bool):
+    return await client.post("/update-passphrase", data={
+        "old_passphrase": PASSPHRASE, "new_passphrase": NEW_PASSPHRASE, "rotate_key": str(rotate_key).lower(),
+    })
+
+
+async def upload_projects(client):
+    for name, data in PROJECTS.items():
+        assert (await upload(client, name, data)).status_code == 200
+
+
+def test_key_file_round_trip():
+    master_key = generate_master_key()
+    keys = unwrap_key_file(wrap_master_key(master_key, "passphrase"), "passphrase")
+    assert (keys.master_key, keys.migrated) == (master_key, True)
+    with pytest.raises(InvalidToken):
+        unwrap_key_file(wrap_master_key(master_key, "passphrase"), "wrong")
+
+
+async def test_passphrase_change_keeps_the_master_key(client, memory):
+    await upload_projects(client)
+    before = unwrap_key_file(await memory.pull("passphrase"), PASSPHRASE)
+    blobs = {name: await memory.pull(name) for name in PROJECTS}
+    assert (await update_passphrase(client, rotate_key=False)).status_code == 200
+    after = unwrap_key_file(await memory.pull("passphrase"), NEW_PASSPHRASE)
+    assert after.master_key == before.master_key
+    assert {name: await memory.pull(name) for name in PROJECTS} == blobs  # Only the key file is rewritten
+    assert (await download(client, "api")).status_code == 401
+    assert (await download(client, "api", NEW_PASSPHRASE)).json()["data"] == PROJECTS["api"]
+
+
+async def test_rotate_key_re_encrypts_every_file(client, memory):
+    await upload_projects(client)
+    big = b"TOKEN=" + b"x" * 200_000 + b"\n"
+    await client.post("/upload", data={"passphrase": PASSPHRASE, "project_name": "big"},
+                      files={"file": ("big.env", big)})
+    before = unwrap_key_file(await memory.pull("passphrase"), PASSPHRASE)
+    response = await update_passphrase(client, rotate_key=True)
+    assert response.status_code == 200, response.text
+    after = unwrap_key_file(await memory.pull("passphrase"), NEW_PASSPHRASE)
+    assert after.master_key != before.master_key
+    for name, data in PROJECTS.items():
+        stored = await memory.pull(name)
+        assert decrypt_from_vault(stored, after) == data.encode()
+        with pytest.raises(InvalidToken):
+            decrypt_from_vault(stored, before)
+    response = await client.post("/cli-download", json={"passphrase": NEW_PASSPHRASE, "project_name": "big"})
+    assert response.content == big
+
+
+async def test_migrate_legacy_vault(memory):
+    await memory.push("passphrase", base64.b64encode(encrypt_data(b"sample", PASSPHRASE)))
+    for name, data in PROJECTS.items():
+        await memory.push(name, base64.b64encode(encrypt_data(data.encode(), PASSPHRASE)))
+    async with logged_in_client(create_passphrase=False) as client:
+        assert (await download(client, "api")).json()["data"] == PROJECTS["api"]
+        response = await client.post("/migrate-vault", data={"passphrase": PASSPHRASE})
+        assert response.json()["message"] == "Vault migrated to envelope encryption."
+        keys = unwrap_key_file(await memory.pull("passphrase"), PASSPHRASE)
+        assert keys.migrated
+        for name, data in PROJECTS.items():
+            assert decrypt_from_vault(await memory.pull(name), keys) == data.encode()
+        response = await client.post("/migrate-vault", data={"passphrase": PASSPHRASE})
+        assert response.json()["message"] == "Vault already uses envelope encryption."
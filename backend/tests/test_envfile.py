@@ -0,0 +1,56 @@
+import pytest
+from app.envfile import EnvFile
+from tests.conftest import PASSPHRASE, upload
+
+ENV = "DATABASE_URL=postgres://db/app\nDEBUG=false\n"
+
+
+def patched(text: str, **values) -> str:
+    env_file = EnvFile.parse(text)
+    for key, value in values.items():
+        env_file.set(key, value)
+    return env_file.dumps()
+
+
+def test_untouched_lines_stay_intact():
+    text = '# comment\nexport A=1  # inline\n\nB="multi\nline"\nC=3\n'
+    assert EnvFile.parse(text).dumps() == text
+    assert EnvFile.parse(text).to_dict() == {"A": "1", "B": "multi\nline", "C": "3"}
+    assert patched(text, C="4") == text.replace("C=3", "C=4")
+    assert patched(text, A="2") == text.replace("export A=1  # inline", "export A=2")
+
+
+def test_crlf_line_endings_are_kept():
+    assert patched("A=1\r\nB=2\r\n# c\r\n", A="3") == "A=3\r\nB=2\r\n# c\r\n"
+    assert patched("A=1\r\n", D="4") == "A=1\r\nD=4\r\n"
+    assert patched('A="x\r\ny"\r\nB=2\r\n', B="3") == 'A="x\r\ny"\r\nB=3\r\n'
+
+
+def test_missing_final_newline_is_kept():
+    assert patched("A=1", B="2") == "A=1\nB=2"
+    assert patched("A=1", A="2") == "A=2"
+    assert patched("", A="1") == "A=1\n"
+
+
+def test_invalid_key_names_are_refused():
+    env_file = EnvFile.parse(ENV)
+    for key in ("FOO\n", "1FOO", "FOO BAR", "FOO=", ""):
+        with pytest.raises(ValueError):
+            env_file.set(key, "x")
+    assert env_file.dumps() == ENV
+
+
+@pytest.mark.anyio
+async def test_patch_and_get_keys(client):
+    sha = (await upload(client, "api", ENV)).json()["sha"]
+    response = await client.post("/patch-keys", json={
+        "passphrase": PASSPHRASE, "project_name": "api", "set": {"DEBUG": "true"}, "unset": ["DATABASE_URL"],
+        "base_sha": sha,
+    })
+    assert sorted(response.json()["changed"]) == ["DATABASE_URL", "DEBUG"]
+    response = await client.post("/get-keys", json={"passphrase": PASSPHRASE, "project_name": "api"})
+    assert response.json()["values"] == {"DEBUG": "true"}
+    response = await client.post("/patch-keys", json={
+        "passphrase": PASSPHRASE, "project_name": "api", "set": {"DEBUG": "false"}, "base_sha": sha,
+    })
+    assert response.status_code == 409
@@ -0,0 +1,130 @@
+import pytest
+from app.storage import github as github_storage
+from app.config import settings
+from app.github.client import GitHubClient
+from app.storage.github import GitHubBackend
+from benchmarks.fakegithub import BRANCH, REPO
+from tests.conftest import PASSPHRASE, UNLOCK_HEADERS, download, upload
+
+pytestmark = pytest.mark.anyio
+
+VERSIONS = ["PORT=8000\n", "PORT=8001\n", "PORT=8002\n"]
+
+
+async def history(client, project_name: str, passphrase: str = PASSPHRASE):
+    return await client.post("/history", data={"project_name": project_name, "passphrase": passphrase},
+                             headers=UNLOCK_HEADERS)
+
+
+async def restore(client, project_name: str, commit: str, passphrase: str = PASSPHRASE):
+    return await client.post("/restore", data={"project_name": project_name, "commit": commit,
+                                               "passphrase": passphrase})
+
+
+async def write_versions(client) -> list[str]:
+    shas = []
+    for i, data in enumerate(VERSIONS):
+        response = await upload(client, "api", data, update=i > 0)
+        assert response.status_code == 200, response.text
+        shas.append(response.json()["sha"])
+    return shas
+
+
+async def test_history_lists_versions_newest_first(github_client):
+    shas = await write_versions(github_client)
+    response = await history(github_client, "api")
+    assert response.status_code == 200
+    versions = response.json()["versions"]
+    assert [v["sha"] for v in versions] == shas[::-1]
+    assert [v["current"] for v in versions] == [True, False, False]
+    assert response.json()["complete"] is True
+
+
+async def test_history_needs_the_vault_keys(github_client):
+    await write_versions(github_client)
+    assert (await history(github_client, "api", passphrase="")).status_code == 401
+    assert (await history(github_client, "api", passphrase="wrong")).status_code == 401
+    await github_client.post("/unlock", data={"passphrase": PASSPHRASE})
+    assert (await history(github_client, "api", passphrase="")).status_code == 200
+
+
+async def test_restore_reuses_the_stored_blob(github_client, fake_github):
+    shas = await write_versions(github_client)
+    oldest = (await history(github_client, "api")).json()["versions"][-1]
+    blobs = len(fake_github.blobs)
+    response = await restore(github_client, "api", oldest["commit"])
+    assert response.status_code == 200, response.text
+    assert response.json()["sha"] == shas[0]
+    assert len(fake_github.blobs) == blobs  # Nothing re-uploaded
+    assert (await download(github_client, "api")).json()["data"] == VERSIONS[0]
+    versions = (await history(github_client, "api")).json()["versions"]
+    assert versions[0]["sha"] == shas[0] and versions[0]["current"]
+    assert [v["current"] for v in versions].count(True) == 1
+
+
+async def test_restore_unknown_commit(github_client):
+    await write_versions(github_client)
+    assert (await restore(github_client, "api", "0" * 40)).status_code == 404
+    assert (await restore(github_client, "api", "0" * 40, passphrase="wrong")).status_code == 401
+
+
+async def test_restore_refuses_versions_from_a_rotated_key(github_client):
+    await write_versions(github_client)
+    oldest = (await history(github_client, "api")).json()["versions"][-1]
+    response = await github_client.post("/update-passphrase", data={
+        "old_passphrase": PASSPHRASE, "new_passphrase": "new passphrase", "rotate_key": "true",
+    })
+    assert response.status_code == 200, response.text
+    response = await restore(github_client, "api", oldest["commit"], passphrase="new passphrase")
+    assert response.status_code == 409
+    assert (await download(github_client, "api", "new passphrase")).json()["data"] == VERSIONS[-1]
+
+
+async def test_deleted_project_has_no_current_version(github_client):
+    await write_versions(github_client)
+    response = await github_client.request("DELETE", "/delete",
+                                           data={"project_name": "api", "passphrase": PASSPHRASE})
+    assert response.status_code == 200, response.text
+    versions = (await history(github_client, "api")).json()["versions"]
+    assert versions and not any(v["current"] for v in versions)
+    response = await restore(github_client, "api", versions[-1]["commit"])
+    assert response.status_code == 200
+    assert (await download(github_client, "api")).json()["data"] == VERSIONS[0]
+
+
+async def test_memory_backend_keeps_no_history(client):
+    await upload(client, "api", VERSIONS[0])
+    assert (await history(client, "api")).status_code == 501
+    assert (await restore(client, "api", "0" * 40)).status_code == 501
+
+
+async def test_history_index_persists_and_catches_up(github_client, fake_github, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_INDEX_PATH", str(tmp_path / "history.json"))
+    shas = await write_versions(github_client)  # Written through a backend with a memory-only index
+    first = GitHubBackend(GitHubClient("test-token", REPO, BRANCH, transport=fake_github.transport()))
+    built = await first.history("api")  # Built from the branch's commits
+    assert [v.sha for v in built] == shas[::-1]
+    await first.aclose()
+    assert (tmp_path / "history.json").exists()
+
+    await upload(github_client, "api", "PORT=9000\n", update=True)  # A commit the saved index has not seen
+    second = GitHubBackend(GitHubClient("test-token", REPO, BRANCH, transport=fake_github.transport()))
+    caught_up = await second.history("api")
+    assert caught_up[1:] == built
+    assert caught_up[0].sha != shas[-1]
+    await second.aclose()
+
+
+async def test_long_history_is_built_in_the_background(github_client, fake_github, monkeypatch):
+    monkeypatch.setattr(github_storage, "HISTORY_INLINE_COMMITS", 2)
+    shas = await write_versions(github_client)
+    backend = GitHubBackend(GitHubClient("test-token", REPO, BRANCH, transport=fake_github.transport()))
+    requests = fake_github.requests
+    assert await backend.history("api") == []  # Returned before the build
+    assert backend.stats()["history"]["complete"] is False
+    await backend._history_build
+    assert backend.stats()["history"]["complete"] is True
+    assert [v.sha for v in await backend.history("api")] == shas[::-1]
+    commits = len(fake_github.commits)
+    assert fake_github.requests - requests <= commits + 3  # A ref and a listing, then a tree per commit
+    await backend.aclose()
@@ -0,0 +1,31 @@
+from app.crypto.blob import BLOB_MAGIC, decrypt_blob, encrypt_blob_with_passphrase
+from app.crypto.decrypt import decrypt_data
+from app.crypto.encrypt import encrypt_data
+from app.crypto.keycache import KeyCache
+
+ENV = b"DATABASE_URL=postgres://db.example.com/app\n"
+
+
+def test_key_cache_lru_ttl_and_wipe():
+    cache = KeyCache(max_size=2, ttl=300)
+    cache.put("a", b"salt", b"key-a")
+    cache.put("b", b"salt", b"key-b")
+    assert cache.get("a", b"salt") == b"key-a"
+    cache.put("c", b"salt", b"key-c")  # Evicts "b", the least recently used
+    assert cache.get("b", b"salt") is None
+    assert cache.stats()["size"] == 2
+    expired = KeyCache(max_size=2, ttl=-1)
+    expired.put("a", b"salt", b"key-a")
+    assert expired.get("a", b"salt") is None
+    cache.clear()
+    assert cache.get("a", b"salt") is None
+
+
+def test_passphrase_blobs_get_a_fresh_salt_each():
+    first = encrypt_blob_with_passphrase(ENV, "passphrase")
+    second = encrypt_blob_with_passphrase(ENV, "passphrase")
+    salt = slice(len(BLOB_MAGIC) + 6, len(BLOB_MAGIC) + 22)
+    assert first[salt] != second[salt]
+    assert decrypt_blob(first, passphrase="passphrase") == ENV
+    assert encrypt_data(ENV, "passphrase")[:16] != encrypt_data(ENV, "passphrase")[:16]
+    assert decrypt_data(encrypt_data(ENV, "passphrase"), "passphrase") == ENV
@@ -0,0 +1,14 @@
+import pytest
+from tests.conftest import upload
+
+ENV = "DATABASE_URL=postgres://db/app\nDEBUG=false\n"
+
+
+@pytest.mark.anyio
+async def test_unchanged_upload_is_skipped(client):
+    sha = (await upload(client, "api", ENV)).json()["sha"]
+    response = await upload(client, "api", ENV, update=True)
+    assert response.json() == {"status": "unchanged", "project_name": "api", "sha": sha}
+    response = await upload(client, "api", ENV + "X=1\n", update=True)
+    assert response.json()["status"] == "ok"
+    assert response.json()["sha"] != sha
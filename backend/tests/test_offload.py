@@ -0,0 +1,26 @@
+import asyncio
+import threading
+import pytest
+from app.crypto.offload import CryptoOverloaded, CryptoPool
+
+
+@pytest.mark.anyio
+async def test_crypto_pool_counts_failures_and_sheds_load():
+    pool = CryptoPool(workers=2, queue_depth=0)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    assert await pool.run(sum, [1, 2]) == 3
+    with pytest.raises(RuntimeError):
+        await pool.run(fail)
+    release = threading.Event()
+    blockers = [asyncio.create_task(pool.run(release.wait, 5)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    with pytest.raises(CryptoOverloaded):
+        await pool.run(sum, [1])
+    release.set()
+    await asyncio.gather(*blockers, return_exceptions=True)
+    stats = pool.stats()
+    assert stats["completed"] == 3 and stats["failed"] == 1 and stats["rejected"] == 1
+    pool.shutdown()
@@ -0,0 +1,39 @@
+import pytest
+from app.config import settings
+from app.crypto.decrypt_encrypt import MIN_FILES_FOR_POOL
+from app.crypto.envelope import decrypt_from_vault, unwrap_key_file
+from tests.conftest import PASSPHRASE, download, upload
+
+pytestmark = pytest.mark.anyio
+
+PROJECTS = {f"service-{i}": f"DATABASE_URL=postgres://db/{i}\nWORKER_ID={i}\n" for i in range(MIN_FILES_FOR_POOL)}
+
+
+async def test_rotation_re_encrypts_across_worker_processes(client, memory, monkeypatch):
+    monkeypatch.setattr(settings, "REENCRYPT_WORKERS", 2)
+    for name, data in PROJECTS.items():
+        await upload(client, name, data)
+    before = unwrap_key_file(await memory.pull("passphrase"), PASSPHRASE)
+    response = await client.post("/update-passphrase", data={
+        "old_passphrase": PASSPHRASE, "new_passphrase": PASSPHRASE, "rotate_key": "true",
+    })
+    assert response.status_code == 200, response.text
+    after = unwrap_key_file(await memory.pull("passphrase"), PASSPHRASE)
+    assert after.master_key != before.master_key
+    for name, data in PROJECTS.items():
+        assert decrypt_from_vault(await memory.pull(name), after) == data.encode()
+    assert (await download(client, "service-0")).json()["data"] == PROJECTS["service-0"]
+
+
+async def test_worker_failure_aborts_the_rotation(client, memory, monkeypatch):
+    monkeypatch.setattr(settings, "REENCRYPT_WORKERS", 2)
+    for name, data in PROJECTS.items():
+        await upload(client, name, data)
+    await memory.push("service-3", b"not a blob")
+    blobs = {name: await memory.pull(name) for name in PROJECTS}
+    with pytest.raises(RuntimeError, match="service-3"):
+        await client.post("/update-passphrase", data={
+            "old_passphrase": PASSPHRASE, "new_passphrase": "new passphrase", "rotate_key": "true",
+        })
+    assert {name: await memory.pull(name) for name in PROJECTS} == blobs  # Nothing was written
+    assert unwrap_key_file(await memory.pull("passphrase"), PASSPHRASE)
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import pytest
+from app.storage.blobcache import git_blob_sha
+from app.storage.local import LocalBackend
+from app.storage.memory import MemoryBackend
+from tests.conftest import download, upload
+
+pytestmark = pytest.mark.anyio
+
+ENV = "DATABASE_URL=postgres://db/app\nDEBUG=false\n"
+
+
+@pytest.fixture(params=["memory", "local", "github"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    if request.param == "local":
+        return LocalBackend(str(tmp_path))
+    return request.getfixturevalue("github")
+
+
+async def test_push_pull_list_delete(backend):
+    await backend.push("api", b"one")
+    await backend.push("web", b"two")
+    assert await backend.pull("api") == b"one"
+    assert await backend.pull("missing") is None
+    assert sorted(info.name for info in await backend.list()) == ["api", "web"]
+    assert await backend.delete("api")
+    assert not await backend.exists("api")
+
+
+async def test_local_concurrent_writes_leave_no_temp_files(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    payloads = [bytes([i]) * 50_000 for i in range(8)]
+    await asyncio.gather(*(backend.push("api", payload) for payload in payloads))
+    assert await backend.pull("api") in payloads
+    assert os.listdir(tmp_path) == [os.path.basename(backend._path("api"))]
+
+
+async def test_local_rejects_path_names(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    for name in ("../escape", ".hidden", ""):
+        with pytest.raises(ValueError):
+            await backend.push(name, b"x")
+
+
+async def test_upload_and_download(client):
+    response = await upload(client, "api", ENV)
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+    response = await download(client, "api")
+    assert response.status_code == 200
+    assert response.json()["data"] == ENV
+    assert (await download(client, "api", passphrase="wrong")).status_code == 401
+    assert (await download(client, "missing")).status_code == 404
+
+
+async def test_upload_refuses_existing_project_without_update(client):
+    await upload(client, "api", ENV)
+    response = await upload(client, "api", ENV + "X=1\n")
+    assert response.status_code == 400
+    assert (await download(client, "api")).json()["data"] == ENV
+
+
+
+async def test_local_stream_returns_the_sha_it_wrote(tmp_path, monkeypatch):
+    backend = LocalBackend(str(tmp_path))
+    replace = os.replace
+
+    def replace_then_overwrite(src, dst):
+        replace(src, dst)
+        with open(dst, "wb") as f:
+            f.write(b"a later write")  # Lands before the stream's push returns
+
+    async def chunks():
+        yield b"streamed"
+
+    monkeypatch.setattr(os, "replace", replace_then_overwrite)
+    assert await backend.push_stream("api", chunks()) == git_blob_sha(b"streamed")
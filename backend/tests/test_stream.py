@@ -0,0 +1,62 @@
+import asyncio
+import os
+import pytest
+from app.crypto.envelope import generate_master_key
+from app.crypto.stream import CHUNK_SIZE, StreamError, StreamEncryptor, decrypt_stream_bytes
+from app.storage import StorageConflict
+from app.storage.blobcache import git_blob_sha
+from app.storage.local import LocalBackend
+from app.storage.memory import MemoryBackend
+from tests.conftest import PASSPHRASE
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["memory", "local", "github"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    if request.param == "local":
+        return LocalBackend(str(tmp_path))
+    return request.getfixturevalue("github")
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def test_stream_round_trip_and_truncation():
+    master_key = generate_master_key()
+    data = b"X=1\n" * (CHUNK_SIZE // 2)  # Two full chunks
+    encryptor = StreamEncryptor(master_key)
+    stream = encryptor.header + encryptor.update(data) + encryptor.finalize()
+    assert decrypt_stream_bytes(stream, master_key) == data
+    with pytest.raises(StreamError):
+        decrypt_stream_bytes(stream[:len(stream) // 2], master_key)
+
+
+async def test_backend_stream_round_trip(backend):
+    await backend.push_stream("big", chunks(b"a" * 1000, b"b" * 1000))
+    assert await backend.pull("big") == b"a" * 1000 + b"b" * 1000
+    with pytest.raises(StorageConflict):
+        await backend.push_stream("big", chunks(b"c"), expected_sha=git_blob_sha(b"stale"))
+    assert [info.name for info in await backend.list()] == ["big"]
+
+
+async def test_local_concurrent_stream_writes_leave_no_temp_files(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    payloads = [bytes([i]) * 50_000 for i in range(8)]
+    await asyncio.gather(*(backend.push_stream("api", chunks(p[:25_000], p[25_000:])) for p in payloads))
+    assert await backend.pull("api") in payloads
+    assert os.listdir(tmp_path) == [os.path.basename(backend._path("api"))]
+
+
+async def test_stream_upload_and_download(client, memory):
+    data = b"TOKEN=" + b"x" * 200_000 + b"\n"
+    response = await client.post("/upload", data={"passphrase": PASSPHRASE, "project_name": "big"},
+                                 files={"file": ("big.env", data)})
+    assert response.json()["status"] == "ok"
+    assert (await memory.pull("big")).startswith(b"\x89EVS")
+    response = await client.post("/cli-download", json={"passphrase": PASSPHRASE, "project_name": "big"})
+    assert response.content == data
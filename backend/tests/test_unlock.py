@@ -0,0 +1,58 @@
+import base64
+import pytest
+from app.auth.sessions import unlock_sessions
+from app.crypto.encrypt import encrypt_data
+from tests.conftest import PASSPHRASE, UNLOCK_HEADERS, download, logged_in_client, upload
+
+pytestmark = pytest.mark.anyio
+
+ENV = "DATABASE_URL=postgres://db/app\nDEBUG=false\n"
+
+
+async def test_unlock_session(client):
+    await upload(client, "api", ENV)
+    response = await download(client, "api", passphrase="")
+    assert response.status_code == 401
+    assert response.json()["error"] == "Vault is locked"
+    assert (await client.post("/unlock", data={"passphrase": "wrong"})).status_code == 401
+    assert (await client.post("/unlock", data={"passphrase": PASSPHRASE})).status_code == 200
+    assert (await download(client, "api", passphrase="")).json()["data"] == ENV
+    await client.post("/lock")
+    assert (await download(client, "api", passphrase="")).status_code == 401
+
+
+async def test_unlock_sessions_end_on_passphrase_change(client):
+    await upload(client, "api", ENV)
+    await client.post("/unlock", data={"passphrase": PASSPHRASE})
+    assert (await download(client, "api", passphrase="")).status_code == 200
+    await client.post("/update-passphrase", data={
+        "old_passphrase": PASSPHRASE, "new_passphrase": "new passphrase", "rotate_key": "true",
+    })
+    assert (await download(client, "api", passphrase="")).status_code == 401
+
+
+async def test_session_needs_the_unlock_header(client):
+    await upload(client, "api", ENV)
+    await client.post("/unlock", data={"passphrase": PASSPHRASE})
+    # What another site can send: the cookies, but no custom header
+    forged = await client.post("/upload", data={"project_name": "planted"}, files={"file": ("x.env", b"X=1\n")})
+    assert forged.status_code == 401
+    forged = await client.post("/download-data", data={"project_name": "api"})
+    assert forged.status_code == 401
+    response = await client.post("/upload", data={"project_name": "planted"}, files={"file": ("x.env", b"X=1\n")},
+                                 headers=UNLOCK_HEADERS)
+    assert response.status_code == 200
+
+
+async def test_session_keeps_no_passphrase(client):
+    await client.post("/unlock", data={"passphrase": PASSPHRASE})
+    keys = unlock_sessions.get(client.cookies.get("unlock_token"))
+    assert keys.master_key and keys.passphrase == ""
+    assert PASSPHRASE not in repr(unlock_sessions._sessions)
+
+
+async def test_legacy_vault_cannot_be_unlocked(memory):
+    await memory.push("passphrase", base64.b64encode(encrypt_data(b"sample", PASSPHRASE)))
+    async with logged_in_client(create_passphrase=False) as client:
+        response = await client.post("/unlock", data={"passphrase": PASSPHRASE})
+        assert response.status_code == 400
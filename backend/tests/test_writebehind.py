@@ -0,0 +1,79 @@
+import pytest
+from app.storage import StorageConflict
+from app.storage.memory import MemoryBackend
+from app.storage.writebehind import WriteBehindBackend
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / "journal" / "writes.log")
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def test_writes_are_batched_into_one_flush(journal):
+    inner = MemoryBackend()
+    backend = WriteBehindBackend(inner, journal, interval=3600)
+    for i in range(3):
+        await backend.push("api", b"v%d" % i)
+    await backend.push("web", b"web")
+    assert await backend.pull("api") == b"v2"
+    assert await inner.pull("api") is None
+    assert await backend.flush() == 2
+    assert (await inner.pull("api"), await inner.pull("web")) == (b"v2", b"web")
+    await backend.aclose()
+
+
+async def test_journal_is_replayed_after_a_crash(journal):
+    inner = MemoryBackend()
+    backend = WriteBehindBackend(inner, journal, interval=3600)
+    await backend.push("api", b"acknowledged")
+    backend._journal.close()  # Crash: nothing flushed
+    with open(journal, "ab") as f:
+        f.write(b"\x01\x00\x03")  # A record cut short
+    replayed = WriteBehindBackend(inner, journal, interval=3600)
+    assert await replayed.pull("api") == b"acknowledged"
+    assert await replayed.flush() == 1
+    assert await inner.pull("api") == b"acknowledged"
+    await replayed.aclose()
+
+
+async def test_batch_refused_if_a_write_was_queued_after_the_read(journal):
+    backend = WriteBehindBackend(MemoryBackend(), journal, interval=3600)
+    await backend.push("p", b"OLD")
+    files, revision = await backend.pull_all()
+    await backend.push("p", b"NEW-ACKED")  # Acknowledged while the batch was being prepared
+    with pytest.raises(StorageConflict):
+        await backend.push_many({"p": b"re-encrypted OLD"}, "Rotate passphrase", revision)
+    assert await backend.pull("p") == b"NEW-ACKED"
+    assert backend.stats()["write_behind"]["pending"] == 1
+    await backend.aclose()
+
+
+async def test_batch_supersedes_the_writes_it_read(journal):
+    inner = MemoryBackend()
+    backend = WriteBehindBackend(inner, journal, interval=3600)
+    await backend.push("p", b"OLD")
+    files, revision = await backend.pull_all()
+    assert files == {"p": b"OLD"}
+    await backend.push_many({"p": b"re-encrypted OLD"}, "Rotate passphrase", revision)
+    assert backend.stats()["write_behind"]["pending"] == 0
+    assert await inner.pull("p") == b"re-encrypted OLD"
+    assert await backend.flush() == 0
+    await backend.aclose()
+
+
+async def test_streams_bypass_the_journal(journal):
+    inner = MemoryBackend()
+    backend = WriteBehindBackend(inner, journal, interval=3600)
+    await backend.push("big", b"pending")
+    await backend.push_stream("big", chunks(b"a" * 1000, b"b" * 1000))
+    assert await inner.pull("big") == b"a" * 1000 + b"b" * 1000
+    assert backend.stats()["write_behind"]["pending"] == 0
+    assert await backend.flush() == 0
+    await backend.aclose()
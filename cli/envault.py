@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""Envault command line client.
+
+Keeps one pooled keep-alive HTTP session per run and transfers many projects
+in parallel. ``sync`` only downloads projects whose stored blob changed since
+the last sync: decrypted files are kept in a local cache, encrypted with a key
+derived from the passphrase and keyed by the sha of the blob on the server.
+
+Usage:
+  envault.py upload   <project_name> <file> [<project_name> <file> ...]
+  envault.py download <project_name> [...] [--out DIR] [--bulk]
+  envault.py sync     [<project_name> ...] [--out DIR]
+  envault.py health
+
+The API URL and passphrase come from --api / --passphrase, or the ENVAULT_API
+and ENVAULT_PASSPHRASE environment variables (the passphrase is prompted for
+if neither is set). Requires httpx and cryptography (cli/requirements.txt).
+"""
+import argparse
+import base64
+import getpass
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import httpx
+from cryptography.fernet import Fernet, InvalidToken
+
+BULK_LIMIT = 500            # most projects the server accepts per bulk request
+KDF_ITERATIONS = 100_000
+DEFAULT_CACHE = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "envault"
+
+
+class Cache:
+    """Decrypted projects, encrypted at rest and keyed by the sha of their stored blob.
+
+    Each API URL gets its own directory. Entries that no longer decrypt
+    (another passphrase) are treated as missing.
+    """
+
+    def __init__(self, root: Path, api_url: str, passphrase: str):
+        self.dir = root / hashlib.sha256(api_url.encode()).hexdigest()[:16]
+        self.dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        salt_path = self.dir / "salt"
+        if not salt_path.exists():
+            salt_path.write_bytes(os.urandom(16))
+        key = hashlib.pbkdf2_hmac("sha256", passphrase.encode(), salt_path.read_bytes(), KDF_ITERATIONS, dklen=32)
+        self._fernet = Fernet(base64.urlsafe_b64encode(key))
+
+    def get(self, sha: str | None) -> bytes | None:
+        if not sha:
+            return None
+        try:
+            return self._fernet.decrypt((self.dir / sha).read_bytes())
+        except (FileNotFoundError, InvalidToken):
+            return None
+
+    def put(self, sha: str | None, data: bytes) -> None:
+        if not sha:
+            return
+        tmp = self.dir / f"{sha}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(self._fernet.encrypt(data))
+        tmp.replace(self.dir / sha)
+
+    def prune(self, keep: set[str]) -> None:
+        """Drop entries for blob versions that are no longer current."""
+        for path in self.dir.iterdir():
+            if path.name != "salt" and path.name not in keep:
+                path.unlink(missing_ok=True)
+
+
+def write_env(out_dir: Path, project_name: str, data: bytes) -> bool:
+    """Write ``<project_name>.env`` (owner-only) unless it already has this content."""
+    path = out_dir / f"{project_name}.env"
+    if path.exists() and path.read_bytes() == data:
+        return False
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".env.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    tmp.replace(path)
+    return True
+
+
+def error_message(response: httpx.Response) -> str:
+    try:
+        return response.json().get("error") or response.text
+    except ValueError:
+        return response.text
+
+
+class Client:
+    def __init__(self, api_url: str, passphrase: str, jobs: int):
+        self.api_url = api_url.rstrip("/")
+        self.passphrase = passphrase
+        self.jobs = jobs
+        limits = httpx.Limits(max_connections=jobs, max_keepalive_connections=jobs)
+        self.http = httpx.Client(base_url=self.api_url, limits=limits, timeout=httpx.Timeout(60, connect=10))
+
+    def map(self, fn, items) -> list:
+        with ThreadPoolExecutor(self.jobs) as pool:
+            return list(pool.map(fn, items))
+
+    def upload(self, project_name: str, path: str) -> bool:
+        with open(path, "rb") as f:
+            response = self.http.post("/cli-upload", data={"passphrase": self.passphrase, "project_name": project_name},
+                                      files={"file": (os.path.basename(path), f, "text/plain")})
+        if response.status_code != 200:
+            print(f"❌ {project_name}: upload failed (HTTP {response.status_code}): {error_message(response)}")
+            return False
+        unchanged = response.json().get("status") == "unchanged"
+        print(f"✅ {project_name}: {'already up to date' if unchanged else 'uploaded'}")
+        return True
+
+    def download(self, project_name: str) -> bytes | None:
+        response = self.http.post("/cli-download", json={"passphrase": self.passphrase, "project_name": project_name})
+        # Errors come back as JSON; a project is served as text/plain
+        if response.status_code != 200 or response.headers.get("content-type", "").startswith("application/json"):
+            print(f"❌ {project_name}: download failed (HTTP {response.status_code}): {error_message(response)}")
+            return None
+        return response.content
+
+    def download_bulk(self, project_names: list[str]) -> dict[str, tuple[bytes, str | None]]:
+        """Fetch projects through /cli-download-bulk, several requests in parallel for large sets."""
+        batches = [project_names[i:i + BULK_LIMIT] for i in range(0, len(project_names), BULK_LIMIT)]
+        results = {}
+        for batch in self.map(self._bulk_batch, batches):
+            results.update(batch)
+        return results
+
+    def _bulk_batch(self, project_names: list[str]) -> dict[str, tuple[bytes, str | None]]:
+        results = {}
+        payload = {"passphrase": self.passphrase, "project_names": project_names}
+        with self.http.stream("POST", "/cli-download-bulk", json=payload) as response:
+            if response.status_code != 200:
+                response.read()
+                print(f"❌ Bulk download failed (HTTP {response.status_code}): {error_message(response)}")
+                return results
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                if record["status"] == "ok":
+                    if record.get("encoding") == "base64":
+                        data = base64.b64decode(record["data"])
+                    else:
+                        data = record["data"].encode("utf-8")
+                    results[record["project_name"]] = (data, record.get("sha"))
+                else:
+                    print(f"❌ {record['project_name']}: {record['error']}")
+        return results
+
+    def projects(self) -> list[dict] | None:
+        response = self.http.post("/cli-projects", json={"passphrase": self.passphrase})
+        if response.status_code != 200:
+            print(f"❌ Listing projects failed (HTTP {response.status_code}): {error_message(response)}")
+            return None
+        return response.json()
+
+
+def cmd_upload(client: Client, args: argparse.Namespace) -> int:
+    pairs = args.items
+    if not pairs or len(pairs) % 2:
+        print("❌ upload takes <project_name> <file> pairs")
+        return 1
+    uploads = list(zip(pairs[::2], pairs[1::2]))
+    for project_name, path in uploads:
+        if not os.path.isfile(path):
+            print(f"❌ File '{path}' not found")
+            return 1
+    ok = client.map(lambda item: client.upload(*item), uploads)
+    return 0 if all(ok) else 1
+
+
+def cmd_download(client: Client, args: argparse.Namespace) -> int:
+    out_dir = Path(args.out)
+    if args.bulk:
+        results = {name: data for name, (data, _) in client.download_bulk(args.projects).items()}
+    else:
+        contents = client.map(client.download, args.projects)
+        results = {name: data for name, data in zip(args.projects, contents) if data is not None}
+    for project_name, data in results.items():
+        write_env(out_dir, project_name, data)
+        print(f"✅ {project_name}: saved as {out_dir / (project_name + '.env')}")
+    return 0 if len(results) == len(set(args.projects)) else 1
+
+
+def cmd_sync(client: Client, args: argparse.Namespace) -> int:
+    listing = client.projects()
+    if listing is None:
+        return 1
+    shas = {project["name"]: project["sha"] for project in listing}
+    wanted = args.projects or sorted(shas)
+    missing = [name for name in wanted if name not in shas]
+    for name in missing:
+        print(f"❌ {name}: not found")
+
+    cache = Cache(Path(args.cache_dir), client.api_url, client.passphrase)
+    contents, stale = {}, []
+    for name in wanted:
+        if name not in shas:
+            continue
+        data = cache.get(shas[name])
+        if data is None:
+            stale.append(name)
+        else:
+            contents[name] = data
+    fetched = client.download_bulk(stale) if stale else {}
+    for name, (data, sha) in fetched.items():
+        cache.put(sha, data)
+        contents[name] = data
+
+    out_dir = Path(args.out)
+    written = sum(write_env(out_dir, name, data) for name, data in contents.items())
+    if not args.projects:
+        cache.prune({sha for sha in shas.values() if sha} | {sha for _, sha in fetched.values() if sha})
+    failed = len(missing) + len(stale) - len(fetched)
+    print(f"{'✅' if not failed else '❌'} {len(contents)} projects in sync: {len(fetched)} downloaded, "
+          f"{len(contents) - len(fetched)} from cache, {written} files written to {out_dir}"
+          + (f", {failed} failed" if failed else ""))
+    return 0 if not failed else 1
+
+
+def cmd_health(client: Client, args: argparse.Namespace) -> int:
+    response = client.http.get("/health")
+    if response.status_code == 200:
+        print(f"✅ API is healthy: {response.text}")
+        return 0
+    print(f"❌ Health check failed (HTTP {response.status_code}): {response.text}")
+    return 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default=os.environ.get("ENVAULT_API"), help="API URL (or ENVAULT_API)")
+    parser.add_argument("--passphrase", default=os.environ.get("ENVAULT_PASSPHRASE"),
+                        help="vault passphrase (or ENVAULT_PASSPHRASE; prompted for otherwise)")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="parallel transfers")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    upload = commands.add_parser("upload", help="encrypt and store files")
+    upload.add_argument("items", nargs="+", metavar="PROJECT FILE")
+    download = commands.add_parser("download", help="fetch projects as <name>.env")
+    download.add_argument("projects", nargs="+")
+    download.add_argument("--out", default=".", help="directory to write the .env files to")
+    download.add_argument("--bulk", action="store_true", help="fetch every project in one streamed request")
+    sync = commands.add_parser("sync", help="fetch projects (default: all) that changed since the last sync")
+    sync.add_argument("projects", nargs="*")
+    sync.add_argument("--out", default=".", help="directory to write the .env files to")
+    sync.add_argument("--cache-dir", default=os.environ.get("ENVAULT_CACHE", str(DEFAULT_CACHE)),
+                      help="local encrypted cache (or ENVAULT_CACHE)")
+    commands.add_parser("health", help="check that the API is up")
+    args = parser.parse_args()
+
+    if not args.api:
+        parser.error("no API URL: pass --api or set ENVAULT_API")
+    passphrase = args.passphrase
+    if args.command != "health" and not passphrase:
+        passphrase = getpass.getpass("Passphrase: ")
+    client = Client(args.api, passphrase or "", max(args.jobs, 1))
+    handlers = {"upload": cmd_upload, "download": cmd_download, "sync": cmd_sync, "health": cmd_health}
+    try:
+        return handlers[args.command](client, args)
+    except httpx.HTTPError as e:
+        print(f"❌ Request to {client.api_url} failed: {e}")
+        return 1
+    finally:
+        client.http.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -36,7 +36,9 @@ upload() {
   BODY=$(echo "$RESPONSE" | head -n1)
   CODE=$(echo "$RESPONSE" | tail -n1)
 
-  if [[ "$CODE" == "200" ]]; then
+  if [[ "$CODE" == "200" && "$BODY" == *'"unchanged"'* ]]; then
+    echo "✅ Already up to date, nothing uploaded"
+  elif [[ "$CODE" == "200" ]]; then
     echo "✅ Upload successful"
   else
     echo "❌ Upload failed (HTTP $CODE): $BODY"
@@ -7,6 +7,7 @@ const AuthContext = createContext<any>(null);
 export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
     const [isAuthenticated, setIsAuthenticated] = useState<boolean | null>(null); // null = loading
     const [authLoading, setAuthLoading] = useState(true);
+    const [unlocked, setUnlocked] = useState(false); // vault unlocked for this session (see /unlock)
 
     useEffect(() => {
         const checkLoginStatus = async () => {
@@ -20,6 +21,7 @@ export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
                 }
                 const data = await response.json();
                 setIsAuthenticated(data.isAuthenticated);
+                setUnlocked(Boolean(data.unlocked));
             } catch (error) {
                 console.error("Error checking authentication:", error);
                 setIsAuthenticated(false);
@@ -31,7 +33,7 @@ export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
     }, []);
 
     return (
-        <AuthContext.Provider value={{ isAuthenticated, setIsAuthenticated, authLoading }}>
+        <AuthContext.Provider value={{ isAuthenticated, setIsAuthenticated, authLoading, unlocked, setUnlocked }}>
             {children}
         </AuthContext.Provider>
     );
@@ -1,6 +1,6 @@
 import { useState } from 'react'
 import { useNavigate } from 'react-router-dom';
-import { API_URL } from '../config';
+import { API_URL, UNLOCK_HEADERS } from '../config';
 
 function NewProject({ onClose }: { onClose: () => void }) {
     const [projectName, setProjectName] = useState('');
@@ -61,6 +61,7 @@ function NewProject({ onClose }: { onClose: () => void }) {
 
             const uploadResponse = await fetch(`${API_URL}/upload`, {
                 method: 'POST',
+                headers: UNLOCK_HEADERS,
                 body: uploadData,
                 credentials: 'include',
             });
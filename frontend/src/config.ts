@@ -1,5 +1,9 @@
 const  API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+// Sent on requests that may use the unlock session instead of a passphrase. A custom
+// header forces a CORS preflight, so other sites cannot make them with our cookies.
+const UNLOCK_HEADERS = { "X-Envault-Unlock": "1" };
 
 export {
-    API_URL
+    API_URL,
+    UNLOCK_HEADERS
 }
\ No newline at end of file
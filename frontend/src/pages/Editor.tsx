@@ -1,14 +1,15 @@
 import { useLocation, useNavigate } from "react-router-dom";
 import { useEffect, useState } from "react";
 import MonacoEditor from "../components/MonacoEditor";
-import { API_URL } from "../config";
+import { API_URL, UNLOCK_HEADERS } from "../config";
 import { useAuth } from "../components/AuthContext";
 import { Copy, CopyCheck } from 'lucide-react';
 
 
 interface EditorState {
   content: string;
-  passphrase: string;
+  sha?: string;
+  passphrase: string;  // empty when the vault is unlocked for this session
   project: string;
 }
 
@@ -17,7 +18,7 @@ export default function Editor() {
   const navigate = useNavigate();
   const [copied, setCopied] = useState(false);
   const [loading, setLoading] = useState(false);
-  const { isAuthenticated } = useAuth();
+  const { isAuthenticated, setUnlocked } = useAuth();
 
 
 
@@ -34,7 +35,7 @@ export default function Editor() {
   useEffect(() => {
     const state = location.state as EditorState | null;
 
-    if (!state || !state.passphrase || !state.project) {
+    if (!state || !state.project) {
       // Missing or invalid state → redirect
       navigate("/", { replace: true });
       return;
@@ -57,7 +58,7 @@ export default function Editor() {
 
   const handleSave = async () => {
     if (loading) return; // Prevent multiple saves
-    if (!localState?.passphrase || !localState?.project) {
+    if (!localState?.project) {
       alert("Missing project information. Please try again.");
       return;
     }
@@ -73,6 +74,7 @@ export default function Editor() {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          ...UNLOCK_HEADERS,
         },
         credentials: "include", // Ensure cookies are sent
         body: JSON.stringify({
@@ -80,15 +82,27 @@ export default function Editor() {
           passphrase: localState.passphrase,
           data: content,
           update: true,
+          base_sha: localState.sha,
         }),
       });
 
       const result = await response.json();
+      if (response.status === 409) {
+        setLoading(false);
+        alert("This project was changed elsewhere since you opened it. Reopen it to get the latest version.");
+        return;
+      }
+      if (response.status === 401 && !localState.passphrase) {
+        setLoading(false);
+        setUnlocked(false);
+        alert("Your unlock session expired. Copy your changes, then reopen the project and enter the passphrase.");
+        return;
+      }
       if (!response.ok) {
         throw new Error(result?.error || "Failed to save changes");
       }
       setLoading(false);
-      alert("Project saved successfully!");
+      alert(result?.status === "unchanged" ? "No changes to save." : "Project saved successfully!");
       navigate(-1); // Navigate back
 
     } catch (error) {
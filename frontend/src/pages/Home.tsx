@@ -1,6 +1,6 @@
 import { useNavigate } from "react-router-dom";
 import { useState, useEffect } from "react";
-import { API_URL } from "../config";
+import { API_URL, UNLOCK_HEADERS } from "../config";
 import { useAuth } from "../components/AuthContext";
 import NewProject from "../components/NewProject";
 import { Trash2, FilePenLine, CloudDownload } from 'lucide-react';
@@ -21,7 +21,7 @@ export default function Home() {
     const [loading, setLoading] = useState(true);
     const [passphrase, setPassphrase] = useState("");
     const [showNewProjectModal, setShowNewProjectModal] = useState(false);
-    const { isAuthenticated, setIsAuthenticated, authLoading } = useAuth();
+    const { isAuthenticated, setIsAuthenticated, authLoading, unlocked, setUnlocked } = useAuth();
     const navigate = useNavigate();
 
     useEffect(() => {
@@ -63,22 +63,42 @@ export default function Home() {
     }, []);
 
     if (!isAuthenticated) return null;
-    const requestAction = (name: string, type: "download" | "edit" | "delete") => {
+    const requestAction = async (name: string, type: "download" | "edit" | "delete") => {
+        if (unlocked) {
+            await runAction(name, type);  // The unlock session stands in for the passphrase
+            return;
+        }
+        setPendingAction({ name, type });
+    };
+
+    // A 401 while unlocked means the session expired: ask for the passphrase again
+    const sessionExpired = (response: Response, name: string, type: "download" | "edit" | "delete") => {
+        if (response.status !== 401 || !unlocked) return false;
+        setUnlocked(false);
         setPendingAction({ name, type });
+        return true;
     };
 
-    const downloadProject = async (name: string, passphrase: string) => {
+    const runAction = async (name: string, type: "download" | "edit" | "delete") => {
+        if (type === "download") await downloadProject(name);
+        if (type === "edit") await EditProject(name);
+        if (type === "delete") await deleteProject(name);
+    };
+
+    const downloadProject = async (name: string) => {
         try {
             const formData = new FormData();
             formData.append("project_name", name);
-            formData.append("passphrase", passphrase);
             // console.log(formData);
 
             const response = await fetch(`${API_URL}/download`, {
                 method: "POST",
+                headers: UNLOCK_HEADERS,
                 body: formData,
+                credentials: "include",
             });
 
+            if (sessionExpired(response, name, "download")) return;
             if (!response.ok) throw new Error("Failed to download");
 
             const blob = await response.blob();
@@ -94,21 +114,21 @@ export default function Home() {
         }
     };
 
-    const deleteProject = async (name: string, passphrase: string) => {
+    const deleteProject = async (name: string) => {
         try {
             const formData = new FormData();
             formData.append("project_name", name);
-            formData.append("passphrase", passphrase);
 
             const token = localStorage.getItem("token"); // or wherever your token is stored
 
             const response = await fetch(`${API_URL}/delete`, {
                 method: "DELETE",
-                headers: token ? { Authorization: `Bearer ${token}` } : undefined,
+                headers: token ? { Authorization: `Bearer ${token}`, ...UNLOCK_HEADERS } : UNLOCK_HEADERS,
                 credentials: "include", // Include cookies if needed
                 body: formData,
             });
 
+            if (sessionExpired(response, name, "delete")) return;
             if (!response.ok) throw new Error("Delete failed");
 
             setProjects((prev) => prev.filter((p) => p.name !== name));
@@ -124,26 +144,37 @@ export default function Home() {
 
         const { name, type } = pendingAction;
 
-        if (type === "download") await downloadProject(name, passphrase);
-        if (type === "edit") await EditProject(name, passphrase);
-        if (type === "delete") await deleteProject(name, passphrase);
-
+        // Verify the passphrase once; later actions in this session skip it
+        const formData = new FormData();
+        formData.append("passphrase", passphrase);
+        const response = await fetch(`${API_URL}/unlock`, {
+            method: "POST",
+            body: formData,
+            credentials: "include",
+        });
         setPendingAction(null);
         setPassphrase("");
+        if (!response.ok) {
+            alert("Invalid passphrase");
+            return;
+        }
+        setUnlocked(true);
+        await runAction(name, type);
     };
 
-    const EditProject = async (project: string, passphrase: string) => {
+    const EditProject = async (project: string) => {
         try {
             const formData = new FormData();
             formData.append("project_name", project);
-            formData.append("passphrase", passphrase);
 
             const response = await fetch(`${API_URL}/download-data`, {
                 method: "POST",
+                headers: UNLOCK_HEADERS,
                 body: formData,
                 credentials: "include"
             });
 
+            if (sessionExpired(response, project, "edit")) return;
             if (!response.ok) {
                 throw new Error(`Edit failed: ${response.statusText}`);
             }
@@ -151,7 +182,7 @@ export default function Home() {
             const data = await response.json();
             // console.log("Edit data:", data.data);
             // Now you have the actual data
-            navigate("/editor", { state: { content: data.data, passphrase, project } });
+            navigate("/editor", { state: { content: data.data, sha: data.sha, passphrase: "", project } });
         } catch (error) {
             alert("Edit failed");
             console.error(error);
@@ -173,6 +204,7 @@ export default function Home() {
                 credentials: "include", // Include cookies if needed
             });
             if (!response.ok) throw new Error("Logout failed");
+            setUnlocked(false);
             setIsAuthenticated(false);
         } catch (error) {
             console.error("Error during logout:", error);
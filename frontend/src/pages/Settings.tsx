@@ -7,6 +7,7 @@ function Settings() {
   const [oldPassword, setOldPassword] = useState('');
   const [newPassword, setNewPassword] = useState('');
   const [confirmPassword, setConfirmPassword] = useState('');
+  const [rotateKey, setRotateKey] = useState(false);
   const [passphraseExists, setPassphraseExists] = useState(true);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
@@ -49,6 +50,7 @@ function Settings() {
     setOldPassword('');
     setNewPassword('');
     setConfirmPassword('');
+    setRotateKey(false);
   };
 
   const handleCreatePass = async (e: React.FormEvent) => {
@@ -99,6 +101,7 @@ function Settings() {
       const formData = new FormData();
       formData.append("old_passphrase", oldPassword);
       formData.append("new_passphrase", newPassword);
+      formData.append("rotate_key", String(rotateKey));
       // console.log(formData)
       const response = await fetch(`${API_URL}/update-passphrase`, {
         method: 'POST',
@@ -174,6 +177,17 @@ function Settings() {
               />
             </div>
 
+            {passphraseExists && (
+              <label className="flex items-center gap-2 text-sm">
+                <input
+                  type="checkbox"
+                  checked={rotateKey}
+                  onChange={(e) => setRotateKey(e.target.checked)}
+                />
+                Also replace the vault key (re-encrypts every file, so the old password stops working even with old copies of the key file)
+              </label>
+            )}
+
             <button
               type="submit"
               disabled={loading}